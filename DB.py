@@ -1,23 +1,26 @@
 import pandas as pd
-from tkinter import *
-from tkinter import ttk
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import PatternFill, Font, Alignment
 from math import ceil
 import re
-from PIL import Image, ImageTk
 import traceback
 import os
 import numpy as np
 import warnings 
-import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from cache_bd import resumo_cache
+from cache_resultados import chave_resultado
+from master_data import MasterData, obter_master_data
+from demandas import ler_pasta_demandas
+from grade_virtual import GradeVirtual
+from execucao import verificar_cancelamento
+from exportacao import gravar_abas, ESTILO_CABECALHO_PANDAS, ESTILO_CABECALHO_VIAJANTE
+from instrumentacao import desligar_log_arquivo, etapa, medir, logger
 
 # Suppress xlrd / Excel warnings
 warnings.simplefilter("ignore")
 
-# Optionally suppress all print output from the engine
-with contextlib.redirect_stdout(None), contextlib.redirect_stderr(None):
-    df = pd.read_excel("Template.xlsx", engine="openpyxl")
 warnings.filterwarnings(
     "ignore",
     category=UserWarning,
@@ -38,10 +41,19 @@ warnings.filterwarnings(
 caminho_base = os.getcwd()
     
 
-def Processar_Demandas(cod_destino, pasta_demandas="Demandas"):
+@medir('leitura_demandas')
+def ler_demandas(pasta_demandas="Demandas", workers=1, cod_destino=None, usar_cache=True):
     """
     Processa arquivos de demanda de uma pasta, tratando arquivos de texto/CSV
     e Excel de forma diferente, e os consolida em um único DataFrame.
+
+    A pasta é lida uma única vez, independente de destino: as linhas TXT/CSV
+    recebem `cod_destino` (None por padrão) e as do Excel mantêm o COD DESTINO
+    da planilha.
+
+    workers > 1 lê os arquivos em paralelo (ver demandas.ler_pasta_demandas);
+    o resultado é o mesmo, na ordem dos nomes dos arquivos. usar_cache=False
+    lê todos os arquivos sem consultar nem gravar o manifesto de demandas.
     """
     # Define o caminho completo para a pasta de demandas
     caminho_pasta = os.path.join(caminho_base, pasta_demandas)
@@ -51,86 +63,28 @@ def Processar_Demandas(cod_destino, pasta_demandas="Demandas"):
         print(f"Aviso: A pasta '{caminho_pasta}' não foi encontrada.")
         return pd.DataFrame()
 
+    arquivos, erros = ler_pasta_demandas(caminho_pasta, workers, usar_cache)
+
     # Lista para armazenar os DataFrames de cada arquivo processado
     lista_dfs = []
 
-    # Percorre todos os arquivos na pasta de demandas
-    for nome_arquivo in os.listdir(caminho_pasta):
-        caminho_completo_arquivo = os.path.join(caminho_pasta, nome_arquivo)
-        nome_arquivo_lower = nome_arquivo.lower()
-        
-        try:
-            # --- MANTÉM A LÓGICA ORIGINAL PARA ARQUIVOS .TXT E .CSV ---
-            if nome_arquivo_lower.endswith((".txt", ".csv")):
-                dados_arquivo_atual = []
-                with open(caminho_completo_arquivo, "r", encoding="utf-8", errors="ignore") as arquivo:
-                    linhas_a_processar = arquivo.readlines()
-
-                # Processa cada linha extraída do arquivo de texto
-                for linha in linhas_a_processar:
-                    if "AUTOMATIC" in linha:
-                        continue
-
-                    linha = linha.strip()
-
-                    # A lógica de fatiamento requer um comprimento mínimo
-                    if len(linha) >= 20:
-                        try:
-                            # Extrai os dados com base na posição dos caracteres
-                            desenho = linha[3:14]
-                            cod_fornecedor = linha[-20:-11]
-                            quantidade = linha[-11:].replace("+", "")
-
-                            # Adiciona os dados extraídos à lista deste arquivo
-                            dados_arquivo_atual.append({
-                                "DESENHO": int(desenho.strip()),
-                                "COD FORNECEDOR": int(cod_fornecedor.strip()),
-                                "QTDE": int(quantidade.strip()),
-                            })
-                        except (ValueError, IndexError):
-                            # Ignora linhas que não seguem o formato esperado
-                            continue
-                
-                # Se dados foram extraídos do arquivo, cria um DataFrame
-                if dados_arquivo_atual:
-                    df_temp = pd.DataFrame(dados_arquivo_atual)
-                    df_temp["COD DESTINO"] = cod_destino
-                    lista_dfs.append(df_temp)
-
-            # --- NOVA LÓGICA PARA PROCESSAR ARQUIVOS EXCEL (.XLS, .XLSX) ---
-            elif nome_arquivo_lower.endswith((".xls", ".xlsx")):
-                
-                # Mapeamento dos nomes de coluna do arquivo Excel para os nomes desejados
-                colunas_mapeamento = {
-                    'DESENHO': 'DESENHO',
-                    'COD ORIGEM': 'COD FORNECEDOR',
-                    'ENTREGA SOLICITADA': 'QTDE',
-                    'COD DESTINO': 'COD DESTINO'
-                }
-                
-                # Lê o arquivo Excel
-                df_excel = pd.read_excel(caminho_completo_arquivo)
-
-                # Pega a lista de colunas que precisamos do arquivo original
-                colunas_originais_necessarias = list(colunas_mapeamento.keys())
-
-                # Verifica se todas as colunas necessárias existem no arquivo
-                if not all(coluna in df_excel.columns for coluna in colunas_originais_necessarias):
-                    print(f"Aviso: O arquivo '{nome_arquivo}' não contém todas as colunas necessárias e será ignorado.")
-                    continue
-
-                # 1. Seleciona apenas as colunas que nos interessam
-                df_temp = df_excel[colunas_originais_necessarias].copy()
-                
-                # 2. Renomeia as colunas para o padrão final
-                df_temp.rename(columns=colunas_mapeamento, inplace=True)
-
-                # 3. Adiciona o DataFrame processado à lista para concatenação posterior
-                lista_dfs.append(df_temp)
-
-        except Exception as e:
-            print(f"Erro ao processar o arquivo '{nome_arquivo}': {e}")
+    for nome_arquivo, df_temp, rejeitados in arquivos:
+        total_rejeitados = sum(rejeitados.values())
+        if total_rejeitados:
+            print(f"[INFO] '{nome_arquivo}': {len(df_temp)} linha(s) lida(s), "
+                  f"{total_rejeitados} ignorada(s) {rejeitados}")
+
+        if df_temp.empty:
             continue
+        # Arquivos TXT/CSV não trazem o destino; o Excel já tem a coluna COD DESTINO
+        if "COD DESTINO" not in df_temp.columns:
+            df_temp["COD DESTINO"] = cod_destino
+        lista_dfs.append(df_temp)
+
+    if erros:
+        detalhes = "; ".join(f"{nome}: {erro}" for nome, erro in sorted(erros.items()))
+        print(f"[WARN] {len(erros)} arquivo(s) de demanda ignorado(s) - {detalhes}")
+        logger.warning("%d arquivo(s) de demanda ignorado(s) - %s", len(erros), detalhes)
 
     # --- LÓGICA FINAL PARA CONSOLIDAR OS DADOS ---
     # Se a lista de DataFrames estiver vazia, retorna um DataFrame vazio
@@ -156,11 +110,52 @@ def Processar_Demandas(cod_destino, pasta_demandas="Demandas"):
     
     return df_final
 
+
+def Processar_Demandas(cod_destino, pasta_demandas="Demandas", workers=1, usar_cache=True):
+    """Demandas da pasta com as linhas TXT/CSV atribuídas a `cod_destino`."""
+    return ler_demandas(pasta_demandas, workers, cod_destino, usar_cache)
+
 # Exemplo de como chamar a função
 # df_processado = Processar_Demandas(cod_destino="BR01")
 # print(df_processado)
 
 
+def normalizar_codigos(campo):
+    if pd.isna(campo):
+        return []
+    return re.split(r'\s*/\s*', str(campo).strip())
+
+
+def construir_indice_rotas(db_fluxos):
+    """
+    Monta o índice de rotas do FLUXO por par (COD FORNECEDOR, COD DESTINO).
+
+    As células com vários códigos separados por '/' são expandidas uma única vez,
+    gerando uma linha por combinação fornecedor x destino. Quando o mesmo par
+    aparece em mais de uma rota, vale a primeira rota do FLUXO.
+    """
+    def coluna(nome):
+        if nome in db_fluxos.columns:
+            return db_fluxos[nome].to_numpy()
+        return None
+
+    cods_dest_raw = db_fluxos['COD DESTINO'].astype(str).str.strip()
+    indice = pd.DataFrame({
+        'COD FORNECEDOR': db_fluxos['COD FORNECEDOR'].map(normalizar_codigos).to_numpy(),
+        'COD DESTINO': cods_dest_raw.str.split(r'\s*/\s*', regex=True).to_numpy(),
+        'COD DESTINO COMPLETO': cods_dest_raw.to_numpy(),
+        'VEICULO PRINCIPAL': coluna('VEICULO PRINCIPAL'),
+        'TIPO SATURACAO': coluna('TIPO SATURACAO'),
+        'COD IMS': coluna('COD IMS'),
+    })
+
+    indice = indice.explode('COD FORNECEDOR').explode('COD DESTINO')
+    indice = indice.dropna(subset=['COD FORNECEDOR'])
+    # explode mantém a ordem das linhas do FLUXO: a primeira ocorrência é a rota que vale
+    indice = indice.drop_duplicates(subset=['COD FORNECEDOR', 'COD DESTINO'], keep='first')
+    return indice.reset_index(drop=True)
+
+
 
 
 
@@ -192,7 +187,7 @@ def desenhar_caminhoes(canvas, ocupacao, caminhao_img):
             x_offset = margem + 90  # centraliza abaixo dos dois
             y_offset = margem + 130
 
-        canvas.create_image(x_offset + 12, y_offset + 17, image=caminhao_img, anchor=NW)
+        canvas.create_image(x_offset + 12, y_offset + 17, image=caminhao_img, anchor="nw")
 
         x_inicial_grade = x_offset + 50
         y_inicial_grade = y_offset + 10
@@ -209,379 +204,479 @@ def desenhar_caminhoes(canvas, ocupacao, caminhao_img):
 
 
 
-def calcular_empilhamento_line_haul(df_saturacao, db_empilhamento):
-    empilhamento_rows = []
+# Veículo imediatamente menor usado na coluna SATURAÇÃO COM VEÍCULO MENOR (%)
+VEICULO_ANTERIOR = {
+    4: 3, 5: 3, 6: 3, 7: 3, 8: 3, 9: 3, 14: 3,
+    2: 1, 3: 1, 12: 1, 13: 1, 15: 1, 16: 1, 17: 1, 18: 1,
+    1: 10,
+    10: 11,
+    11: 11,
+}
 
-    base_df = df_saturacao[df_saturacao['EMBALAGEM_BASE'] == 1]
-    sobre_df = df_saturacao[df_saturacao['EMBALAGEM_SOBREPOSTA'] == 1]
 
-    for _, base_row in base_df.iterrows():
-        for _, sobre_row in sobre_df.iterrows():
-            if base_row['COD FORNECEDOR'] == sobre_row['COD FORNECEDOR']:
-                fornecedor = base_row['COD FORNECEDOR']
-                embal_base = base_row['EMBALAGEM']
-                embal_sobre = sobre_row['EMBALAGEM']
-
-                empilhamento_match = db_empilhamento[
-                    (db_empilhamento['COD FORNECEDOR'] == fornecedor) &
-                    (db_empilhamento['MDR BASE'] == embal_base) &
-                    (db_empilhamento['MDR SOBREPOSTA'] == embal_sobre)
-                ]
-
-                if empilhamento_match.empty:
-                    continue
-
-                capacidade_veiculo = base_row['CAPACIDADE']
-
-                total_base = base_row['TOTAL DE CXS']
-                total_sobre = sobre_row['TOTAL DE CXS']
-
-                usadas_base = 0
-                usadas_sobre = 0
-
-                # Empilha 1 base com 1 sobreposta (não considera EMPILHAMENTO BASE)
-                while total_base >= 1 and total_sobre >= 1:
-                    total_base -= 1
-                    total_sobre -= 1
-                    usadas_base += 1
-                    usadas_sobre += 1
-
-                total_empilhado = usadas_base + usadas_sobre
-                chave = f"{fornecedor}-{embal_base}-{embal_sobre}"
-               
-                saturacao = total_empilhado / capacidade_veiculo
-
-                empilhamento_rows.append({
-                    'FORNECEDOR': fornecedor,
-                    'EMBALAGEM_BASE': embal_base,
-                    'EMBALAGEM_SOBREPOSTA': embal_sobre,
-                    'CAPACIDADE_VEÍCULO': capacidade_veiculo,
-                    'TOTAL_DE_EMBALAGENS_BASE': base_row['TOTAL DE CXS'],
-                    'TOTAL_DE_EMBALAGENS_SOBREPOSTA': sobre_row['TOTAL DE CXS'],
-                    'TOTAL_DE_EMBALAGENS_BASE_PARA_COMBINAR': usadas_base,
-                    'TOTAL_DE_EMBALAGENS_SOBREPOSTA_PARA_COMBINAR': usadas_sobre,
-                    'EMBALAGENS_BASE_RESTANTE': total_base,
-                    'EMBALAGENS_SOBREPOSTA_RESTANTE': total_sobre,
-                    'CHAVE': chave,
-                    'TOTAL_EMBALAGENS_EMPILHADAS': total_empilhado,
-                    'SATURAÇÃO': saturacao,
-                    'EMPILHAMENTO BASE': 1  # fixo, pois é 1:1
-                })
-
-    return pd.DataFrame(empilhamento_rows)
-
-
-def calcular_empilhamento(df_saturacao, db_empilhamento):
-    empilhamento_rows = []
+def construir_matriz_capacidade(db_MDR, db_veiculos):
+    """
+    Matriz de capacidade indexada por MDR (caixa alta) x COD VEICULO, com a
+    primeira capacidade preenchida de cada MDR na coluna do veículo (db_veiculos['VEICULOS']).
+
+    Retorna (matriz, matriz_anterior), onde matriz_anterior traz em cada código
+    de veículo a capacidade do seu VEICULO_ANTERIOR.
+    """
+    # Mapeia de código do veículo (ex: 4) → coluna de capacidade no db_MDR (ex: "14 x 2,4 x 2,78")
+    mapa_coluna_capacidade = db_veiculos.set_index('COD VEICULO')['VEICULOS'].to_dict()
+    colunas = {cod: coluna for cod, coluna in mapa_coluna_capacidade.items()
+               if isinstance(coluna, str) and coluna in db_MDR.columns}
+
+    capacidades = pd.DataFrame(
+        {cod: pd.to_numeric(db_MDR[coluna], errors='coerce').to_numpy() for cod, coluna in colunas.items()},
+        index=db_MDR['MDR'].astype(str).str.upper().to_numpy(),
+        columns=list(colunas),
+    )
+    matriz = capacidades.groupby(level=0, sort=False).first()
+
+    anterior = {}
+    for cod in matriz.columns:
+        cod_anterior = VEICULO_ANTERIOR.get(cod)
+        if cod_anterior in matriz.columns:
+            anterior[cod] = matriz[cod_anterior]
+    matriz_anterior = pd.DataFrame(anterior, index=matriz.index, columns=list(anterior))
+
+    return matriz, matriz_anterior
+
+
+def consultar_capacidade(matriz, mdrs, veiculos):
+    """Capacidade de cada par (MDR, código de veículo) na matriz; NaN quando não houver."""
+    linhas = matriz.index.get_indexer(pd.Index(mdrs))
+    colunas = matriz.columns.get_indexer(pd.Index(pd.to_numeric(veiculos, errors='coerce')))
+    encontrados = (linhas >= 0) & (colunas >= 0)
+
+    capacidade = np.full(len(linhas), np.nan)
+    capacidade[encontrados] = matriz.to_numpy(dtype=float)[linhas[encontrados], colunas[encontrados]]
+    return capacidade
 
+
+COLUNAS_EMPILHAMENTO = [
+    'FORNECEDOR', 'EMBALAGEM_BASE', 'EMBALAGEM_SOBREPOSTA', 'CAPACIDADE_VEÍCULO',
+    'TOTAL_DE_EMBALAGENS_BASE', 'TOTAL_DE_EMBALAGENS_SOBREPOSTA',
+    'TOTAL_DE_EMBALAGENS_BASE_PARA_COMBINAR', 'TOTAL_DE_EMBALAGENS_SOBREPOSTA_PARA_COMBINAR',
+    'EMBALAGENS_BASE_RESTANTE', 'EMBALAGENS_SOBREPOSTA_RESTANTE', 'CHAVE',
+    'TOTAL_EMBALAGENS_EMPILHADAS', 'SATURAÇÃO', 'EMPILHAMENTO BASE',
+]
+
+
+def indexar_regras_empilhamento(db_empilhamento):
+    """
+    Tabela de regras de empilhamento com uma linha por
+    (COD FORNECEDOR, MDR BASE, MDR SOBREPOSTA), mantendo a primeira regra cadastrada.
+    """
+    chaves = ['COD FORNECEDOR', 'MDR BASE', 'MDR SOBREPOSTA']
+    regras = db_empilhamento.dropna(subset=chaves).drop_duplicates(subset=chaves, keep='first')
+    return regras[chaves + ['EMPILHAMENTO BASE']].reset_index(drop=True)
+
+
+def _empilhar(df_saturacao, regras, emp_base_fixo=None):
+    """
+    Motor vetorizado de empilhamento.
+
+    Cruza as embalagens base e sobrepostas de cada fornecedor, mantém os pares com
+    regra cadastrada e calcula de uma vez quantas embalagens são combinadas: cada
+    sobreposta consome EMPILHAMENTO BASE embalagens base, então o número de pilhas é
+    min(base // EMPILHAMENTO BASE, sobreposta).
+    """
     base_df = df_saturacao[df_saturacao['EMBALAGEM_BASE'] == 1]
     sobre_df = df_saturacao[df_saturacao['EMBALAGEM_SOBREPOSTA'] == 1]
 
-    for _, base_row in base_df.iterrows():
-        for _, sobre_row in sobre_df.iterrows():
-            if base_row['COD FORNECEDOR'] == sobre_row['COD FORNECEDOR']:
-                fornecedor = base_row['COD FORNECEDOR']
-                embal_base = base_row['EMBALAGEM']
-                embal_sobre = sobre_row['EMBALAGEM']
+    base = pd.DataFrame({
+        'COD FORNECEDOR': base_df['COD FORNECEDOR'].to_numpy(),
+        'MDR BASE': base_df['EMBALAGEM'].to_numpy(),
+        'CAPACIDADE': base_df['CAPACIDADE'].to_numpy(),
+        'TOTAL_BASE': base_df['TOTAL DE CXS'].to_numpy(),
+        'ORDEM_BASE': np.arange(len(base_df)),
+    }).dropna(subset=['COD FORNECEDOR'])
+    sobre = pd.DataFrame({
+        'COD FORNECEDOR': sobre_df['COD FORNECEDOR'].to_numpy(),
+        'MDR SOBREPOSTA': sobre_df['EMBALAGEM'].to_numpy(),
+        'TOTAL_SOBRE': sobre_df['TOTAL DE CXS'].to_numpy(),
+        'ORDEM_SOBRE': np.arange(len(sobre_df)),
+    }).dropna(subset=['COD FORNECEDOR'])
+
+    pares = base.merge(sobre, on='COD FORNECEDOR')
+    pares = pares.merge(regras, on=['COD FORNECEDOR', 'MDR BASE', 'MDR SOBREPOSTA'])
+    if pares.empty:
+        return pd.DataFrame()
 
-                empilhamento_match = db_empilhamento[
-                    (db_empilhamento['COD FORNECEDOR'] == fornecedor) &
-                    (db_empilhamento['MDR BASE'] == embal_base) &
-                    (db_empilhamento['MDR SOBREPOSTA'] == embal_sobre)
-                ]
+    # Mesma ordem dos laços originais: base, depois sobreposta
+    pares = pares.sort_values(['ORDEM_BASE', 'ORDEM_SOBRE'], kind='stable').reset_index(drop=True)
+
+    if emp_base_fixo is not None:
+        pares['EMPILHAMENTO BASE'] = emp_base_fixo
+    emp_base = pares['EMPILHAMENTO BASE']
+
+    total_base = pares['TOTAL_BASE'].astype(float).to_numpy()
+    total_sobre = pares['TOTAL_SOBRE'].astype(float).to_numpy()
+    eb = emp_base.astype(float).to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pilhas = np.where(eb > 0,
+                          np.minimum(np.floor(total_base / eb), np.floor(total_sobre)),
+                          np.where(total_base >= eb, np.floor(total_sobre), 0))
+    pilhas = np.nan_to_num(np.clip(pilhas, 0, None), nan=0).astype(np.int64)
+
+    usadas_base = pilhas * emp_base
+    usadas_sobre = pilhas
+    total_empilhado = usadas_base + usadas_sobre
+
+    df_emp = pd.DataFrame({
+        'FORNECEDOR': pares['COD FORNECEDOR'],
+        'EMBALAGEM_BASE': pares['MDR BASE'],
+        'EMBALAGEM_SOBREPOSTA': pares['MDR SOBREPOSTA'],
+        'CAPACIDADE_VEÍCULO': pares['CAPACIDADE'],
+        'TOTAL_DE_EMBALAGENS_BASE': pares['TOTAL_BASE'],
+        'TOTAL_DE_EMBALAGENS_SOBREPOSTA': pares['TOTAL_SOBRE'],
+        'TOTAL_DE_EMBALAGENS_BASE_PARA_COMBINAR': usadas_base,
+        'TOTAL_DE_EMBALAGENS_SOBREPOSTA_PARA_COMBINAR': usadas_sobre,
+        'EMBALAGENS_BASE_RESTANTE': pares['TOTAL_BASE'] - usadas_base,
+        'EMBALAGENS_SOBREPOSTA_RESTANTE': pares['TOTAL_SOBRE'] - usadas_sobre,
+        'CHAVE': (pares['COD FORNECEDOR'].astype(str) + '-' + pares['MDR BASE'].astype(str)
+                  + '-' + pares['MDR SOBREPOSTA'].astype(str)),
+        'TOTAL_EMBALAGENS_EMPILHADAS': total_empilhado,
+        'SATURAÇÃO': total_empilhado / pares['CAPACIDADE'],
+        'EMPILHAMENTO BASE': emp_base,
+    })
+    return df_emp[COLUNAS_EMPILHAMENTO]
+
+
+def integrar_saturacao_total(df_sat, df_emp):
+    """
+    SATURAÇÃO_TOTAL e SATURAÇÃO_POR_MDR de cada fornecedor + embalagem.
 
-                if empilhamento_match.empty:
-                    continue
+    A saturação dos empilhamentos é somada por (fornecedor, MDR base) e unida à
+    aba Saturação; sem empilhamento a saturação é só CXS/PALLETS_TOTAL / CAPACIDADE.
+    """
+    proporcao = df_sat['CXS/PALLETS_TOTAL'] / df_sat['CAPACIDADE']
+
+    if df_emp.empty:
+        df_sat['SATURAÇÃO_TOTAL'] = proporcao
+    else:
+        soma_saturacoes = (
+            df_emp.groupby(['FORNECEDOR', 'EMBALAGEM_BASE'], sort=False)['SATURAÇÃO'].sum()
+            .rename_axis(['COD FORNECEDOR', 'EMBALAGEM'])
+            .rename('SOMA_SATURACOES')
+            .reset_index()
+        )
+        soma = df_sat[['COD FORNECEDOR', 'EMBALAGEM']].merge(
+            soma_saturacoes, on=['COD FORNECEDOR', 'EMBALAGEM'], how='left', validate='many_to_one'
+        )['SOMA_SATURACOES'].fillna(0).to_numpy()
+        df_sat['SATURAÇÃO_TOTAL'] = (proporcao + soma) * df_sat['EFICIÊNCIA_COMPRIMENTO']
 
-                emp_base = empilhamento_match.iloc[0]['EMPILHAMENTO BASE']
-                capacidade_veiculo = base_row['CAPACIDADE']
+    df_sat['SATURAÇÃO_POR_MDR'] = df_sat['SATURAÇÃO_TOTAL'] / df_sat['TOTAL DE CXS']
+    return df_sat
 
-                total_base = base_row['TOTAL DE CXS']
-                total_sobre = sobre_row['TOTAL DE CXS']
 
-                usadas_base = 0
-                usadas_sobre = 0
+def calcular_empilhamento_line_haul(df_saturacao, db_empilhamento, regras=None):
+    # Empilha 1 base com 1 sobreposta (não considera EMPILHAMENTO BASE)
+    if regras is None:
+        regras = indexar_regras_empilhamento(db_empilhamento)
+    return _empilhar(df_saturacao, regras, emp_base_fixo=1)
 
-                while total_base >= emp_base and total_sobre >= 1:
-                    total_base -= emp_base
-                    total_sobre -= 1
-                    usadas_base += emp_base
-                    usadas_sobre += 1
 
-                total_empilhado = usadas_base + usadas_sobre
-                chave = f"{fornecedor}-{embal_base}-{embal_sobre}"
-                
-                saturacao = total_empilhado / capacidade_veiculo
+def calcular_empilhamento(df_saturacao, db_empilhamento, regras=None):
+    """
+    Aba 'Calculo Empilhamento': pares base + sobreposta do mesmo fornecedor com
+    regra em db_empilhamento. `regras` aceita a tabela já indexada
+    (indexar_regras_empilhamento) para evitar refazê-la a cada execução.
+    """
+    if regras is None:
+        regras = indexar_regras_empilhamento(db_empilhamento)
+    return _empilhar(df_saturacao, regras)
 
-                empilhamento_rows.append({
-                    'FORNECEDOR': fornecedor,
-                    'EMBALAGEM_BASE': embal_base,
-                    'EMBALAGEM_SOBREPOSTA': embal_sobre,
-                    'CAPACIDADE_VEÍCULO': capacidade_veiculo,
-                    'TOTAL_DE_EMBALAGENS_BASE': base_row['TOTAL DE CXS'],
-                    'TOTAL_DE_EMBALAGENS_SOBREPOSTA': sobre_row['TOTAL DE CXS'],
-                    'TOTAL_DE_EMBALAGENS_BASE_PARA_COMBINAR': usadas_base,
-                    'TOTAL_DE_EMBALAGENS_SOBREPOSTA_PARA_COMBINAR': usadas_sobre,
-                    'EMBALAGENS_BASE_RESTANTE': total_base,
-                    'EMBALAGENS_SOBREPOSTA_RESTANTE': total_sobre,
-                    'CHAVE': chave,
-                    'TOTAL_EMBALAGENS_EMPILHADAS': total_empilhado,
-                    'SATURAÇÃO': saturacao,
-                    'EMPILHAMENTO BASE': emp_base
-                })
 
-    return pd.DataFrame(empilhamento_rows)
+def preparar_template(df_demanda):
+    """
+    Ajusta os tipos do template de demanda como eram lidos do Template.xlsx
+    (COD FORNECEDOR inteiro e DESENHO texto), para uso direto em memória.
+    """
+    template = df_demanda.copy()
+    template['COD FORNECEDOR'] = template['COD FORNECEDOR'].astype(int)
+    template['DESENHO'] = template['DESENHO'].where(template['DESENHO'].isna(), template['DESENHO'].astype(str))
+    return template
 
 
+def ler_template(caminho='Template.xlsx'):
+    """Lê o template de demanda exportado por uma execução anterior."""
+    return pd.read_excel(caminho, dtype={'COD FORNECEDOR': int, 'DESENHO': str})
 
 
+@medir('demanda')
+def montar_demanda(cod_destinos, codigo_veiculo, master=None, workers=1):
+    """
+    Lê as demandas de cada destino e resolve a rota do FLUXO de cada linha.
 
+    cod_destinos: lista de códigos de destino, ex. [1080, 1046]
+    codigo_veiculo: função que converte o nome do veículo do FLUXO no seu código
+    workers: processos usados na leitura dos arquivos de demanda (1 = serial)
+    Retorna o template de demanda (mesmas colunas do Template.xlsx).
+    """
+    if master is None:
+        master = obter_master_data()
 
+    # Índice (fornecedor, destino) -> rota do FLUXO, refeito só quando o FLUXO.xlsx muda
+    indice_rotas = master.derivado('indice_rotas', ['fluxo'], construir_indice_rotas)
 
+    cod_destinos = [str(c).strip() for c in cod_destinos]
 
+    colunas = ["COD FORNECEDOR", "COD IMS", "COD DESTINO", "DESENHO", "QTDE", "VEICULO", "TIPO SATURACAO"]
+    # A pasta é lida uma vez só; a mesma demanda vale para todos os destinos pedidos
+    df = ler_demandas(workers=workers)
+    if df.empty or not cod_destinos:
+        return pd.DataFrame(columns=colunas)
 
+    # Uma cópia das linhas por destino, na ordem dos destinos informados
+    n = len(df)
+    repeticoes = len(cod_destinos)
+    demanda = pd.DataFrame({
+        "COD FORNECEDOR": np.tile(df["COD FORNECEDOR"].astype(str).str.strip().to_numpy(), repeticoes),
+        "COD DESTINO": np.repeat(np.array(cod_destinos, dtype=object), n),
+        "DESENHO": np.tile(df["DESENHO"].to_numpy(), repeticoes),
+        "QTDE": np.tile(df["QTDE"].to_numpy(), repeticoes),
+    })
 
+    # Um único join resolve a rota de todas as linhas (vale a primeira rota do FLUXO)
+    df_final = demanda.merge(indice_rotas, on=["COD FORNECEDOR", "COD DESTINO"], how="left")
+    encontrou = df_final["COD DESTINO COMPLETO"].notna()
+    df_final["COD DESTINO"] = df_final["COD DESTINO COMPLETO"].where(encontrou, df_final["COD DESTINO"])
 
+    # Nome do veículo -> código, resolvido uma vez por nome distinto
+    nomes_veiculos = df_final["VEICULO PRINCIPAL"].dropna().unique()
+    df_final["VEICULO"] = df_final["VEICULO PRINCIPAL"].map({n: codigo_veiculo(n) for n in nomes_veiculos})
 
+    return df_final[colunas]
 
 
+# Colunas de texto repetido do template enriquecido, guardadas como categoria
+COLUNAS_CATEGORICAS = ['FORNECEDOR', 'COD DESTINO', 'DESCRIÇÃO MATERIAL', 'MDR', 'DESCRIÇÃO DA EMBALAGEM',
+                       'TIPO SATURACAO']
 
 
+def compactar_template(template):
+    """
+    Representação compacta do template enriquecido, com os mesmos valores:
+    textos repetidos (COLUNAS_CATEGORICAS) como categoria, isto é, um código
+    inteiro por linha mais o dicionário de valores distintos, e COD FORNECEDOR
+    no menor inteiro que comporta os códigos.
+    """
+    tipos = {col: 'category' for col in COLUNAS_CATEGORICAS if col in template.columns}
+    template = template.astype(tipos)
+    if 'COD FORNECEDOR' in template.columns and pd.api.types.is_integer_dtype(template['COD FORNECEDOR']):
+        template['COD FORNECEDOR'] = pd.to_numeric(template['COD FORNECEDOR'], downcast='unsigned')
+    return template
 
 
+def mesma_codificacao(valores, referencia):
+    """
+    `valores` com o dicionário de categorias da coluna `referencia`, quando ela é
+    categórica: o merge entre as duas é feito pelos códigos inteiros.
+    """
+    if isinstance(referencia.dtype, pd.CategoricalDtype):
+        return pd.Categorical(valores, dtype=referencia.dtype)
+    return valores
 
 
-def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao_img, usar_manual=False,caminho_BD = 'BD'):
+def indexar_cadastro_pn(db_PN):
+    """
+    Mapas do BD_CADASTRO_PN usados no enriquecimento, montados uma vez por carga
+    da base: DESENHO -> MDR, COD FORNECEDOR -> FORNECEDOR e a chave composta
+    (DESENHO, MDR) como MultiIndex (códigos inteiros de cada parte), com
+    DESCRIÇÃO, MDR, QME e PESO (Kg) MATERIAL do primeiro cadastro de cada chave.
+    """
+    chaves = pd.MultiIndex.from_arrays([db_PN['DESENHO'].astype(str), db_PN['MDR'].astype(str)])
+    primeiros = ~chaves.duplicated()
+    return {
+        'mdr_por_desenho': db_PN.drop_duplicates('DESENHO').set_index('DESENHO')['MDR'],
+        'fornecedores': db_PN.drop_duplicates('COD FORNECEDOR').set_index('COD FORNECEDOR')['FORNECEDOR'],
+        'chaves': chaves[primeiros],
+        'por_chave': db_PN.loc[primeiros, ['DESCRIÇÃO', 'MDR', 'QME', 'PESO (Kg) MATERIAL']].reset_index(drop=True),
+    }
 
 
-    def split_key_logic(code):
-        """
-        Splits a code by '/'. 
-        Returns the second element if a split occurs, otherwise returns the original code.
-        """
-        # Convert to string just in case, then split
-        
-        parts = str(code).split('/')
-        
-        if len(parts) > 1:
-            # If the split created more than one part, take the second one (index 1)
-            return parts[1].strip() 
-            
-        else:
-            # Otherwise, take the original part (index 0)
-            return parts[0].strip()
-    try:
+def indexar_cadastro_mdr(db_MDR):
+    """DESCRIÇÃO, VOLUME e MDR PESO do primeiro cadastro de cada MDR (índice único)."""
+    return db_MDR.drop_duplicates('MDR').set_index('MDR')[['DESCRIÇÃO', 'VOLUME', 'MDR PESO']]
 
 
-        # --- Leitura dos arquivos ---
-        template = pd.read_excel('Template.xlsx', dtype={'COD FORNECEDOR': int, 'DESENHO': str})
-        template = template[template['QTDE'] > 0]
-        
-        
-        BD_PN = os.path.join(caminho_base,caminho_BD,"BD_CADASTRO_PN.xlsx")
-        BD_MDR = os.path.join(caminho_base,caminho_BD,"BD_CADASTRO_MDR.xlsx")
-        VEÍCULOS = os.path.join(caminho_base,caminho_BD,"VEÍCULOS.xlsx")
-        db_empilhamento = os.path.join(caminho_base,caminho_BD,"BD_EMPILHAMENTO_EMBALAGENS.xlsx")
-        db_efi = os.path.join(caminho_base,caminho_BD,"BD_CADASTRO_MDR_PERDA_COMPRIMENTO.xlsx")
-        db_efi = os.path.join(caminho_base,caminho_BD,"BD_CADASTRO_MDR_PERDA_COMPRIMENTO.xlsx")
-       
-        # ------------------Working in the DB structrue------------------
-        db_PN = pd.read_excel(BD_PN, sheet_name='BD', dtype={'CÓD. FORNECEDOR': int, 'DESENHO': str})
-        db_PN = db_PN.rename(columns={'CÓD. FORNECEDOR': 'COD FORNECEDOR'})
-
-        db_MDR = pd.read_excel(BD_MDR, sheet_name='BD')
-        db_MDR = db_MDR.rename(columns={'DESCRIÇÃO2': 'DESCRIÇÃO'})
-
-        db_veiculos = pd.read_excel(VEÍCULOS, sheet_name='VEÍCULOS')
-
-        db_empilhamento = pd.read_excel(db_empilhamento, sheet_name='BD')
-        db_empilhamento = db_empilhamento.rename(columns={'CÓD. FORNECEDOR': 'COD FORNECEDOR'})
-
-        db_efi = pd.read_excel(db_efi,sheet_name='BD')
-
-        # --- Normalização de tipos ---
-        db_PN['DESENHO ATUALIZAÇÃO'] = pd.to_datetime(db_PN['DESENHO ATUALIZAÇÃO'], errors='coerce')
-        db_MDR['VOLUME'] = pd.to_numeric(db_MDR['VOLUME'], errors='coerce')
-        db_MDR['MDR PESO'] = pd.to_numeric(db_MDR['MDR PESO'], errors='coerce')
-        db_PN['PESO (Kg) MATERIAL'] = pd.to_numeric(db_PN['PESO (Kg) MATERIAL'], errors='coerce')
-
-        db_PN = db_PN.sort_values('DESENHO ATUALIZAÇÃO', ascending=False)
-
-        # Criar chave composta DESENHO+MDR em db_PN
-        db_PN['KEY'] = db_PN['DESENHO'].astype(str) + '_' + db_PN['MDR'].astype(str)
-
-        # --- Mapeamentos únicos para .map() seguros ---
-        mapa_fornecedores = db_PN.drop_duplicates('COD FORNECEDOR').set_index('COD FORNECEDOR')['FORNECEDOR']
-
-        # Mapas baseados na chave composta
-        mapa_pn = db_PN.drop_duplicates('KEY').set_index('KEY')['DESCRIÇÃO']
-        mapa_mdr = db_PN.drop_duplicates('KEY').set_index('KEY')['MDR']
-        mapa_qme = db_PN.drop_duplicates('KEY').set_index('KEY')['QME']
-        mapa_peso_pn = db_PN.drop_duplicates('KEY').set_index('KEY')['PESO (Kg) MATERIAL']
-
-        # Mapas vindos do db_MDR
-        mapa_descricao_mdr = db_MDR.drop_duplicates('MDR').set_index('MDR')['DESCRIÇÃO']
-        mapa_volume = db_MDR.drop_duplicates('MDR').set_index('MDR')['VOLUME']
-        mapa_peso_mdr = db_MDR.drop_duplicates('MDR').set_index('MDR')['MDR PESO']
-        mapa_peso_max = db_veiculos.set_index('COD VEICULO')['PESO MAXIMO']
+@medir('enriquecimento')
+def enriquecer_template(template, master=None):
+    """
+    Completa o template de demanda com fornecedor, descrições, MDR, QME,
+    embalagens, volume e pesos a partir das bases BD.
+    O resultado vem compactado (ver compactar_template).
+    """
+    if master is None:
+        master = obter_master_data()
 
-        # --- Enriquecimento do template ---
+    db_veiculos = master.tabela('veiculos')
 
-        # Passo 1: primeiro trazer MDR pelo DESENHO, para podermos montar a KEY
-        template['MDR'] = template['DESENHO'].map(
-            db_PN.drop_duplicates('DESENHO').set_index('DESENHO')['MDR']
-        )
+    template = template[template['QTDE'] > 0].copy()
+
+    with etapa('mapas'):
+        # Mapas das bases BD, refeitos só quando o arquivo de origem muda
+        cadastro_pn = master.derivado('cadastro_pn', ['pn'], indexar_cadastro_pn)
+        cadastro_mdr = master.derivado('cadastro_mdr', ['mdr'], indexar_cadastro_mdr)
+        mapa_peso_max = db_veiculos.set_index('COD VEICULO')['PESO MAXIMO']
 
+    # --- Enriquecimento do template ---
 
-        # Passo 2: agora que já temos MDR no template, podemos montar a KEY
-        template['KEY'] = template['DESENHO'].astype(str) + '_' + template['MDR'].astype(str)
-        
+    with etapa('mapeamentos') as registro:
+        # Passo 1: primeiro trazer MDR pelo DESENHO, para podermos montar a chave (DESENHO, MDR)
+        template['MDR'] = template['DESENHO'].map(cadastro_pn['mdr_por_desenho'])
+
+        # Passo 2: posição de cada linha na chave composta do cadastro (-1 = não cadastrada)
+        chaves = pd.MultiIndex.from_arrays([template['DESENHO'].astype(str), template['MDR'].astype(str)])
+        por_chave = cadastro_pn['por_chave'].reindex(cadastro_pn['chaves'].get_indexer(chaves))
 
         # Passo 3: enriquecer com os mapas
         template['PESO_MAXIMO'] = template['VEICULO'].map(mapa_peso_max)
         template['MAP_KEY'] = (template['COD IMS'].fillna(template['COD FORNECEDOR']).astype(str).str.split('/').str[0] )
 
-       
         template['MAP_KEY'] = pd.to_numeric(template['MAP_KEY'], errors='coerce')
-        template['FORNECEDOR'] =template['MAP_KEY'].map(mapa_fornecedores)
-       
+        template['FORNECEDOR'] =template['MAP_KEY'].map(cadastro_pn['fornecedores'])
+
         template = template.drop(columns=['MAP_KEY'])
-       
-        template['DESCRIÇÃO MATERIAL'] = template['KEY'].map(mapa_pn)
-        template['MDR'] = template['KEY'].map(mapa_mdr)  # reforça MDR correto do KEY
-        template['DESCRIÇÃO DA EMBALAGEM'] = template['MDR'].map(mapa_descricao_mdr)
-        template['QME'] = template['KEY'].map(mapa_qme)
 
+        template['DESCRIÇÃO MATERIAL'] = por_chave['DESCRIÇÃO'].to_numpy()
+        template['MDR'] = por_chave['MDR'].to_numpy()  # reforça MDR correto da chave
+        por_mdr = cadastro_mdr.reindex(template['MDR'])
+        template['DESCRIÇÃO DA EMBALAGEM'] = por_mdr['DESCRIÇÃO'].to_numpy()
+        template['QME'] = por_chave['QME'].to_numpy()
+        registro['linhas'] = len(template)
+
+    with etapa('quantidades_pesos'):
         template['QTD EMBALAGENS'] = np.ceil(template['QTDE'] / template['QME'])
 
-        template['M³'] = round(template['QTD EMBALAGENS'] * template['MDR'].map(mapa_volume), 1)
-        template['PESO MAT'] = round(template['QTDE'] * template['KEY'].map(mapa_peso_pn), 1)
-        template['PESO MDR'] = round(template['QTD EMBALAGENS'] * template['MDR'].map(mapa_peso_mdr), 1)
+        template['M³'] = round(template['QTD EMBALAGENS'] * por_mdr['VOLUME'].to_numpy(), 1)
+        template['PESO MAT'] = round(template['QTDE'] * por_chave['PESO (Kg) MATERIAL'].to_numpy(), 1)
+        template['PESO MDR'] = round(template['QTD EMBALAGENS'] * por_mdr['MDR PESO'].to_numpy(), 1)
         template['PESO TOTAL'] = template['PESO MAT'] + template['PESO MDR']
 
+    return compactar_template(template[[
+        'COD FORNECEDOR', 'FORNECEDOR', 'COD DESTINO', 'DESENHO', 'QTDE', 'DESCRIÇÃO MATERIAL',
+        'MDR', 'DESCRIÇÃO DA EMBALAGEM', 'QME', 'QTD EMBALAGENS', 'TIPO SATURACAO',
+        'VEICULO', 'M³', 'PESO MAT', 'PESO MDR', 'PESO TOTAL', 'PESO_MAXIMO']])
+
+
+def agrupar_por_embalagem(template):
+    """Base da aba Saturação: TOTAL DE CXS por fornecedor + embalagem (MDR)."""
+    df_saturacao = (
+        template.groupby(['COD FORNECEDOR', 'FORNECEDOR', 'MDR'], as_index=False, observed=True)['QTD EMBALAGENS']
+        .sum()
+        .rename(columns={'MDR': 'EMBALAGEM', 'QTD EMBALAGENS': 'TOTAL DE CXS'})
+    )
+    # Uma linha por par: os textos voltam a object para os mapas e regras de linha da aba
+    return df_saturacao.astype({'FORNECEDOR': object, 'EMBALAGEM': object})
+
+
+def paletizar(df_saturacao, db_MDR):
+    """CX_PALETIZÁVEL, CXS_POR_PALLET e CXS/PALLETS_TOTAL de cada linha da aba Saturação."""
+    mapa_paletizavel = db_MDR.drop_duplicates('MDR').set_index('MDR')['CAIXA PLÁSTICA']
+    mapa_cxs_por_pallet = db_MDR.drop_duplicates('MDR').set_index('MDR')['CAIXAS POR PALLET']
+
+    df_saturacao['CX_PALETIZÁVEL'] = df_saturacao['EMBALAGEM'].map(mapa_paletizavel).fillna(0).astype(int)
+    df_saturacao['CXS_POR_PALLET'] = df_saturacao.apply(
+        lambda row: 1 if row['CX_PALETIZÁVEL'] != 1 else (
+            mapa_cxs_por_pallet.get(row['EMBALAGEM'], 1) or 1), axis=1
+    )
+    df_saturacao['CXS/PALLETS_TOTAL'] = df_saturacao['TOTAL DE CXS'] / df_saturacao['CXS_POR_PALLET']
+    return df_saturacao
+
+
+def marcar_empilhaveis(df_saturacao, db_empilhamento):
+    """EMBALAGEM_BASE / EMBALAGEM_SOBREPOSTA: 1 se o par (fornecedor, embalagem) aparece no db_empilhamento."""
+    bases = set(zip(db_empilhamento['FORNECEDOR'], db_empilhamento['MDR BASE']))
+    sobrepostas = set(zip(db_empilhamento['FORNECEDOR'], db_empilhamento['MDR SOBREPOSTA']))
+    df_saturacao['EMBALAGEM_BASE'] = df_saturacao.apply(
+        lambda row: 1 if (row['FORNECEDOR'], row['EMBALAGEM']) in bases else 0, axis=1)
+    df_saturacao['EMBALAGEM_SOBREPOSTA'] = df_saturacao.apply(
+        lambda row: 1 if (row['FORNECEDOR'], row['EMBALAGEM']) in sobrepostas else 0, axis=1)
+    return df_saturacao
+
+
+def avisar_capacidade_anterior(df_saturacao):
+    """
+    Reporta de uma vez as falhas de consulta da capacidade do veículo anterior
+    (apenas onde existe veículo anterior definido) da aba Saturação.
+    """
+    veic_anterior = df_saturacao['VEICULO'].map(VEICULO_ANTERIOR)
+    faltantes = df_saturacao.loc[
+        veic_anterior.notna() & df_saturacao['CAPACIDADE_VEIC_ANTERIOR'].isna(), ['EMBALAGEM', 'VEICULO']
+    ].drop_duplicates()
+    if not faltantes.empty:
+        exemplos = ', '.join(f"{m} (veic {v})" for m, v in faltantes.head(10).itertuples(index=False))
+        mensagem = (f"Capacidade do veículo anterior não encontrada para {len(faltantes)} "
+                    f"combinação(ões) MDR x veículo: {exemplos}{' ...' if len(faltantes) > 10 else ''}")
+        print(f"[ERRO] {mensagem}")
+        logger.warning(mensagem)
+
+
+@medir('saturacao', linhas=lambda retorno: len(retorno[1]))
+def calcular_saturacao(template, veiculo, master=None, avisar=True):
+    """
+    Calcula a aba Saturação (por fornecedor + embalagem), o empilhamento e as
+    colunas SAT VOLUME (%), SAT PESO (%) e CAPACIDADE ÚTIL (%) do template enriquecido.
 
-        template = template[['COD FORNECEDOR', 'FORNECEDOR', 'COD DESTINO', 'DESENHO', 'QTDE', 'DESCRIÇÃO MATERIAL',
-                             'MDR', 'DESCRIÇÃO DA EMBALAGEM', 'QME', 'QTD EMBALAGENS', 'TIPO SATURACAO',
-                             'VEICULO', 'M³', 'PESO MAT', 'PESO MDR', 'PESO TOTAL', 'PESO_MAXIMO']]
+    avisar=False deixa o aviso de capacidade do veículo anterior para quem
+    chama (o cálculo paralelo avisa uma vez, com a aba Saturação juntada).
 
-        # --- Construção da aba Saturação ---
-        df_saturacao = (
-            template.groupby(['COD FORNECEDOR', 'FORNECEDOR', 'MDR'], as_index=False)['QTD EMBALAGENS']
-            .sum()
-            .rename(columns={'MDR': 'EMBALAGEM', 'QTD EMBALAGENS': 'TOTAL DE CXS'})
-        )
+    Retorna (template, df_saturacao, df_calculo_empilhamento).
+    """
+    if master is None:
+        master = obter_master_data()
+
+    db_MDR = master.tabela('mdr')
+    db_veiculos = master.tabela('veiculos')
+    db_empilhamento = master.tabela('empilhamento')
+    db_efi = master.tabela('efi')
+
+    # --- Construção da aba Saturação ---
+    with etapa('agrupamento') as registro:
+        df_saturacao = agrupar_por_embalagem(template)
 
         # Recupera a coluna VEICULO para cada fornecedor + embalagem
         col_veiculo = template[['COD FORNECEDOR', 'MDR', 'VEICULO']].drop_duplicates()
-        col_veiculo = col_veiculo.rename(columns={'MDR': 'EMBALAGEM'})
+        col_veiculo = col_veiculo.rename(columns={'MDR': 'EMBALAGEM'}).astype({'EMBALAGEM': object})
 
         df_saturacao = df_saturacao.merge(col_veiculo, on=['COD FORNECEDOR', 'EMBALAGEM'], how='left')
 
-        mapa_paletizavel = db_MDR.drop_duplicates('MDR').set_index('MDR')['CAIXA PLÁSTICA']
-        mapa_cxs_por_pallet = db_MDR.drop_duplicates('MDR').set_index('MDR')['CAIXAS POR PALLET']
-
-        df_saturacao['CX_PALETIZÁVEL'] = df_saturacao['EMBALAGEM'].map(mapa_paletizavel).fillna(0).astype(int)
-        df_saturacao['CXS_POR_PALLET'] = df_saturacao.apply(
-            lambda row: 1 if row['CX_PALETIZÁVEL'] != 1 else (
-                mapa_cxs_por_pallet.get(row['EMBALAGEM'], 1) or 1), axis=1
-        )
-        df_saturacao['CXS/PALLETS_TOTAL'] = df_saturacao['TOTAL DE CXS'] / df_saturacao['CXS_POR_PALLET']
+        paletizar(df_saturacao, db_MDR)
+        registro['linhas'] = len(df_saturacao)
 
+    with etapa('capacidade') as registro:
         valor_veiculo = db_veiculos.loc[db_veiculos['COD VEICULO'] == veiculo, 'VEICULOS'].iloc[0]
-        # Mapeia de código do veículo (ex: 4) → coluna de capacidade no db_MDR (ex: "14 x 2,4 x 2,78")
-        mapa_coluna_capacidade = db_veiculos.set_index('COD VEICULO')['VEICULOS'].to_dict()
-        
-
-        # Garante que os MDRs na base estejam em caixa alta
-        db_MDR['MDR'] = db_MDR['MDR'].astype(str).str.upper()
-
-        
-        def obter_veiculo_anterior(cod_veic):
-            if cod_veic in [4, 5, 6, 7, 8, 9, 14]:
-                return 3
-            elif cod_veic in [2, 3, 12, 13, 15, 16, 17, 18]:
-                return 1
-            elif cod_veic == 1:
-                return 10
-            elif cod_veic == 10:
-                return 11
-            elif cod_veic == 11:
-                return 11
-            return None
-
-        def obter_capacidade_por_linha(row):
-            mdr = str(row['EMBALAGEM']).upper()  # Converte para string e caixa alta
-            cod_veic = row['VEICULO']
-            coluna = mapa_coluna_capacidade.get(cod_veic)
-
-            if not coluna:
-                # print(f"[ERRO] Código de veículo {cod_veic} não mapeado.")
-                return None
-            if coluna not in db_MDR.columns:
-                # print(f"[ERRO] Coluna '{coluna}' não encontrada no db_MDR para veículo {cod_veic}")
-                return None
-
-            filtro = db_MDR['MDR'] == mdr
-            capacidade_series = db_MDR.loc[filtro, coluna].dropna()
-
-            if capacidade_series.empty:
-                # print(f"[ERRO] Capacidade não encontrada para MDR {mdr} na coluna '{coluna}' (cod veic {cod_veic})")
-                return None
-
-            return capacidade_series.values[0]
-
-        def obter_capacidade_por_linha_veic_anterior(row):
-
-            mdr = str(row['EMBALAGEM']).upper()
-            cod_veic = int(row['VEICULO'])
-            veic_anterior = obter_veiculo_anterior(cod_veic)
-           
-            if veic_anterior is None :
-                # print(f"[INFO] Veículo anterior não definido para código {cod_veic}")
-                return None
-
-            coluna = mapa_coluna_capacidade.get(veic_anterior)
-
-            if not coluna:
-                # print(f"[ERRO] Código de veículo anterior {veic_anterior} não mapeado.")
-                return None
-            
-            if coluna not in db_MDR.columns:
-                # print(f"[ERRO] Coluna '{coluna}' não encontrada no db_MDR para veículo anterior {veic_anterior}")
-                return None
-
-            filtro = db_MDR['MDR'].str.contains(mdr)
-            capacidade_series = db_MDR.loc[filtro, coluna].dropna()
-
-            if capacidade_series.empty:
-                print(
-                    f"[ERRO] Capacidade não encontrada para MDR {mdr} na coluna '{coluna}' (veic anterior {veic_anterior})")
-                return None
-
-            return capacidade_series.values[0]
-
-        df_saturacao['CAPACIDADE'] = df_saturacao.apply(obter_capacidade_por_linha, axis=1)
+        # Capacidade por MDR x veículo (e pelo veículo anterior), montada uma vez por carga das bases
+        matriz_capacidade, matriz_capacidade_anterior = master.derivado(
+            'matriz_capacidade', ['mdr', 'veiculos'], construir_matriz_capacidade)
+
+        mdrs = df_saturacao['EMBALAGEM'].astype(str).str.upper()
+        df_saturacao['CAPACIDADE'] = consultar_capacidade(matriz_capacidade, mdrs, df_saturacao['VEICULO'])
         df_saturacao['VEICULO'] = df_saturacao['VEICULO'].fillna(0)
-        df_saturacao['VEICULO'] = df_saturacao['VEICULO'].astype(int)         
-        df_saturacao['CAPACIDADE_VEIC_ANTERIOR'] = df_saturacao.apply(obter_capacidade_por_linha_veic_anterior, axis=1)
+        df_saturacao['VEICULO'] = df_saturacao['VEICULO'].astype(int)
+        df_saturacao['CAPACIDADE_VEIC_ANTERIOR'] = consultar_capacidade(
+            matriz_capacidade_anterior, mdrs, df_saturacao['VEICULO'])
+        registro['linhas'] = len(df_saturacao)
 
-        
+    if avisar:
+        avisar_capacidade_anterior(df_saturacao)
 
-        df_saturacao['SATURAÇÃO COM VEÍCULO MENOR (%)'] = round(
-            df_saturacao['CXS/PALLETS_TOTAL'] / df_saturacao['CAPACIDADE_VEIC_ANTERIOR'] * 100, 2
-        )
+    df_saturacao['SATURAÇÃO COM VEÍCULO MENOR (%)'] = round(
+        df_saturacao['CXS/PALLETS_TOTAL'] / df_saturacao['CAPACIDADE_VEIC_ANTERIOR'] * 100, 2
+    )
 
-        bases = set(zip(db_empilhamento['FORNECEDOR'], db_empilhamento['MDR BASE']))
-        sobrepostas = set(zip(db_empilhamento['FORNECEDOR'], db_empilhamento['MDR SOBREPOSTA']))
-        df_saturacao['EMBALAGEM_BASE'] = df_saturacao.apply(
-            lambda row: 1 if (row['FORNECEDOR'], row['EMBALAGEM']) in bases else 0, axis=1)
-        df_saturacao['EMBALAGEM_SOBREPOSTA'] = df_saturacao.apply(
-            lambda row: 1 if (row['FORNECEDOR'], row['EMBALAGEM']) in sobrepostas else 0, axis=1)
+    marcar_empilhaveis(df_saturacao, db_empilhamento)
 
-        df_saturacao['CHAVE'] = df_saturacao['COD FORNECEDOR'].astype(str) + '-' + df_saturacao['EMBALAGEM'].astype(str)
+    df_saturacao['CHAVE'] = df_saturacao['COD FORNECEDOR'].astype(str) + '-' + df_saturacao['EMBALAGEM'].astype(str)
 
 
-        # --- Eficiência de empilhamento por embalagem (evita .map com índice duplicado) ---
+    # --- Eficiência de empilhamento por embalagem (evita .map com índice duplicado) ---
+    with etapa('eficiencia'):
         mapa_efi = db_efi.drop_duplicates('CHAVE FORNE + MDR').set_index('CHAVE FORNE + MDR')[valor_veiculo]
         df_saturacao['EFICIÊNCIA_COMPRIMENTO'] = df_saturacao['CHAVE'].map(mapa_efi).fillna(1)
 
@@ -589,301 +684,725 @@ def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao
         df_saturacao['M³ POR EMBALAGEM'] = df_saturacao['CHAVE'].map(mapa_volume_efi) * \
                                             df_saturacao['CXS_POR_PALLET'] * df_saturacao['CXS/PALLETS_TOTAL']
 
-        # --- Cálculo de empilhamento ---
-        df_calculo_empilhamento = calcular_empilhamento(df_saturacao, db_empilhamento)
+    # --- Cálculo de empilhamento ---
+    with etapa('empilhamento') as registro:
+        regras_empilhamento = master.derivado('regras_empilhamento', ['empilhamento'], indexar_regras_empilhamento)
+        df_calculo_empilhamento = calcular_empilhamento(df_saturacao, db_empilhamento, regras_empilhamento)
 
         # --- Saturação final por embalagem ---
-        def integrar_saturacao_total(df_sat, df_emp):
-            def calcular(row):
-                filtro = (df_emp['FORNECEDOR'] == row['COD FORNECEDOR']) & \
-                         (df_emp['EMBALAGEM_BASE'] == row['EMBALAGEM'])
-                soma_saturacoes = df_emp[filtro]['SATURAÇÃO'].sum()
-                proporcao = row['CXS/PALLETS_TOTAL'] / row['CAPACIDADE']
-                return (proporcao + soma_saturacoes) * row['EFICIÊNCIA_COMPRIMENTO']
-
-            df_sat['SATURAÇÃO_TOTAL'] = df_sat.apply(calcular, axis=1)
-            df_sat['SATURAÇÃO_POR_MDR'] = df_sat['SATURAÇÃO_TOTAL'] / df_sat['TOTAL DE CXS']
-            return df_sat
-
-        if not df_calculo_empilhamento.empty:
-            df_saturacao = integrar_saturacao_total(df_saturacao, df_calculo_empilhamento)
-        else:
-            df_saturacao['SATURAÇÃO_TOTAL'] = df_saturacao.apply(
-                lambda row: row['CXS/PALLETS_TOTAL'] / row['CAPACIDADE'], axis=1)
-            df_saturacao['SATURAÇÃO_POR_MDR'] = df_saturacao['SATURAÇÃO_TOTAL'] / df_saturacao['TOTAL DE CXS']
-
-        # --- Cálculo da SAT por linha ---
-        template.loc[:, 'CHAVE'] = template['COD FORNECEDOR'].astype(str) + '-' + template['MDR'].astype(str)
-        template = template.merge(df_saturacao[['CHAVE', 'SATURAÇÃO_POR_MDR']], on='CHAVE', how='left')
+        df_saturacao = integrar_saturacao_total(df_saturacao, df_calculo_empilhamento)
+        registro['linhas'] = len(df_calculo_empilhamento)
+
+    # --- Cálculo da SAT por linha ---
+    with etapa('sat_linhas') as registro:
+        # Join por (COD FORNECEDOR, MDR) com a embalagem na mesma codificação do template
+        saturacao_por_mdr = pd.DataFrame({
+            'COD FORNECEDOR': df_saturacao['COD FORNECEDOR'].to_numpy(),
+            'MDR': mesma_codificacao(df_saturacao['EMBALAGEM'], template['MDR']),
+            'SATURAÇÃO_POR_MDR': df_saturacao['SATURAÇÃO_POR_MDR'].to_numpy(),
+        })
+        template = template.merge(saturacao_por_mdr, on=['COD FORNECEDOR', 'MDR'], how='left')
         template['SAT VOLUME (%)'] = round(template['QTD EMBALAGENS'] * template['SATURAÇÃO_POR_MDR'] * 100, 2)
         template['SAT PESO (%)'] = round(template['PESO TOTAL'] / template['PESO_MAXIMO'] * 100, 2)
-        
+
         # --- Capacidade Útil Calculations (A-D) ---
         # C) Combined - limiting factor per row
         template['CAPACIDADE ÚTIL (%)'] = template[['SAT VOLUME (%)', 'SAT PESO (%)']].max(axis=1)
-        
-        template.drop(columns=['CHAVE', 'SATURAÇÃO_POR_MDR'], inplace=True)
-        df_saturacao.drop(columns=['CHAVE'], inplace=True)
-
-        # --- Criação das variáveis para a tabela final ---
-
-        ocupacao = template['SAT VOLUME (%)'].sum()
-        qtd_veiculos = ceil(ocupacao / 100)
-        volume = template['M³'].sum()
-        peso = template['PESO TOTAL'].sum()
-        embalagens = template['QTD EMBALAGENS'].sum()
-        
-        # Get vehicle capacity from db_veiculos
-        capacidade_veiculo_m3 = None
-        capacidade_veiculo_kg = None
-        if not template.empty and 'PESO_MAXIMO' in template.columns:
-            capacidade_veiculo_kg = template['PESO_MAXIMO'].iloc[0] if template['PESO_MAXIMO'].notna().any() else None
-        
-        # Get volume capacity from db_veiculos
-        try:
-            veiculo_info = db_veiculos[db_veiculos['COD VEICULO'] == veiculo]
-            if not veiculo_info.empty and 'CAPACIDADE M³' in veiculo_info.columns:
-                capacidade_veiculo_m3 = veiculo_info['CAPACIDADE M³'].iloc[0]
-        except:
-            pass
-        
-        # --- Capacidade Útil Calculations for Summary ---
-        # A) Volume-based capacity per vehicle
-        cap_util_volume_percent = (ocupacao / qtd_veiculos) if qtd_veiculos > 0 else 0
-        cap_util_volume_m3 = (volume / qtd_veiculos) if qtd_veiculos > 0 else 0
-        
-        # D) Remaining capacity
-        volume_restante = (capacidade_veiculo_m3 * qtd_veiculos - volume) if capacidade_veiculo_m3 else None
-
-        # Preenche a tree_resumo (que deve ser passada como argumento)
-        resumo_dados = [
-            ("Ocupação Total", f"{ocupacao:.2f}%"),
-            ("Qtd Veículos", qtd_veiculos),
-            ("Volume Total", f"{volume:.1f} m³"),
-            ("Peso Total", f"{peso:.1f} kg"),
-            ("Embalagens", int(embalagens)),
-            ("Cap. Útil (m³)", f"{cap_util_volume_m3:.1f} m³"),
-            ("Cap. Útil (%)", f"{cap_util_volume_percent:.2f}%"),
-        ]
-        
-        # Add remaining capacity if available
-        if volume_restante is not None and volume_restante >= 0:
-            resumo_dados.append(("Volume Restante", f"{volume_restante:.1f} m³"))
-
-        linhas_validas = template[
-            (template['DESENHO'].notna()) &
-            (template['COD FORNECEDOR'].notna()) &
-            (template['QTDE'] > 0)
-            ].shape[0]
-
-        linha_qme = template[
-            (template['QME'] > 0) &
-            (template['QTDE'] > 0)
-            ].shape[0]
-
-        # Limpa e atualiza a tabela tree_resumo
-        tree_resumo.delete(*tree_resumo.get_children())
-        for item in resumo_dados:
-            tree_resumo.insert("", END, values=item)
-
-
-        # --- Atualiza TreeView (Tkinter) ---
-        tree.delete(*tree.get_children())
-        tree["columns"] = list(template.columns)
-        tree["show"] = "headings"
-        
-        # Define reasonable initial widths for each column
-        column_widths = {
-            'COD FORNECEDOR': 140,
-            'FORNECEDOR': 280,
-            'COD DESTINO': 140,
-            'DESENHO': 150,
-            'QTDE': 90,
-            'DESCRIÇÃO MATERIAL': 350,
-            'MDR': 120,
-            'DESCRIÇÃO DA EMBALAGEM': 280,
-            'QME': 90,
-            'QTD EMBALAGENS': 140,
-            'TIPO SATURACAO': 140,
-            'VEICULO': 120,
-            'M³': 90,
-            'PESO MAT': 110,
-            'PESO MDR': 110,
-            'PESO TOTAL': 120,
-            'PESO_MAXIMO': 140,
-            'SAT VOLUME (%)': 140,
-            'SAT PESO (%)': 140,
-            'CAPACIDADE ÚTIL (%)': 150
-        }
-        
-        for col in template.columns:
-            tree.heading(col, text=col)
-            width = column_widths.get(col, 150)  # Default to 150 if not specified
-            tree.column(col, width=width, anchor="center", stretch=True, minwidth=80)
-        
-        for _, row in template.iterrows():
-            tree.insert("", END, values=list(row))
-
-        desenhar_caminhoes(canvas_caminhoes, ocupacao, caminhao_img)
-
-        # --- Exporta para Excel formatado ---
-        with pd.ExcelWriter('VIAJANTE.xlsx', engine='openpyxl') as writer:
-            template.to_excel(writer, sheet_name='Template Completo', index=False)
-            df_saturacao.to_excel(writer, sheet_name='Saturação', index=False)
-            df_calculo_empilhamento.to_excel(writer, sheet_name='Calculo Empilhamento', index=False)
-
-            header_fill = PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid')
-            header_font = Font(bold=True, color='000000')
-            header_align = Alignment(horizontal='center', vertical='center')
-
-            for sheet_name in ['Template Completo', 'Saturação', 'Calculo Empilhamento']:
-                ws = writer.sheets[sheet_name]
-                for col_num, col in enumerate(ws.iter_cols(min_row=1, max_row=1), 1):
-                    largura = max(len(str(cell.value) or '') for cell in col) + 2
-                    ws.column_dimensions[get_column_letter(col_num)].width = largura
-                for cell in ws[1]:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = header_align
-
-            if 'MDR' in template.columns:
-                pn_nao_cadastrados = template[
-                    template['MDR'].isna() | (template['MDR'].astype(str).str.strip() == '')
-                ].copy()
-
-                # select only the requested columns if they exist in the dataframe
-                cols_to_keep = ['COD FORNECEDOR', 'FORNECEDOR', 'COD DESTINO', 'DESENHO']
-                existing_cols = [c for c in cols_to_keep if c in pn_nao_cadastrados.columns]
-
-                if not pn_nao_cadastrados.empty and existing_cols:
-                    pn_nao_cadastrados = pn_nao_cadastrados[existing_cols]
-                    pn_nao_cadastrados.drop_duplicates(subset=["DESENHO"], inplace=True)
-                    pn_nao_cadastrados.to_excel(writer, sheet_name='PN Não Cadastrados', index=False)
+        registro['linhas'] = len(template)
+
+    template.drop(columns=['SATURAÇÃO_POR_MDR'], inplace=True)
+    df_saturacao.drop(columns=['CHAVE'], inplace=True)
+
+    return template, df_saturacao, df_calculo_empilhamento
+
+
+@medir('resumo', linhas=None)
+def resumir_resultado(template, veiculo, master=None):
+    """Indicadores do quadro de resumo. Retorna (ocupacao, resumo_dados)."""
+    if master is None:
+        master = obter_master_data()
+
+    db_veiculos = master.tabela('veiculos')
+
+    # --- Criação das variáveis para a tabela final ---
+
+    ocupacao = template['SAT VOLUME (%)'].sum()
+    qtd_veiculos = ceil(ocupacao / 100)
+    volume = template['M³'].sum()
+    peso = template['PESO TOTAL'].sum()
+    embalagens = template['QTD EMBALAGENS'].sum()
+
+    # Get vehicle capacity from db_veiculos
+    capacidade_veiculo_m3 = None
+    capacidade_veiculo_kg = None
+    if not template.empty and 'PESO_MAXIMO' in template.columns:
+        capacidade_veiculo_kg = template['PESO_MAXIMO'].iloc[0] if template['PESO_MAXIMO'].notna().any() else None
+
+    # Get volume capacity from db_veiculos
+    try:
+        veiculo_info = db_veiculos[db_veiculos['COD VEICULO'] == veiculo]
+        if not veiculo_info.empty and 'CAPACIDADE M³' in veiculo_info.columns:
+            capacidade_veiculo_m3 = veiculo_info['CAPACIDADE M³'].iloc[0]
+    except:
+        pass
+
+    # --- Capacidade Útil Calculations for Summary ---
+    # A) Volume-based capacity per vehicle
+    cap_util_volume_percent = (ocupacao / qtd_veiculos) if qtd_veiculos > 0 else 0
+    cap_util_volume_m3 = (volume / qtd_veiculos) if qtd_veiculos > 0 else 0
+
+    # D) Remaining capacity
+    volume_restante = (capacidade_veiculo_m3 * qtd_veiculos - volume) if capacidade_veiculo_m3 else None
+
+    # Preenche a tree_resumo (que deve ser passada como argumento)
+    resumo_dados = [
+        ("Ocupação Total", f"{ocupacao:.2f}%"),
+        ("Qtd Veículos", qtd_veiculos),
+        ("Volume Total", f"{volume:.1f} m³"),
+        ("Peso Total", f"{peso:.1f} kg"),
+        ("Embalagens", int(embalagens)),
+        ("Cap. Útil (m³)", f"{cap_util_volume_m3:.1f} m³"),
+        ("Cap. Útil (%)", f"{cap_util_volume_percent:.2f}%"),
+    ]
+
+    # Add remaining capacity if available
+    if volume_restante is not None and volume_restante >= 0:
+        resumo_dados.append(("Volume Restante", f"{volume_restante:.1f} m³"))
+
+    return ocupacao, resumo_dados
+
+
+def listar_pn_nao_cadastrados(template):
+    """Desenhos do template sem MDR cadastrado (aba 'PN Não Cadastrados'), ou None."""
+    if 'MDR' not in template.columns:
+        return None
+
+    pn_nao_cadastrados = template[
+        template['MDR'].isna() | (template['MDR'].astype(str).str.strip() == '')
+    ].copy()
+
+    # select only the requested columns if they exist in the dataframe
+    cols_to_keep = ['COD FORNECEDOR', 'FORNECEDOR', 'COD DESTINO', 'DESENHO']
+    existing_cols = [c for c in cols_to_keep if c in pn_nao_cadastrados.columns]
+
+    if pn_nao_cadastrados.empty or not existing_cols:
+        return None
+
+    pn_nao_cadastrados = pn_nao_cadastrados[existing_cols]
+    pn_nao_cadastrados.drop_duplicates(subset=["DESENHO"], inplace=True)
+    return pn_nao_cadastrados
+
+
+# Abaixo disso o custo de iniciar os processos supera o ganho do cálculo em paralelo
+LINHAS_MINIMAS_PARALELO = 100000
+# Coluna temporária com a posição original da linha, para reordenar o template juntado
+COLUNA_ORDEM = '_ORDEM'
+
+# MasterData de cada processo de trabalho do cálculo paralelo (ver _iniciar_processo_calculo)
+_master_processo = None
+
+
+def particionar_por_fornecedor(template, partes):
+    """
+    Divide o template em até `partes` blocos de fornecedores consecutivos (em
+    ordem de COD FORNECEDOR), com quantidades de linhas parecidas.
+
+    Todas as linhas de um fornecedor, de todos os destinos, ficam no mesmo
+    bloco: a aba Saturação (fornecedor + embalagem) e o empilhamento (pares do
+    mesmo fornecedor) de cada bloco não dependem dos outros.
+    """
+    contagem = template['COD FORNECEDOR'].value_counts(sort=False).sort_index()
+    inicio = (contagem.cumsum() - contagem).to_numpy()
+    bloco = pd.Series(inicio * partes // max(len(template), 1), index=contagem.index)
+    blocos = template['COD FORNECEDOR'].map(bloco).to_numpy()
+    return [parte for _, parte in template.groupby(blocos, sort=True)]
+
+
+def _iniciar_processo_calculo(master):
+    """
+    Inicializador dos processos do cálculo paralelo. Com fork o MasterData (já
+    carregado) é herdado sem cópia; com spawn é recebido uma vez por processo.
+    Só o processo principal grava no log rotativo.
+    """
+    global _master_processo
+    desligar_log_arquivo()
+    _master_processo = master.para_processo_filho()
+
+
+def _calcular_bloco(template, veiculo):
+    """Enriquecimento, saturação e empilhamento de um bloco (processo de trabalho)."""
+    template = enriquecer_template(template, _master_processo)
+    template[COLUNA_ORDEM] = template.index
+    return calcular_saturacao(template, veiculo, _master_processo, avisar=False)
+
+
+def calcular_saturacao_paralela(template, veiculo, master, processos):
+    """
+    Mesmo resultado de enriquecer_template + calcular_saturacao, com o template
+    dividido por fornecedor (particionar_por_fornecedor) e cada bloco calculado
+    num processo. Os blocos são juntados na ordem original das linhas.
+
+    Retorna (template, df_saturacao, df_calculo_empilhamento).
+    """
+    blocos = particionar_por_fornecedor(template, processos)
+    if len(blocos) < 2:
+        return calcular_saturacao(enriquecer_template(template, master), veiculo, master)
+
+    with etapa('calculo_paralelo') as registro:
+        with ProcessPoolExecutor(max_workers=len(blocos), initializer=_iniciar_processo_calculo,
+                                 initargs=(master,)) as pool:
+            partes = list(pool.map(_calcular_bloco, blocos, repeat(veiculo)))
+        registro['linhas'] = sum(len(parte[0]) for parte in partes)
+
+    with etapa('juncao_blocos'):
+        # Cada bloco tem as suas categorias: a junção volta a compactar com as do template inteiro
+        template = pd.concat([parte[0] for parte in partes], ignore_index=True)
+        template = template.sort_values(COLUNA_ORDEM, kind='stable').drop(columns=[COLUNA_ORDEM])
+        template = compactar_template(template.reset_index(drop=True))
+        # Blocos em ordem de fornecedor: a concatenação mantém a ordem do agrupamento
+        df_saturacao = pd.concat([parte[1] for parte in partes], ignore_index=True)
+        empilhamentos = [parte[2] for parte in partes if not parte[2].empty]
+        df_calculo_empilhamento = pd.concat(empilhamentos, ignore_index=True) if empilhamentos else pd.DataFrame()
+    # Um aviso por execução: a mesma combinação MDR x veículo pode faltar em mais de um bloco
+    avisar_capacidade_anterior(df_saturacao)
+    return template, df_saturacao, df_calculo_empilhamento
+
+
+def calcular_viajante(template, veiculo, usar_manual=False, master=None, processos=1):
+    """
+    Executa em memória o enriquecimento, a saturação e o empilhamento de um
+    template de demanda (ver preparar_template).
+
+    processos > 1 divide o cálculo por fornecedor num pool de processos
+    (calcular_saturacao_paralela) quando o template tem ao menos
+    LINHAS_MINIMAS_PARALELO linhas; o resultado é o mesmo do cálculo serial.
+
+    Retorna um dicionário com 'template', 'saturacao', 'empilhamento',
+    'pn_nao_cadastrados', 'ocupacao' e 'resumo'.
+    """
+    if master is None:
+        master = obter_master_data()
+
+    if processos > 1 and len(template) >= LINHAS_MINIMAS_PARALELO:
+        template, df_saturacao, df_calculo_empilhamento = calcular_saturacao_paralela(
+            template, veiculo, master, processos)
+    else:
+        template = enriquecer_template(template, master)
+        template, df_saturacao, df_calculo_empilhamento = calcular_saturacao(template, veiculo, master)
+    ocupacao, resumo_dados = resumir_resultado(template, veiculo, master)
+    print(f"[INFO] {resumo_cache()}")
+
+    return {
+        'template': template,
+        'saturacao': df_saturacao,
+        'empilhamento': df_calculo_empilhamento,
+        'pn_nao_cadastrados': listar_pn_nao_cadastrados(template),
+        'ocupacao': ocupacao,
+        'resumo': resumo_dados,
+    }
+
+
+COLUNAS_COMPARACAO = [
+    'RANKING', 'COD VEICULO', 'VEÍCULO', 'QTD VEÍCULOS', 'OCUPAÇÃO TOTAL (%)', 'SAT PESO TOTAL (%)',
+    'CAPACIDADE ÚTIL TOTAL (%)', 'CAP. ÚTIL (%)', 'CAP. ÚTIL (m³)', 'VOLUME RESTANTE (m³)',
+    'LINHAS SEM CAPACIDADE',
+]
+
+
+@medir('comparacao_veiculos')
+def comparar_veiculos(template, master=None, veiculos=None):
+    """
+    Compara todos os veículos de uma vez sobre o mesmo template enriquecido
+    (saída de enriquecer_template ou o 'template' de calcular_viajante).
+
+    Para cada código de veículo o resultado é o mesmo de uma execução com esse
+    veículo em todas as linhas: capacidade do db_MDR, PESO MAXIMO do VEÍCULOS e
+    eficiência do BD_CADASTRO_MDR_PERDA_COMPRIMENTO. Os pares de empilhamento não
+    dependem do veículo, então são montados uma vez só; as saturações são
+    calculadas em matrizes veículo x linha.
+
+    veiculos: códigos a comparar (padrão: todos com capacidade no db_MDR).
+    Retorna a tabela ordenada pelo ranking (COLUNAS_COMPARACAO).
+    """
+    if master is None:
+        master = obter_master_data()
+
+    db_MDR = master.tabela('mdr')
+    db_veiculos = master.tabela('veiculos')
+    db_empilhamento = master.tabela('empilhamento')
+    db_efi = master.tabela('efi')
+
+    matriz_capacidade, _ = master.derivado(
+        'matriz_capacidade', ['mdr', 'veiculos'], construir_matriz_capacidade)
+    cadastro = db_veiculos.drop_duplicates('COD VEICULO').set_index('COD VEICULO')
+    codigos = [c for c in matriz_capacidade.columns if c in cadastro.index]
+    if veiculos is not None:
+        codigos = [c for c in codigos if c in set(veiculos)]
+    cadastro = cadastro.loc[codigos]
+
+    # --- Aba Saturação sem a coluna VEICULO (igual para todos os veículos) ---
+    df_sat = agrupar_por_embalagem(template)
+    paletizar(df_sat, db_MDR)
+    marcar_empilhaveis(df_sat, db_empilhamento)
+    chaves = df_sat['COD FORNECEDOR'].astype(str) + '-' + df_sat['EMBALAGEM'].astype(str)
+
+    # Capacidade e eficiência: uma linha por veículo, uma coluna por fornecedor + embalagem
+    linhas_mdr = matriz_capacidade.index.get_indexer(pd.Index(df_sat['EMBALAGEM'].astype(str).str.upper()))
+    capacidades = matriz_capacidade[codigos].to_numpy(dtype=float).T
+    capacidade = np.where(linhas_mdr >= 0, capacidades[:, linhas_mdr], np.nan)
+
+    tabela_efi = db_efi.drop_duplicates('CHAVE FORNE + MDR').set_index('CHAVE FORNE + MDR')
+    eficiencia = (tabela_efi.reindex(index=chaves, columns=cadastro['VEICULOS'])
+                  .fillna(1).to_numpy(dtype=float).T)
+
+    # --- Empilhamento: pares montados uma vez, saturação dividida pela capacidade de cada veículo ---
+    regras = master.derivado('regras_empilhamento', ['empilhamento'], indexar_regras_empilhamento)
+    df_emp = _empilhar(df_sat.assign(CAPACIDADE=1.0), regras)
+
+    proporcao = df_sat['CXS/PALLETS_TOTAL'].to_numpy(dtype=float) / capacidade
+    if df_emp.empty:
+        saturacao_total = proporcao
+    else:
+        linhas_base = matriz_capacidade.index.get_indexer(pd.Index(df_emp['EMBALAGEM_BASE'].astype(str).str.upper()))
+        capacidade_base = np.where(linhas_base >= 0, capacidades[:, linhas_base], np.nan)
+        empilhadas = df_emp['TOTAL_EMBALAGENS_EMPILHADAS'].to_numpy(dtype=float)
+        saturacoes = pd.DataFrame((empilhadas / capacidade_base).T, columns=codigos)
+        saturacoes['COD FORNECEDOR'] = df_emp['FORNECEDOR'].to_numpy()
+        saturacoes['EMBALAGEM'] = df_emp['EMBALAGEM_BASE'].to_numpy()
+        soma_saturacoes = saturacoes.groupby(['COD FORNECEDOR', 'EMBALAGEM'], sort=False)[codigos].sum()
+        soma = (df_sat[['COD FORNECEDOR', 'EMBALAGEM']]
+                .merge(soma_saturacoes.reset_index(), on=['COD FORNECEDOR', 'EMBALAGEM'], how='left')[codigos]
+                .fillna(0).to_numpy(dtype=float).T)
+        saturacao_total = (proporcao + soma) * eficiencia
+    saturacao_por_mdr = saturacao_total / df_sat['TOTAL DE CXS'].to_numpy(dtype=float)
+
+    # --- SAT por linha do template (mesmo join por (COD FORNECEDOR, MDR) de calcular_saturacao) ---
+    juncao = template[['COD FORNECEDOR', 'MDR']].assign(LINHA=np.arange(len(template))).merge(
+        pd.DataFrame({'COD FORNECEDOR': df_sat['COD FORNECEDOR'].to_numpy(),
+                      'MDR': mesma_codificacao(df_sat['EMBALAGEM'], template['MDR']),
+                      'POSICAO': np.arange(len(df_sat))}),
+        on=['COD FORNECEDOR', 'MDR'], how='left')
+    linhas = juncao['LINHA'].to_numpy()
+    posicoes = juncao['POSICAO'].to_numpy()
+    encontrados = ~np.isnan(posicoes)
+    por_linha = np.full((len(codigos), len(juncao)), np.nan)
+    por_linha[:, encontrados] = saturacao_por_mdr[:, posicoes[encontrados].astype(np.int64)]
+
+    qtd_embalagens = template['QTD EMBALAGENS'].to_numpy(dtype=float)[linhas]
+    peso_total = template['PESO TOTAL'].to_numpy(dtype=float)[linhas]
+    peso_maximo = pd.to_numeric(cadastro['PESO MAXIMO'], errors='coerce').to_numpy(dtype=float)[:, None]
+
+    sat_volume = np.round(qtd_embalagens * por_linha * 100, 2)
+    sat_peso = np.round(peso_total / peso_maximo * 100, 2)
+    capacidade_util = np.fmax(sat_volume, sat_peso)
+
+    # --- Indicadores do resumo para cada veículo (como em resumir_resultado) ---
+    ocupacao = np.nansum(sat_volume, axis=1)
+    qtd_veiculos = np.ceil(ocupacao / 100)
+    volume = template['M³'].sum()
+    capacidade_m3 = pd.to_numeric(cadastro['CAPACIDADE M³'], errors='coerce').to_numpy(dtype=float)
+    com_veiculo = qtd_veiculos > 0
+    divisor = np.where(com_veiculo, qtd_veiculos, 1)
+
+    comparacao = pd.DataFrame({
+        'COD VEICULO': codigos,
+        'VEÍCULO': cadastro['DESCRIÇÃO'].to_numpy(),
+        'QTD VEÍCULOS': qtd_veiculos.astype(np.int64),
+        'OCUPAÇÃO TOTAL (%)': np.round(ocupacao, 2),
+        'SAT PESO TOTAL (%)': np.round(np.nansum(sat_peso, axis=1), 2),
+        'CAPACIDADE ÚTIL TOTAL (%)': np.round(np.nansum(capacidade_util, axis=1), 2),
+        'CAP. ÚTIL (%)': np.round(np.where(com_veiculo, ocupacao / divisor, 0), 2),
+        'CAP. ÚTIL (m³)': np.round(np.where(com_veiculo, volume / divisor, 0), 1),
+        'VOLUME RESTANTE (m³)': np.round(capacidade_m3 * qtd_veiculos - volume, 1),
+        'LINHAS SEM CAPACIDADE': np.isnan(sat_volume).sum(axis=1),
+    })
+
+    # Ranking: veículos que atendem todas as linhas, com menos veículos e maior aproveitamento primeiro
+    comparacao = comparacao.sort_values(
+        ['LINHAS SEM CAPACIDADE', 'QTD VEÍCULOS', 'CAP. ÚTIL (%)'], ascending=[True, True, False], kind='stable'
+    ).reset_index(drop=True)
+    comparacao['RANKING'] = np.arange(1, len(comparacao) + 1)
+    return comparacao[COLUNAS_COMPARACAO]
+
+
+@medir('preenchimento_tree', linhas=None)
+def preencher_interface(resultado, tree, tree_resumo, canvas_caminhoes, caminhao_img):
+    """
+    Mostra o resultado de calcular_viajante na tela (resumo, tabela e caminhões).
+    tree pode ser um ttk.Treeview ou uma GradeVirtual.
+    """
+    template = resultado['template']
+    resumo_dados = resultado['resumo']
+    ocupacao = resultado['ocupacao']
+
+    # Limpa e atualiza a tabela tree_resumo
+    tree_resumo.delete(*tree_resumo.get_children())
+    for item in resumo_dados:
+        tree_resumo.insert("", "end", values=item)
+
+    # --- Atualiza TreeView (Tkinter) ---
+    # Define reasonable initial widths for each column
+    column_widths = {
+        'COD FORNECEDOR': 140,
+        'FORNECEDOR': 280,
+        'COD DESTINO': 140,
+        'DESENHO': 150,
+        'QTDE': 90,
+        'DESCRIÇÃO MATERIAL': 350,
+        'MDR': 120,
+        'DESCRIÇÃO DA EMBALAGEM': 280,
+        'QME': 90,
+        'QTD EMBALAGENS': 140,
+        'TIPO SATURACAO': 140,
+        'VEICULO': 120,
+        'M³': 90,
+        'PESO MAT': 110,
+        'PESO MDR': 110,
+        'PESO TOTAL': 120,
+        'PESO_MAXIMO': 140,
+        'SAT VOLUME (%)': 140,
+        'SAT PESO (%)': 140,
+        'CAPACIDADE ÚTIL (%)': 150
+    }
+
+    with etapa('tabela') as registro:
+        if isinstance(tree, GradeVirtual):
+            # Grade virtualizada: só as linhas visíveis vão para o Treeview
+            tree.definir_dados(template, column_widths)
+        else:
+            tree.delete(*tree.get_children())
+            tree["columns"] = list(template.columns)
+            tree["show"] = "headings"
+            for col in template.columns:
+                tree.heading(col, text=col)
+                width = column_widths.get(col, 150)  # Default to 150 if not specified
+                tree.column(col, width=width, anchor="center", stretch=True, minwidth=80)
+
+            for _, row in template.iterrows():
+                tree.insert("", "end", values=list(row))
+        registro['linhas'] = len(template)
+
+    desenhar_caminhoes(canvas_caminhoes, ocupacao, caminhao_img)
+
+
+@medir('exportacao_viajante', linhas=None)
+def exportar_viajante(resultado, caminho='VIAJANTE.xlsx'):
+    """
+    Grava o resultado de calcular_viajante no Excel formatado (VIAJANTE.xlsx),
+    em modo write-only (ver exportacao.gravar_abas). Mesmo conteúdo e formatação
+    de exportar_viajante_openpyxl.
+    """
+    abas = [
+        ('Template Completo', resultado['template'], ESTILO_CABECALHO_VIAJANTE, True),
+        ('Saturação', resultado['saturacao'], ESTILO_CABECALHO_VIAJANTE, True),
+        ('Calculo Empilhamento', resultado['empilhamento'], ESTILO_CABECALHO_VIAJANTE, True),
+    ]
+    if resultado['pn_nao_cadastrados'] is not None:
+        abas.append(('PN Não Cadastrados', resultado['pn_nao_cadastrados'], ESTILO_CABECALHO_PANDAS, False))
+    gravar_abas(caminho, abas)
+
+
+def exportar_viajante_openpyxl(resultado, caminho='VIAJANTE.xlsx'):
+    """Gravação original do VIAJANTE.xlsx (pd.ExcelWriter + estilo célula a célula)."""
+    template = resultado['template']
+    df_saturacao = resultado['saturacao']
+    df_calculo_empilhamento = resultado['empilhamento']
+    pn_nao_cadastrados = resultado['pn_nao_cadastrados']
+
+    # --- Exporta para Excel formatado ---
+    with pd.ExcelWriter(caminho, engine='openpyxl') as writer:
+        template.to_excel(writer, sheet_name='Template Completo', index=False)
+        df_saturacao.to_excel(writer, sheet_name='Saturação', index=False)
+        df_calculo_empilhamento.to_excel(writer, sheet_name='Calculo Empilhamento', index=False)
+
+        header_fill = PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid')
+        header_font = Font(bold=True, color='000000')
+        header_align = Alignment(horizontal='center', vertical='center')
+
+        for sheet_name in ['Template Completo', 'Saturação', 'Calculo Empilhamento']:
+            ws = writer.sheets[sheet_name]
+            for col_num, col in enumerate(ws.iter_cols(min_row=1, max_row=1), 1):
+                largura = max(len(str(cell.value) or '') for cell in col) + 2
+                ws.column_dimensions[get_column_letter(col_num)].width = largura
+            for cell in ws[1]:
+                cell.fill = header_fill
+                cell.font = header_font
+                cell.alignment = header_align
+
+        if pn_nao_cadastrados is not None:
+            pn_nao_cadastrados.to_excel(writer, sheet_name='PN Não Cadastrados', index=False)
+
+
+def completar_informacoes(tree, veiculo, tree_resumo, canvas_caminhoes, caminhao_img, usar_manual=False,caminho_BD = 'BD',
+                          master=None, template=None, exportar=True, fila_exportacao=None):
+    """
+    Calcula o VIAJANTE, atualiza a interface e (opcionalmente) exporta o VIAJANTE.xlsx.
+
+    template: template de demanda em memória (ex.: retorno de input_demanda). Se
+    não for informado, é lido do Template.xlsx como antes.
+    fila_exportacao: FilaExportacao opcional; com ela o VIAJANTE.xlsx é gravado em
+    segundo plano e a função retorna assim que a interface está preenchida.
+    Retorna o dicionário de calcular_viajante, ou None em caso de erro.
+    """
+    try:
+        if master is None:
+            master = obter_master_data() if caminho_BD == 'BD' else MasterData(caminho_base, caminho_BD)
+
+        if template is None:
+            template = ler_template()
+        else:
+            template = preparar_template(template)
+
+        resultado = calcular_viajante(template, veiculo, usar_manual, master)
+        preencher_interface(resultado, tree, tree_resumo, canvas_caminhoes, caminhao_img)
+
+        if exportar:
+            if fila_exportacao is not None:
+                fila_exportacao.agendar('VIAJANTE.xlsx', lambda caminho: exportar_viajante(resultado, caminho))
+            else:
+                exportar_viajante(resultado)
+
+        return resultado
 
     except Exception as e:
 
         print(f"Erro: {e}")
 
         traceback.print_exc()
+        logger.exception("Erro em completar_informacoes")
+
+
+# Colunas do template somadas por rota
+COLUNAS_TOTAIS_ROTA = ['M³', 'PESO TOTAL', 'QTD EMBALAGENS', 'SAT VOLUME (%)', 'SAT PESO (%)']
 
 
-def consolidar_dados():
-    # Carrega os dados
-    fluxos_path = os.path.join(caminho_base, "BD", "FLUXO.xlsx")
-    fluxos = pd.read_excel(fluxos_path, sheet_name='FLUXOS')
-    template = pd.read_excel('VIAJANTE.xlsx', sheet_name='Template Completo')
+def separar_codigos_destino(valores):
+    """Série de listas com os códigos de cada célula de destino ('1080/1046' -> ['1080', '1046'])."""
+    return pd.Series(valores).astype(str).str.strip().str.split(r'\s*/\s*', regex=True)
+
+
+def construir_rotas_consolidacao(db_fluxos):
+    """
+    Tabelas de pertencimento das rotas do FLUXO usadas por calcular_volume_por_rota:
+
+        rotas         uma linha por rota (ROTA = posição no FLUXO) com as colunas exibidas
+        fornecedores  (ROTA, POSICAO, COD FORNECEDOR), um código por linha, na ordem da célula
+        destinos      (ROTA, COD DESTINO), um código de destino por linha
+
+    Diferente de construir_indice_rotas, nenhuma rota é descartada: o mesmo
+    fornecedor pode pertencer a várias rotas.
+    """
+    rotas = db_fluxos[['COD FLUXO', 'NOME DESTINO', 'VEICULO PRINCIPAL', 'TIPO SATURACAO',
+                       'TRANSPORTADORA', 'TECNOLOGIA', 'MOT']].reset_index(drop=True)
+    rotas.insert(0, 'ROTA', np.arange(len(rotas)))
+    rotas['SATURA VOLUME'] = rotas['TIPO SATURACAO'].astype(str).str.upper() == 'VOLUME'
+
+    fornecedores = pd.DataFrame({
+        'ROTA': rotas['ROTA'].to_numpy(),
+        'COD FORNECEDOR': db_fluxos['COD FORNECEDOR'].map(normalizar_codigos).to_numpy(),
+    }).explode('COD FORNECEDOR').dropna(subset=['COD FORNECEDOR'])
+    fornecedores['POSICAO'] = fornecedores.groupby('ROTA').cumcount()
+
+    destinos = pd.DataFrame({
+        'ROTA': rotas['ROTA'].to_numpy(),
+        'COD DESTINO': separar_codigos_destino(db_fluxos['COD DESTINO']).to_numpy(),
+    }).explode('COD DESTINO').drop_duplicates()
+
+    return {
+        'rotas': rotas,
+        'fornecedores': fornecedores.reset_index(drop=True),
+        'destinos': destinos.reset_index(drop=True),
+    }
+
+
+def _rotas_por_destino(destinos, rotas_destinos):
+    """
+    Pares (ORDEM DESTINO, ROTA): a rota serve o destino do template quando tem
+    todos os códigos dele. Ex.: a rota '1080/1046' serve '1080', '1046' e
+    '1080/1046'; a rota '1080' não serve '108'.
+    """
+    codigos = pd.DataFrame({
+        'ORDEM DESTINO': np.arange(len(destinos)),
+        'COD DESTINO': separar_codigos_destino(destinos).to_numpy(),
+    }).explode('COD DESTINO').drop_duplicates()
+    necessarios = codigos.groupby('ORDEM DESTINO').size()
+
+    encontrados = codigos.merge(rotas_destinos, on='COD DESTINO').groupby(['ORDEM DESTINO', 'ROTA']).size()
+    completos = encontrados.to_numpy() == necessarios.reindex(encontrados.index.get_level_values(0)).to_numpy()
+    return encontrados[completos].index.to_frame(index=False)
+
+
+@medir('volume_por_rota')
+def calcular_volume_por_rota(template, master=None):
+    """
+    Consolida o template completo (aba 'Template Completo') por rota do FLUXO:
+    volume, peso, embalagens, saturação, cargas e sugestão por rota.
+
+    O template é agregado por (destino, fornecedor) e ligado por join à tabela de
+    pertencimento das rotas (rota, fornecedor, destino); os totais de cada rota
+    saem de agregações agrupadas, sem percorrer as rotas uma a uma. As linhas
+    seguem a ordem dos destinos no template e, dentro de cada um, a do FLUXO.
+    """
+    if master is None:
+        master = obter_master_data()
+    pertencimento = master.derivado('rotas_consolidacao', ['fluxo'], construir_rotas_consolidacao)
+    rotas = pertencimento['rotas']
 
     # Filtra linhas com quantidade válida e prepara as colunas
-    template = template[template['QTDE'] > 0].copy() # Use .copy() to avoid SettingWithCopyWarning
-    template['COD FORNECEDOR'] = template['COD FORNECEDOR'].astype(str)
+    template = template[template['QTDE'] > 0]
+    ordem_destino, destinos = pd.factorize(template['COD DESTINO'])
+    linhas = pd.DataFrame({
+        'ORDEM DESTINO': ordem_destino,
+        'COD FORNECEDOR': template['COD FORNECEDOR'].astype(str).to_numpy(),
+        'FORNECEDOR': template['FORNECEDOR'].astype(object).fillna('').astype(str).to_numpy(),
+        'DESENHO': template['DESENHO'].to_numpy(),
+        **{col: template[col].to_numpy() for col in COLUNAS_TOTAIS_ROTA},
+    })
+    linhas = linhas[linhas['ORDEM DESTINO'] >= 0]
+    chave_fornecedor = ['ORDEM DESTINO', 'COD FORNECEDOR']
+    chave_rota = ['ORDEM DESTINO', 'ROTA']
+
+    with etapa('pertencimento') as registro:
+        # Nomes de cada código na ordem em que aparecem no template do destino
+        nomes = (linhas.drop_duplicates(chave_fornecedor + ['FORNECEDOR'])
+                 .groupby(chave_fornecedor, sort=False)['FORNECEDOR'].agg(', '.join)
+                 .rename('NOMES'))
+        # Um código repetido na célula do FLUXO aparece repetido nas listas, como antes
+        membros = (_rotas_por_destino(destinos, pertencimento['destinos'])
+                   .merge(pertencimento['fornecedores'], on='ROTA')
+                   .merge(nomes.reset_index(), on=chave_fornecedor)
+                   .sort_values(chave_rota + ['POSICAO'], kind='stable'))
+        fornecedores_rota = membros.drop_duplicates(chave_rota + ['COD FORNECEDOR'])[chave_rota + ['COD FORNECEDOR']]
+        registro['linhas'] = len(membros)
+
+    with etapa('totais') as registro:
+        por_fornecedor = linhas.groupby(chave_fornecedor, sort=False)[COLUNAS_TOTAIS_ROTA].sum().reset_index()
+        totais = (fornecedores_rota.merge(por_fornecedor, on=chave_fornecedor)
+                  .groupby(chave_rota)[COLUNAS_TOTAIS_ROTA].sum())
+        listas = membros.groupby(chave_rota)[['COD FORNECEDOR', 'NOMES']].agg(', '.join)
+
+        # Apuração de MDR: desenhos distintos e os que têm saturação no tipo da rota
+        desenhos = (linhas.assign(APURADO_VOLUME=linhas['SAT VOLUME (%)'].fillna(0) > 0,
+                                  APURADO_PESO=linhas['SAT PESO (%)'].fillna(0) > 0)
+                    .groupby(chave_fornecedor + ['DESENHO'], sort=False)[['APURADO_VOLUME', 'APURADO_PESO']]
+                    .any().reset_index())
+        desenhos = (fornecedores_rota.merge(desenhos, on=chave_fornecedor)
+                    .merge(rotas[['ROTA', 'SATURA VOLUME']], on='ROTA'))
+        apurado = np.where(desenhos['SATURA VOLUME'], desenhos['APURADO_VOLUME'], desenhos['APURADO_PESO'])
+        total_desenhos = desenhos.groupby(chave_rota)['DESENHO'].nunique().rename('TOTAL DESENHOS')
+        desenhos_apurados = (desenhos['DESENHO'].where(apurado).groupby([desenhos['ORDEM DESTINO'], desenhos['ROTA']])
+                             .nunique().rename('DESENHOS APURADOS'))
+
+        consolidado = (totais.join(listas).join(total_desenhos).join(desenhos_apurados)
+                       .fillna({'TOTAL DESENHOS': 0, 'DESENHOS APURADOS': 0})
+                       .reset_index().merge(rotas, on='ROTA')
+                       .sort_values(chave_rota, kind='stable'))
+        registro['linhas'] = len(consolidado)
+
+    saturacao = np.where(consolidado['SATURA VOLUME'], consolidado['SAT VOLUME (%)'], consolidado['SAT PESO (%)'])
+    cargas = np.where(saturacao > 0, np.ceil(saturacao / 100), 0).astype(int)
+    volume = consolidado['M³'].to_numpy()
+
+    # --- Coluna de Sugestão ---
+    saturacao_residual = saturacao % 100
+    sugestao = np.select(
+        [(cargas > 0) & (saturacao_residual <= 2), (cargas > 0) & (saturacao_residual <= 50)],
+        ["Cortar coleta do último veículo", "Alterar último veículo para menor porte"],
+        "Manter coleta")
+
+    total = consolidado['TOTAL DESENHOS'].to_numpy()
+    perc_mdr = np.where(total > 0, np.round(consolidado['DESENHOS APURADOS'].to_numpy() / np.maximum(total, 1) * 100, 1), 0.0)
+
+    # --- Capacidade Útil per route ---
+    divisor = np.maximum(cargas, 1)
+    return pd.DataFrame({
+        'COD FLUXO': consolidado['COD FLUXO'].to_numpy(),
+        'COD DESTINO': np.asarray(destinos, dtype=object)[consolidado['ORDEM DESTINO'].to_numpy()],
+        'DESTINO': consolidado['NOME DESTINO'].to_numpy(),
+        'CÓDIGOS FORNECEDORES': consolidado['COD FORNECEDOR'].to_numpy(),
+        'FORNECEDORES NA ROTA': consolidado['NOMES'].to_numpy(),
+        'VEÍCULO': consolidado['VEICULO PRINCIPAL'].to_numpy(),
+        'TECNOLOGIA': consolidado['TECNOLOGIA'].to_numpy(),
+        'MOT': consolidado['MOT'].to_numpy(),
+        'TRANSPORTADORA': consolidado['TRANSPORTADORA'].to_numpy(),
+        'TIPO DE SATURAÇÃO': consolidado['TIPO SATURACAO'].to_numpy(),
+        'VOLUME TOTAL (m³)': np.round(volume, 1),
+        'PESO TOTAL (kg)': np.round(consolidado['PESO TOTAL'].to_numpy(), 1),
+        'EMBALAGENS TOTAL': consolidado['QTD EMBALAGENS'].to_numpy().astype(int),
+        'SATURAÇÃO TOTAL (%)': np.round(saturacao, 2),
+        'CARGAS': cargas,
+        'CAP. ÚTIL (m³)': np.round(np.where(cargas > 0, volume / divisor, 0), 1),
+        'CAP. ÚTIL (%)': np.round(np.where(cargas > 0, saturacao / divisor, 0), 2),
+        'SUGESTÃO': sugestao,
+        '% MDRs APURADOS': perc_mdr,
+    })
+
+
+def consolidar_dados(master=None, template=None, exportar=True, fila_exportacao=None):
+    """
+    Gera o Volume_por_rota.xlsx. Sem `template`, usa a aba 'Template Completo'
+    do VIAJANTE.xlsx; com ele (ex.: resultado['template']), tudo fica em memória.
+    Com `fila_exportacao` a gravação é feita em segundo plano.
+    """
+    if template is None:
+        template = pd.read_excel('VIAJANTE.xlsx', sheet_name='Template Completo')
+
+    df_volume = calcular_volume_por_rota(template, master)
+    if exportar:
+        if fila_exportacao is not None:
+            fila_exportacao.agendar('Volume_por_rota.xlsx',
+                                    lambda caminho: df_volume.to_excel(caminho, index=False))
+        else:
+            df_volume.to_excel('Volume_por_rota.xlsx', index=False)
+    return df_volume
+
 
+def chave_pipeline(cod_destinos, veiculo, usar_manual=False, master=None):
+    """Chave de executar_pipeline no CacheResultados (demandas, destinos, veículo, modo e bases BD)."""
+    if master is None:
+        master = obter_master_data()
+    return chave_resultado(master, os.path.join(caminho_base, "Demandas"), cod_destinos, veiculo, usar_manual)
 
-    # --- FIX: Ensure the supplier name column is also a string ---
-    template['FORNECEDOR'] = template['FORNECEDOR'].fillna('').astype(str)
-
-
-    def normalizar_codigos(campo):
-        if pd.isna(campo):
-            return []
-        return re.split(r'\s*/\s*', str(campo).strip())
-
-    dados_volume = []
-
-    for cod_dest in template['COD DESTINO'].dropna().unique():
-        subset_template = template[template['COD DESTINO'] == cod_dest]
-
-        fornecedores_template_set = set()
-        for cod in subset_template['COD FORNECEDOR'].astype(str):
-            fornecedores_template_set.update(normalizar_codigos(cod))
-
-        rotas_destino = fluxos[fluxos['COD DESTINO'].astype(str).str.contains(str(cod_dest))]
-
-       
-        
-        for _, rota in rotas_destino.iterrows():
-            cod_fluxo = rota['COD FLUXO']
-            destino = rota['NOME DESTINO']
-            veiculo = rota['VEICULO PRINCIPAL']
-            tipo_saturacao = rota['TIPO SATURACAO']
-            transportadora = rota['TRANSPORTADORA']
-            fornecedores_rota = normalizar_codigos(rota['COD FORNECEDOR'])
-
-            fornecedores_comuns = [f for f in fornecedores_rota if f in fornecedores_template_set]
-
-            if fornecedores_comuns:
-                linhas_rota = subset_template[subset_template['COD FORNECEDOR'].astype(str).isin(fornecedores_comuns)]
-
-                volume_total = linhas_rota['M³'].sum()
-                peso_total = linhas_rota['PESO TOTAL'].sum()
-                embalagens_total = linhas_rota['QTD EMBALAGENS'].sum()
-
-                if tipo_saturacao.upper() == 'VOLUME':
-                    saturacao_total = linhas_rota['SAT VOLUME (%)'].sum()
-                else:
-                    saturacao_total = linhas_rota['SAT PESO (%)'].sum()
-
-                nomes_fornecedores = linhas_rota[['COD FORNECEDOR', 'FORNECEDOR']].drop_duplicates()
-                nomes_fornecedores['COD FORNECEDOR'] = nomes_fornecedores['COD FORNECEDOR'].astype(str)
-
-                nomes_ordenados = nomes_fornecedores.set_index('COD FORNECEDOR').loc[fornecedores_comuns]['FORNECEDOR'].tolist()
-
-
-              
-
-
-                cargas = ceil(saturacao_total / 100) if saturacao_total > 0 else 0
-
-                # --- Coluna de Sugestão ---
-                saturacao_residual = saturacao_total % 100
-                if cargas > 0 and saturacao_residual <= 2:
-                    sugestao = "Cortar coleta do último veículo"
-                elif cargas > 0 and saturacao_residual <= 50:
-                    sugestao = "Alterar último veículo para menor porte"
-                else:
-                    sugestao = "Manter coleta"
-
-                # --- Apuração de MDR ---
-                coluna_sat = 'SAT VOLUME (%)' if tipo_saturacao.upper() == 'VOLUME' else 'SAT PESO (%)'
-                
-                linhas_template_todas = subset_template[
-                    subset_template['COD FORNECEDOR'].astype(str).isin(fornecedores_comuns)]
-
-                total_desenhos = linhas_template_todas['DESENHO'].nunique()
-                desenhos_apurados = linhas_template_todas[
-                    linhas_template_todas[coluna_sat].fillna(0) > 0
-                    ]['DESENHO'].nunique()
-
-                perc_mdr = round((desenhos_apurados / total_desenhos) * 100, 1) if total_desenhos else 0.0
-
-                # --- Capacidade Útil per route ---
-                cap_util_volume_rota_m3 = (volume_total / cargas) if cargas > 0 else 0
-                cap_util_volume_rota_percent = (saturacao_total / cargas) if cargas > 0 else 0
-
-                dados_volume.append({
-                    'COD FLUXO': cod_fluxo,
-                    'COD DESTINO': cod_dest,
-                    'DESTINO': destino,
-                    'CÓDIGOS FORNECEDORES': ', '.join(fornecedores_comuns),
-                    'FORNECEDORES NA ROTA': ', '.join(nomes_ordenados),
-                    'VEÍCULO': veiculo,
-                    'TECNOLOGIA': rota['TECNOLOGIA'],
-                    'MOT': rota['MOT'],
-                    'TRANSPORTADORA': transportadora,
-                    'TIPO DE SATURAÇÃO': tipo_saturacao,
-                    'VOLUME TOTAL (m³)': round(volume_total, 1),
-                    'PESO TOTAL (kg)': round(peso_total, 1),
-                    'EMBALAGENS TOTAL': int(embalagens_total),
-                    'SATURAÇÃO TOTAL (%)': round(saturacao_total, 2),
-                    'CARGAS': cargas,
-                    'CAP. ÚTIL (m³)': round(cap_util_volume_rota_m3, 1),
-                    'CAP. ÚTIL (%)': round(cap_util_volume_rota_percent, 2),
-                    'SUGESTÃO': sugestao,
-                    '% MDRs APURADOS': perc_mdr
-                })
-
-    df_volume = pd.DataFrame(dados_volume)
-    df_volume.to_excel('Volume_por_rota.xlsx', index=False)
-#tree = ttk.Treeview()
-#tree_resumo = ttk.Treeview()
-#completar_informacoes(tree,3, tree_resumo)
 
+def executar_pipeline(cod_destinos, veiculo, codigo_veiculo, usar_manual=False, master=None, workers=1,
+                      cancelado=None, cache=None, processos=1):
+    """
+    Pipeline completo em memória: demanda -> template enriquecido -> saturação
+    -> volume por rota. Nenhum arquivo é gravado; use exportar_resultado para isso.
+
+    cancelado: função opcional consultada entre as etapas; se retornar True a
+    execução é interrompida com ExecucaoCancelada.
+    cache: CacheResultados opcional; uma combinação já calculada (mesmas demandas,
+    destinos, veículo, modo e bases BD) é devolvida sem recalcular.
+    processos: processos do cálculo de saturação (ver calcular_viajante).
+    Retorna o dicionário de calcular_viajante acrescido de 'demanda' e 'volume_por_rota'.
+    """
+    if master is None:
+        master = obter_master_data()
+
+    chave = None
+    if cache is not None:
+        chave = chave_pipeline(cod_destinos, veiculo, usar_manual, master)
+        em_cache = cache.obter(chave)
+        if em_cache is not None:
+            print(f"[CACHE] Resultado reaproveitado ({cache.resumo()})")
+            return dict(em_cache)
+
+    demanda = montar_demanda(cod_destinos, codigo_veiculo, master, workers)
+    verificar_cancelamento(cancelado)
+    resultado = calcular_viajante(preparar_template(demanda), veiculo, usar_manual, master, processos)
+    verificar_cancelamento(cancelado)
+    resultado['demanda'] = demanda
+    resultado['volume_por_rota'] = calcular_volume_por_rota(resultado['template'], master)
+    if cache is not None:
+        cache.guardar(chave, resultado)
+    return resultado
+
+
+def exportar_resultado(resultado, pasta='.'):
+    """Grava Template.xlsx, VIAJANTE.xlsx e Volume_por_rota.xlsx de um resultado de executar_pipeline."""
+    if 'demanda' in resultado:
+        resultado['demanda'].to_excel(os.path.join(pasta, 'Template.xlsx'), index=False)
+    exportar_viajante(resultado, os.path.join(pasta, 'VIAJANTE.xlsx'))
+    if 'volume_por_rota' in resultado:
+        resultado['volume_por_rota'].to_excel(os.path.join(pasta, 'Volume_por_rota.xlsx'), index=False)
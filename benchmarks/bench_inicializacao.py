@@ -0,0 +1,155 @@
+"""
+Benchmark da inicialização da interface do VIAJANTE.
+
+Cada medida roda num processo Python novo (nada importado ou em cache de memória):
+    importacoes_janela      módulos que o main.py importa antes de abrir a janela
+    importacoes_calculo     camada de cálculo e exportação (DB, pandas, numpy, openpyxl),
+                            carregada em segundo plano depois que a janela aparece
+    veiculos_cache          lista de veículos lida do .cache_viajante/veiculos.json
+    veiculos_planilha       lista de veículos lida do VEÍCULOS.xlsx (sem cache em disco)
+
+O "tempo até a janela" é importacoes_janela + veiculos_cache (a criação dos widgets
+não é medida, pois exige display); na aplicação o valor real vai para
+logs/viajante.log ("Inicialização: janela pronta em ...").
+
+Exemplo:
+    python benchmarks/bench_inicializacao.py --dados benchmarks/dados/1000
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_REPOSITORIO = os.path.dirname(PASTA_BENCHMARKS)
+
+VERSAO_FORMATO = 1
+
+# Código de cada medida; roda com a pasta de dados como diretório atual
+MEDIDAS = {
+    'importacoes_janela': (
+        "import tkinter, tkinter.ttk\n"
+        "import cache_resultados, execucao, instrumentacao, veiculos\n"
+    ),
+    'importacoes_calculo': (
+        "import DB, exportacao, filtros, grade_virtual, master_data\n"
+    ),
+    'veiculos_cache': (
+        "import veiculos\n"
+        "veiculos.read_cached_vehicles(os.getcwd())\n"
+    ),
+    'veiculos_planilha': (
+        "import veiculos\n"
+        "from master_data import MasterData\n"
+        "veiculos.load_veiculos(os.getcwd(), MasterData(os.getcwd()))\n"
+    ),
+}
+
+MODELO = """
+import contextlib, io, json, os, sys, time
+sys.path.insert(0, {repositorio!r})
+inicio = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+{codigo}
+print(json.dumps(time.perf_counter() - inicio))
+"""
+
+
+def medir(codigo, pasta, ambiente):
+    """Segundos gastos por `codigo` num processo novo."""
+    script = MODELO.format(repositorio=PASTA_REPOSITORIO,
+                           codigo="".join(f"    {linha}\n" for linha in codigo.splitlines()))
+    saida = subprocess.run([sys.executable, "-c", script], cwd=pasta, env=ambiente,
+                           capture_output=True, text=True, check=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def _preparar_pasta(dados):
+    """Cópia da pasta BD numa pasta temporária, com o veiculos.json já gravado."""
+    pasta = tempfile.mkdtemp(prefix="viajante_inicializacao_")
+    shutil.copytree(os.path.join(dados, "BD"), os.path.join(pasta, "BD"))
+    sys.path.insert(0, PASTA_REPOSITORIO)
+    from veiculos import refresh_vehicle_cache
+    from master_data import MasterData
+    anterior = os.getcwd()
+    os.chdir(pasta)
+    try:
+        refresh_vehicle_cache(pasta, MasterData(pasta))
+    finally:
+        os.chdir(anterior)
+    # A leitura da planilha deve ser medida sem o cache de DataFrames
+    for nome in os.listdir(os.path.join(pasta, ".cache_viajante")):
+        if nome.endswith(".pkl"):
+            os.remove(os.path.join(pasta, ".cache_viajante", nome))
+    return pasta
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PASTA_REPOSITORIO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return 'desconhecido'
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da inicialização do VIAJANTE.")
+    parser.add_argument('--dados', default=os.path.join(PASTA_BENCHMARKS, 'dados', '1000'),
+                        help="pasta com BD/ (ex.: gerada por gerar_dados.py)")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--saida', help="arquivo JSON de resultado")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    if not os.path.isdir(os.path.join(args.dados, 'BD')):
+        print(f"[ERRO] {args.dados} não tem a pasta BD (gere com benchmarks/gerar_dados.py)")
+        return 1
+
+    commit = _commit_atual()
+    saida = args.saida or os.path.join(
+        PASTA_BENCHMARKS, 'resultados', f"inicializacao_{commit}_{datetime.now():%Y%m%d-%H%M%S}.json")
+    ambiente = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+
+    pasta = _preparar_pasta(os.path.abspath(args.dados))
+    try:
+        medidas = {}
+        for nome, codigo in MEDIDAS.items():
+            # A primeira execução aquece o cache de disco do sistema e os .pyc
+            medir(codigo, pasta, ambiente)
+            tempos = [medir(codigo, pasta, ambiente) for _ in range(args.repeticoes)]
+            medidas[nome] = {'segundos': round(statistics.median(tempos), 4), 'minimo': round(min(tempos), 4)}
+            print(f"    {nome:<24} {medidas[nome]['segundos']:9.3f}s")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    medidas['ate_janela'] = {
+        'segundos': round(medidas['importacoes_janela']['segundos'] + medidas['veiculos_cache']['segundos'], 4),
+    }
+    print(f"    {'ate_janela':<24} {medidas['ate_janela']['segundos']:9.3f}s")
+
+    relatorio = {
+        'versao_formato': VERSAO_FORMATO,
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                     'cpus': os.cpu_count()},
+        'parametros': {'dados': os.path.abspath(args.dados), 'repeticoes': args.repeticoes},
+        'medidas': medidas,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"[INFO] Resultado gravado em {saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
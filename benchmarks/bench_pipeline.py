@@ -0,0 +1,283 @@
+"""
+Benchmark do pipeline do VIAJANTE sobre bases sintéticas (gerar_dados.py).
+
+Para cada tamanho de demanda mede, etapa por etapa:
+    carga_bd_fria / carga_bd_cache   leitura das bases BD (sem e com o cache em disco)
+    Processar_Demandas               leitura dos arquivos de demanda sem o manifesto
+    demandas_manifesto_frio          mesma leitura com o manifesto vazio (lê tudo e grava
+                                     o manifesto e os pickles)
+    input_demanda                    montagem do template por destino + Template.xlsx
+                                     (demandas vindas do manifesto já gravado)
+    completar_informacoes            enriquecimento, saturação + empilhamento, resumo,
+                                     preenchimento da Treeview e exportação do VIAJANTE.xlsx
+                                     (cada parte medida separadamente)
+    consolidar_dados                 volume por rota + Volume_por_rota.xlsx
+
+O tempo de cada etapa é a mediana de --repeticoes execuções. Depois é feita uma
+execução extra com tracemalloc para o pico de memória de cada etapa. O resultado
+vai para um JSON (padrão: benchmarks/resultados/<commit>_<data>.json), que pode
+ser comparado entre commits com benchmarks/comparar.py.
+
+Exemplo:
+    python benchmarks/bench_pipeline.py --tamanhos 1000 10000 100000 1000000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_REPOSITORIO = os.path.dirname(PASTA_BENCHMARKS)
+sys.path.insert(0, PASTA_REPOSITORIO)
+
+import numpy as np
+import pandas as pd
+
+import DB
+from cache_bd import BASES_BD, PASTA_CACHE
+from demandas import PASTA_CACHE_DEMANDAS
+from master_data import MasterData
+from veiculos import carregar_veiculos
+from gerar_dados import gerar
+
+
+VERSAO_FORMATO = 1
+TAMANHOS_PADRAO = [1000, 10000, 100000]
+# Linhas visíveis da grade usada em preenchimento_tree
+LINHAS_GRADE = 35
+
+
+class Medidor:
+    """Guarda o tempo (e, opcionalmente, o pico de memória) de cada etapa de uma execução."""
+
+    def __init__(self, memoria=False, detalhado=False):
+        self.memoria = memoria
+        self.detalhado = detalhado
+        self.etapas = {}
+
+    @contextlib.contextmanager
+    def etapa(self, nome):
+        saida = contextlib.nullcontext() if self.detalhado else contextlib.redirect_stdout(io.StringIO())
+        registro = self.etapas.setdefault(nome, {})
+        if self.memoria:
+            tracemalloc.reset_peak()
+            antes = tracemalloc.get_traced_memory()[0]
+        inicio = time.perf_counter()
+        with saida:
+            yield registro
+        registro['segundos'] = time.perf_counter() - inicio
+        if self.memoria:
+            registro['pico_memoria_mb'] = (tracemalloc.get_traced_memory()[1] - antes) / 2 ** 20
+
+
+def _arvore_tk():
+    """Treeview real (GradeVirtual) quando há display; None caso contrário."""
+    try:
+        import tkinter
+        from tkinter import ttk
+        from grade_virtual import GradeVirtual
+        raiz = tkinter.Tk()
+    except Exception:
+        return None, None
+    raiz.withdraw()
+    # Raiz oculta: a página é medida pela altura pedida, aqui próxima da grade na janela maximizada
+    tree = ttk.Treeview(raiz, height=LINHAS_GRADE)
+    grade = GradeVirtual(tree, tkinter.Scrollbar(raiz))
+    return raiz, (grade, ttk.Treeview(raiz, columns=("Info", "Valor"), show="headings"), tkinter.Canvas(raiz))
+
+
+def executar_uma_vez(pasta, destinos, veiculo, medidor, interface):
+    """Roda todas as etapas uma vez na pasta de dados (que já é o diretório atual)."""
+    shutil.rmtree(os.path.join(pasta, PASTA_CACHE), ignore_errors=True)
+
+    with medidor.etapa('carga_bd_fria') as r:
+        master = MasterData(pasta)
+        r['linhas'] = sum(len(master.tabela(nome)) for nome in BASES_BD)
+    with medidor.etapa('carga_bd_cache') as r:
+        master = MasterData(pasta)
+        r['linhas'] = sum(len(master.tabela(nome)) for nome in BASES_BD)
+        _, _, codigo_veiculo = carregar_veiculos(pasta, master)
+
+    with medidor.etapa('Processar_Demandas') as r:
+        r['linhas'] = len(DB.Processar_Demandas(destinos[0], usar_cache=False))
+    shutil.rmtree(os.path.join(pasta, PASTA_CACHE, PASTA_CACHE_DEMANDAS), ignore_errors=True)
+    with medidor.etapa('demandas_manifesto_frio') as r:
+        r['linhas'] = len(DB.Processar_Demandas(destinos[0]))
+
+    with medidor.etapa('input_demanda') as r:
+        demanda = DB.montar_demanda(destinos, codigo_veiculo, master)
+        demanda.to_excel('Template.xlsx', index=False)
+        r['linhas'] = len(demanda)
+
+    template = DB.preparar_template(demanda)
+    with medidor.etapa('enriquecimento') as r:
+        template = DB.enriquecer_template(template, master)
+        r['linhas'] = len(template)
+    with medidor.etapa('saturacao_empilhamento') as r:
+        template, df_saturacao, df_empilhamento = DB.calcular_saturacao(template, veiculo, master)
+        r['linhas'] = len(df_saturacao)
+    # Só o motor de empilhamento (já incluído na etapa anterior)
+    with medidor.etapa('empilhamento') as r:
+        regras = master.derivado('regras_empilhamento', ['empilhamento'], DB.indexar_regras_empilhamento)
+        r['linhas'] = len(DB.calcular_empilhamento(df_saturacao, master.tabela('empilhamento'), regras))
+    with medidor.etapa('resumo') as r:
+        ocupacao, resumo = DB.resumir_resultado(template, veiculo, master)
+        r['linhas'] = len(template)
+
+    resultado = {
+        'template': template,
+        'saturacao': df_saturacao,
+        'empilhamento': df_empilhamento,
+        'pn_nao_cadastrados': DB.listar_pn_nao_cadastrados(template),
+        'ocupacao': ocupacao,
+        'resumo': resumo,
+    }
+    if interface is not None:
+        with medidor.etapa('preenchimento_tree') as r:
+            grade, tree_resumo, canvas = interface
+            DB.preencher_interface(resultado, grade, tree_resumo, canvas, None)
+            r['linhas'] = len(template)
+    with medidor.etapa('exportacao_viajante') as r:
+        DB.exportar_viajante(resultado, 'VIAJANTE.xlsx')
+        r['linhas'] = len(template)
+
+    with medidor.etapa('consolidar_dados') as r:
+        r['linhas'] = len(DB.consolidar_dados(master, template))
+
+
+PARTES_COMPLETAR = ['enriquecimento', 'saturacao_empilhamento', 'resumo', 'preenchimento_tree', 'exportacao_viajante']
+
+
+def medir_tamanho(pasta, destinos, veiculo, repeticoes, memoria, detalhado, interface):
+    """Mediana/mínimo de cada etapa em `repeticoes` execuções e pico de memória numa execução extra."""
+    os.chdir(pasta)
+    DB.caminho_base = pasta
+
+    medicoes = []
+    for _ in range(repeticoes):
+        medidor = Medidor(detalhado=detalhado)
+        executar_uma_vez(pasta, destinos, veiculo, medidor, interface)
+        medicoes.append(medidor.etapas)
+
+    etapas = {}
+    for nome in medicoes[0]:
+        tempos = [m[nome]['segundos'] for m in medicoes]
+        etapas[nome] = {
+            'segundos': round(statistics.median(tempos), 4),
+            'minimo': round(min(tempos), 4),
+            'linhas': medicoes[0][nome]['linhas'],
+        }
+    etapas['completar_informacoes'] = {
+        'segundos': round(sum(etapas[p]['segundos'] for p in PARTES_COMPLETAR if p in etapas), 4),
+        'minimo': round(sum(etapas[p]['minimo'] for p in PARTES_COMPLETAR if p in etapas), 4),
+        'linhas': etapas['enriquecimento']['linhas'],
+    }
+
+    if memoria:
+        medidor = Medidor(memoria=True, detalhado=detalhado)
+        tracemalloc.start()
+        try:
+            executar_uma_vez(pasta, destinos, veiculo, medidor, interface)
+        finally:
+            tracemalloc.stop()
+        for nome, registro in medidor.etapas.items():
+            etapas[nome]['pico_memoria_mb'] = round(registro['pico_memoria_mb'], 2)
+
+    return etapas
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PASTA_REPOSITORIO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return 'desconhecido'
+
+
+def _pico_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss vem em KB no Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline do VIAJANTE em bases sintéticas.")
+    parser.add_argument('--tamanhos', nargs='+', type=int, default=TAMANHOS_PADRAO,
+                        help="linhas de demanda de cada base (padrão: 1000 10000 100000)")
+    parser.add_argument('--destinos', default='1080,1046', help="destinos processados juntos (padrão: 1080,1046)")
+    parser.add_argument('--veiculo', type=int, default=4, help="código do veículo (padrão: 4)")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--dados', default=os.path.join(PASTA_BENCHMARKS, 'dados'),
+                        help="pasta das bases geradas (uma subpasta por tamanho)")
+    parser.add_argument('--regerar', action='store_true', help="gera as bases mesmo se já existirem")
+    parser.add_argument('--sem-memoria', action='store_true', help="não faz a execução com tracemalloc")
+    parser.add_argument('--saida', help="arquivo JSON de resultado")
+    parser.add_argument('--detalhado', action='store_true', help="mostra as mensagens do pipeline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    destinos = [d.strip() for d in args.destinos.split(',') if d.strip()]
+    commit = _commit_atual()
+    saida = args.saida or os.path.join(
+        PASTA_BENCHMARKS, 'resultados', f"{commit}_{datetime.now():%Y%m%d-%H%M%S}.json")
+
+    raiz, interface = _arvore_tk()
+    if interface is None:
+        print("[WARN] Sem display: a etapa preenchimento_tree não será medida.")
+
+    resultados = {}
+    for tamanho in args.tamanhos:
+        pasta = os.path.abspath(os.path.join(args.dados, str(tamanho)))
+        if args.regerar or not os.path.isdir(os.path.join(pasta, 'Demandas')):
+            print(f"[INFO] Gerando base com {tamanho} linha(s) em {pasta}")
+            gerar(pasta, tamanho)
+
+        print(f"[INFO] Medindo {tamanho} linha(s)...")
+        etapas = medir_tamanho(pasta, destinos, args.veiculo, args.repeticoes,
+                               not args.sem_memoria, args.detalhado, interface)
+        resultados[str(tamanho)] = {'linhas_demanda': tamanho, 'etapas': etapas}
+        for nome, etapa in etapas.items():
+            memoria = f"  {etapa['pico_memoria_mb']:9.1f} MB" if 'pico_memoria_mb' in etapa else ''
+            print(f"    {nome:<24} {etapa['segundos']:9.3f}s  {etapa['linhas']:>9} linha(s){memoria}")
+
+    if raiz is not None:
+        raiz.destroy()
+
+    relatorio = {
+        'versao_formato': VERSAO_FORMATO,
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'parametros': {'destinos': destinos, 'veiculo': args.veiculo, 'repeticoes': args.repeticoes},
+        'pico_rss_mb': _pico_rss_mb(),
+        'tamanhos': resultados,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"[INFO] Resultado gravado em {saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
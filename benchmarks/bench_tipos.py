@@ -0,0 +1,189 @@
+"""
+Memória do template enriquecido e tempo dos joins por chave composta, com os
+tipos compactos (categorias e chaves inteiras fatoradas) e com a representação
+anterior (textos como object e chaves de texto concatenadas).
+
+Medidas, sobre o template de uma base sintética (gerar_dados.py):
+    memoria                      template com colunas object x compactado (compactar_template)
+    chave_desenho_mdr            KEY = DESENHO_MDR + .map x MultiIndex.get_indexer (o índice
+                                 do cadastro PN fica em cache no MasterData, fora da medida)
+    juncao_fornecedor_mdr        CHAVE = fornecedor-MDR + merge x merge pelos códigos das categorias
+    agrupamento_embalagem        groupby fornecedor + MDR com object x categorias (observed=True)
+
+Cada tempo é a mediana de --repeticoes execuções. As duas versões de cada
+junção são conferidas antes de medir (mesmas linhas e valores).
+
+Exemplo:
+    python benchmarks/bench_tipos.py --dados benchmarks/dados/100000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_REPOSITORIO = os.path.dirname(PASTA_BENCHMARKS)
+sys.path.insert(0, PASTA_REPOSITORIO)
+
+import numpy as np
+import pandas as pd
+
+import DB
+from master_data import MasterData
+from veiculos import carregar_veiculos
+from gerar_dados import gerar
+
+
+VERSAO_FORMATO = 1
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return round(statistics.median(tempos), 4)
+
+
+def como_object(template):
+    """O template como era antes da compactação: textos object e COD FORNECEDOR int64."""
+    tipos = {col: object for col in DB.COLUNAS_CATEGORICAS if col in template.columns}
+    return template.astype(tipos).astype({'COD FORNECEDOR': np.int64})
+
+
+def memoria_mb(df):
+    return round(df.memory_usage(deep=True).sum() / 2 ** 20, 2)
+
+
+def medir_chave_desenho_mdr(template, master, repeticoes):
+    """Consulta da descrição do cadastro PN pela chave (DESENHO, MDR) de cada linha."""
+    objeto = como_object(template)
+    db_PN = master.tabela('pn')
+    cadastro = master.derivado('cadastro_pn', ['pn'], DB.indexar_cadastro_pn)
+
+    def texto():
+        chaves_pn = db_PN['DESENHO'].astype(str) + '_' + db_PN['MDR'].astype(str)
+        mapa = db_PN.assign(KEY=chaves_pn).drop_duplicates('KEY').set_index('KEY')['DESCRIÇÃO']
+        return (objeto['DESENHO'].astype(str) + '_' + objeto['MDR'].astype(str)).map(mapa).to_numpy()
+
+    def fatorada():
+        chaves = pd.MultiIndex.from_arrays([template['DESENHO'].astype(str), template['MDR'].astype(str)])
+        return cadastro['por_chave']['DESCRIÇÃO'].reindex(cadastro['chaves'].get_indexer(chaves)).to_numpy()
+
+    assert pd.Series(texto()).equals(pd.Series(fatorada())), "chave (DESENHO, MDR): resultados diferentes"
+    return {'antes': cronometrar(texto, repeticoes), 'depois': cronometrar(fatorada, repeticoes)}
+
+
+def medir_juncao_fornecedor_mdr(template, repeticoes):
+    """Join do template com a aba Saturação por (COD FORNECEDOR, MDR), como em calcular_saturacao."""
+    saturacao = DB.agrupar_por_embalagem(template)
+    saturacao['SATURAÇÃO_POR_MDR'] = np.arange(len(saturacao), dtype=float)
+    objeto = como_object(template)
+
+    def texto():
+        chave_saturacao = saturacao['COD FORNECEDOR'].astype(str) + '-' + saturacao['EMBALAGEM'].astype(str)
+        direita = pd.DataFrame({'CHAVE': chave_saturacao, 'SATURAÇÃO_POR_MDR': saturacao['SATURAÇÃO_POR_MDR']})
+        esquerda = objeto.assign(CHAVE=objeto['COD FORNECEDOR'].astype(str) + '-' + objeto['MDR'].astype(str))
+        return esquerda.merge(direita, on='CHAVE', how='left')['SATURAÇÃO_POR_MDR'].to_numpy()
+
+    def codigos():
+        direita = pd.DataFrame({
+            'COD FORNECEDOR': saturacao['COD FORNECEDOR'].to_numpy(),
+            'MDR': DB.mesma_codificacao(saturacao['EMBALAGEM'], template['MDR']),
+            'SATURAÇÃO_POR_MDR': saturacao['SATURAÇÃO_POR_MDR'].to_numpy(),
+        })
+        return template.merge(direita, on=['COD FORNECEDOR', 'MDR'], how='left')['SATURAÇÃO_POR_MDR'].to_numpy()
+
+    assert np.array_equal(texto(), codigos(), equal_nan=True), "junção (COD FORNECEDOR, MDR): resultados diferentes"
+    return {'antes': cronometrar(texto, repeticoes), 'depois': cronometrar(codigos, repeticoes)}
+
+
+def medir_agrupamento(template, repeticoes):
+    """Agrupamento fornecedor + embalagem da aba Saturação."""
+    objeto = como_object(template)
+    return {
+        'antes': cronometrar(lambda: DB.agrupar_por_embalagem(objeto), repeticoes),
+        'depois': cronometrar(lambda: DB.agrupar_por_embalagem(template), repeticoes),
+    }
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PASTA_REPOSITORIO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return 'desconhecido'
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Memória e joins com os tipos compactos do template.")
+    parser.add_argument('--dados', default=os.path.join(PASTA_BENCHMARKS, 'dados', '100000'),
+                        help="pasta da base sintética (gerada se não existir)")
+    parser.add_argument('--linhas', type=int, default=100000, help="linhas de demanda ao gerar a base")
+    parser.add_argument('--destinos', default='1080,1046')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--saida', help="arquivo JSON de resultado")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    pasta = os.path.abspath(args.dados)
+    if not os.path.isdir(os.path.join(pasta, 'Demandas')):
+        print(f"[INFO] Gerando base com {args.linhas} linha(s) em {pasta}")
+        gerar(pasta, args.linhas)
+    os.chdir(pasta)
+    DB.caminho_base = pasta
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        master = MasterData(pasta)
+        _, _, codigo_veiculo = carregar_veiculos(pasta, master)
+        demanda = DB.montar_demanda(args.destinos.split(','), codigo_veiculo, master)
+        template = DB.enriquecer_template(DB.preparar_template(demanda), master)
+
+    medidas = {
+        'memoria': {'antes_mb': memoria_mb(como_object(template)), 'depois_mb': memoria_mb(template)},
+        'chave_desenho_mdr': medir_chave_desenho_mdr(template, master, args.repeticoes),
+        'juncao_fornecedor_mdr': medir_juncao_fornecedor_mdr(template, args.repeticoes),
+        'agrupamento_embalagem': medir_agrupamento(template, args.repeticoes),
+    }
+
+    memoria = medidas['memoria']
+    print(f"[INFO] Template: {len(template)} linha(s)")
+    print(f"    {'memoria':<24} {memoria['antes_mb']:9.1f} MB -> {memoria['depois_mb']:9.1f} MB"
+          f"  ({memoria['antes_mb'] / memoria['depois_mb']:.1f}x menor)")
+    for nome, tempos in medidas.items():
+        if nome == 'memoria':
+            continue
+        print(f"    {nome:<24} {tempos['antes']:9.3f}s -> {tempos['depois']:9.3f}s"
+              f"  ({tempos['antes'] / tempos['depois']:.1f}x)")
+
+    relatorio = {
+        'versao_formato': VERSAO_FORMATO,
+        'commit': _commit_atual(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                     'plataforma': platform.platform(), 'cpus': os.cpu_count()},
+        'parametros': {'dados': pasta, 'destinos': args.destinos, 'repeticoes': args.repeticoes,
+                       'linhas_template': len(template)},
+        'medidas': medidas,
+    }
+    saida = args.saida or os.path.join(
+        PASTA_BENCHMARKS, 'resultados', f"tipos_{relatorio['commit']}_{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"[INFO] Resultado gravado em {saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
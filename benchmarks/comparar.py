@@ -0,0 +1,48 @@
+"""
+Compara dois resultados do bench_pipeline.py (ex.: antes e depois de um commit).
+
+Exemplo:
+    python benchmarks/comparar.py benchmarks/resultados/abc1234_*.json benchmarks/resultados/def5678_*.json
+"""
+import argparse
+import json
+import sys
+
+
+def carregar(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def comparar(base, novo):
+    """Linhas (tamanho, etapa, segundos base, segundos novo, razão novo/base) das etapas em comum."""
+    linhas = []
+    for tamanho, dados_novo in novo['tamanhos'].items():
+        dados_base = base['tamanhos'].get(tamanho)
+        if dados_base is None:
+            continue
+        for etapa, medida in dados_novo['etapas'].items():
+            anterior = dados_base['etapas'].get(etapa)
+            if anterior is None:
+                continue
+            razao = medida['segundos'] / anterior['segundos'] if anterior['segundos'] else float('nan')
+            linhas.append((tamanho, etapa, anterior['segundos'], medida['segundos'], razao))
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dois resultados do benchmark.")
+    parser.add_argument('base')
+    parser.add_argument('novo')
+    args = parser.parse_args(argv)
+
+    base, novo = carregar(args.base), carregar(args.novo)
+    print(f"base: {base['commit']} ({base['data']})   novo: {novo['commit']} ({novo['data']})")
+    print(f"{'linhas':>9}  {'etapa':<24} {'base (s)':>10} {'novo (s)':>10} {'novo/base':>10}")
+    for tamanho, etapa, segundos_base, segundos_novo, razao in comparar(base, novo):
+        print(f"{tamanho:>9}  {etapa:<24} {segundos_base:>10.3f} {segundos_novo:>10.3f} {razao:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
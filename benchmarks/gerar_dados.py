@@ -0,0 +1,195 @@
+"""
+Gerador de bases sintéticas para o benchmark do VIAJANTE.
+
+Cria uma pasta com BD/ (BD_CADASTRO_PN, BD_CADASTRO_MDR com as colunas de
+capacidade de cada veículo, VEÍCULOS, BD_EMPILHAMENTO_EMBALAGENS,
+BD_CADASTRO_MDR_PERDA_COMPRIMENTO e FLUXO) e Demandas/ (arquivos TXT de
+largura fixa com o total de linhas pedido, mais uma planilha Excel), no mesmo
+layout que o programa lê. Os dados são gerados a partir de uma semente, então
+a mesma chamada produz sempre os mesmos arquivos.
+
+Exemplo:
+    python benchmarks/gerar_dados.py benchmarks/dados/10000 10000
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+
+VEICULOS = {
+    'BIG SIDER': 6, 'BITREM': 7, 'CARRETA': 4, 'CARRETA LINE HAUL': 14,
+    'CARRETA REBAIXADA': 9, 'CTNR 20': 15, 'CTNR 40': 16, 'FIORINO': 11,
+    'RODOTREM': 8, 'TRUCK 3M': 3, 'TRUCK 3M ALONGADO': 18, 'TRUCK 3M PLUS': 13,
+    'TRUCK ALONGADO': 17, 'TRUCK VIAGEM': 2, 'TRUCK VIAGEM PLUS': 12, 'VAN': 10,
+    'VANDERLEA': 5, 'VEÍCULO 3/4': 1,
+}
+
+DESTINOS = ['1080', '1046', '1055', '108', '1080/1046']
+
+# Arquivos TXT em que as linhas de demanda são divididas
+ARQUIVOS_TXT = 4
+
+
+def _gerar_bd(pasta_bd, rng, n_fornecedores, n_mdr, n_pn, n_rotas):
+    """Grava as planilhas BD; retorna (pn, fornecedores) para montar as demandas."""
+    fornecedores = 100000000 + rng.choice(899999999, n_fornecedores, replace=False)
+    nomes = {f: f'FORNECEDOR {i}' for i, f in enumerate(fornecedores)}
+    mdrs = [f'MDR{i:04d}' for i in range(n_mdr)]
+
+    veiculos = pd.DataFrame({
+        'COD VEICULO': list(VEICULOS.values()),
+        'DESCRIÇÃO': list(VEICULOS),
+        'VEICULOS': [f'{c} x 2,4 x 2,78' for c in VEICULOS.values()],
+        'PESO MAXIMO': rng.integers(1000, 30000, len(VEICULOS)),
+        'CAPACIDADE M³': rng.integers(5, 110, len(VEICULOS)),
+    })
+    veiculos.to_excel(os.path.join(pasta_bd, 'VEÍCULOS.xlsx'), sheet_name='VEÍCULOS', index=False)
+
+    # MDR: uma coluna de capacidade por veículo (~5% sem capacidade) e algumas MDRs repetidas
+    mdr = pd.DataFrame({
+        'MDR': mdrs,
+        'DESCRIÇÃO2': [f'EMBALAGEM {m}' for m in mdrs],
+        'VOLUME': np.round(rng.uniform(0.01, 2, n_mdr), 3),
+        'MDR PESO': np.round(rng.uniform(0.5, 40, n_mdr), 2),
+        'CAIXA PLÁSTICA': rng.integers(0, 2, n_mdr),
+        'CAIXAS POR PALLET': rng.integers(1, 40, n_mdr),
+        'CHAVE EMBALAGENS': [f'{rng.choice(fornecedores)}-{m}' for m in mdrs],
+    })
+    for coluna in veiculos['VEICULOS']:
+        capacidade = rng.integers(4, 120, n_mdr).astype(float)
+        capacidade[rng.random(n_mdr) < 0.05] = np.nan
+        mdr[coluna] = capacidade
+    repetidas = mdr.sample(n_mdr // 4, random_state=0).copy()
+    repetidas['CHAVE EMBALAGENS'] = [f'{rng.choice(fornecedores)}-{m}' for m in repetidas['MDR']]
+    mdr = pd.concat([mdr, repetidas], ignore_index=True)
+    mdr.to_excel(os.path.join(pasta_bd, 'BD_CADASTRO_MDR.xlsx'), sheet_name='BD', index=False)
+
+    # PN: 10% dos desenhos com um cadastro mais antigo em outra MDR
+    desenhos = 52000000000 + rng.choice(99999999, n_pn, replace=False)
+    fornecedor_pn = rng.choice(fornecedores, n_pn)
+    pn = pd.DataFrame({
+        'CÓD. FORNECEDOR': fornecedor_pn,
+        'FORNECEDOR': [nomes[f] for f in fornecedor_pn],
+        'DESENHO': desenhos.astype(str),
+        'DESCRIÇÃO': [f'PECA {d}' for d in desenhos],
+        'MDR': rng.choice(mdrs, n_pn),
+        'QME': rng.integers(1, 200, n_pn),
+        'PESO (Kg) MATERIAL': np.round(rng.uniform(0.01, 10, n_pn), 3),
+        'DESENHO ATUALIZAÇÃO': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 900, n_pn), 'D'),
+    })
+    antigos = pn.sample(n_pn // 10, random_state=0).copy()
+    antigos['MDR'] = rng.choice(mdrs, len(antigos))
+    antigos['DESENHO ATUALIZAÇÃO'] = pd.Timestamp('2020-01-01')
+    pn = pd.concat([pn, antigos], ignore_index=True)
+    pn.to_excel(os.path.join(pasta_bd, 'BD_CADASTRO_PN.xlsx'), sheet_name='BD', index=False)
+
+    # Empilhamento: regras aleatórias e regras sobre MDRs realmente usadas pelos fornecedores
+    regras = []
+    for f in fornecedores:
+        for _ in range(rng.integers(0, 4)):
+            base, sobreposta = rng.choice(mdrs, 2, replace=False)
+            regras.append({'CÓD. FORNECEDOR': f, 'FORNECEDOR': nomes[f], 'MDR BASE': base,
+                           'MDR SOBREPOSTA': sobreposta, 'EMPILHAMENTO BASE': int(rng.integers(1, 4))})
+    for f, m in zip(pn['CÓD. FORNECEDOR'][:n_fornecedores * 3], pn['MDR'][:n_fornecedores * 3]):
+        regras.append({'CÓD. FORNECEDOR': f, 'FORNECEDOR': nomes[f], 'MDR BASE': m,
+                       'MDR SOBREPOSTA': rng.choice(mdrs), 'EMPILHAMENTO BASE': int(rng.integers(1, 4))})
+    pd.DataFrame(regras).to_excel(os.path.join(pasta_bd, 'BD_EMPILHAMENTO_EMBALAGENS.xlsx'),
+                                  sheet_name='BD', index=False)
+
+    # Perda de comprimento: uma eficiência por fornecedor + MDR e veículo
+    chaves = sorted({f'{f}-{m}' for f, m in zip(pn['CÓD. FORNECEDOR'], pn['MDR'])})
+    efi = pd.DataFrame({'CHAVE FORNE + MDR': chaves})
+    for coluna in veiculos['VEICULOS']:
+        efi[coluna] = np.round(rng.uniform(0.8, 1.2, len(chaves)), 3)
+    efi.to_excel(os.path.join(pasta_bd, 'BD_CADASTRO_MDR_PERDA_COMPRIMENTO.xlsx'), sheet_name='BD', index=False)
+
+    # Fluxo: rotas com 1 a 4 fornecedores ('A / B') e destinos simples ou compostos
+    rotas = []
+    for r in range(n_rotas):
+        fs = rng.choice(fornecedores, rng.integers(1, 5), replace=False)
+        rotas.append({
+            'COD FLUXO': f'FL{r:04d}',
+            'COD FORNECEDOR': ' / '.join(str(f) for f in fs) if len(fs) > 1 else int(fs[0]),
+            'COD DESTINO': rng.choice(DESTINOS),
+            'NOME DESTINO': 'PLANTA',
+            'VEICULO PRINCIPAL': rng.choice(list(VEICULOS)),
+            'TIPO SATURACAO': rng.choice(['VOLUME', 'PESO', 'Volume']),
+            'COD IMS': (f'{fs[0]}/999' if rng.random() < 0.3 else np.nan),
+            'TRANSPORTADORA': 'TRANSP',
+            'TECNOLOGIA': 'MILK RUN',
+            'MOT': 'RODO',
+        })
+    pd.DataFrame(rotas).to_excel(os.path.join(pasta_bd, 'FLUXO.xlsx'), sheet_name='FLUXOS', index=False)
+
+    return pn, fornecedores
+
+
+def _gerar_demandas(pasta_demandas, rng, pn, fornecedores, n_linhas):
+    """
+    Arquivos TXT de largura fixa (DESENHO [3:14], COD FORNECEDOR [-20:-11],
+    QTDE [-11:]) com n_linhas de demanda no total, intercaladas com linhas
+    AUTOMATIC, curtas e inválidas como nos arquivos reais, e uma planilha Excel.
+    """
+    desenhos = pn['DESENHO'].to_numpy()
+    fornecedores_pn = pn['CÓD. FORNECEDOR'].to_numpy()
+
+    por_arquivo = np.full(ARQUIVOS_TXT, n_linhas // ARQUIVOS_TXT)
+    por_arquivo[:n_linhas % ARQUIVOS_TXT] += 1
+    for a, n in enumerate(por_arquivo):
+        indices = rng.integers(0, len(pn), n)
+        # ~5% das linhas com um fornecedor diferente do cadastrado no PN
+        trocar = rng.random(n) < 0.05
+        fornecedor = np.where(trocar, rng.choice(fornecedores, n), fornecedores_pn[indices])
+        quantidades = rng.integers(0, 5000, n)
+
+        linhas = []
+        for k, (d, f, q) in enumerate(zip(desenhos[indices], fornecedor, quantidades)):
+            if k % 97 == 0:
+                linhas.append('HDR AUTOMATIC RUN 0001\r\n')
+            if k % 131 == 0:
+                linhas.append('XX\n')
+            if k % 173 == 0:
+                linhas.append(f'ABCxxxxxxxxxxx  FOO{f:09d}+000000{q:05d}\n')
+            linhas.append(f'ABC{d}  {k:08d}  {f:09d}+{q:010d}  \r\n')
+        with open(os.path.join(pasta_demandas, f'demanda_{a}.txt'), 'w', encoding='utf-8', newline='') as arquivo:
+            arquivo.writelines(linhas)
+
+    indices = rng.integers(0, len(pn), min(max(10, n_linhas // 20), 5000))
+    pd.DataFrame({
+        'DESENHO': pn['DESENHO'].iloc[indices].astype(int).to_numpy(),
+        'COD ORIGEM': fornecedores_pn[indices],
+        'ENTREGA SOLICITADA': rng.integers(1, 3000, len(indices)),
+        'COD DESTINO': 1080,
+    }).to_excel(os.path.join(pasta_demandas, 'demanda_excel.xlsx'), index=False)
+
+
+def gerar(pasta, n_linhas, semente=0, n_fornecedores=300, n_mdr=400, n_pn=20000, n_rotas=300):
+    """Gera BD/ e Demandas/ em `pasta` (apagando as demandas anteriores)."""
+    rng = np.random.default_rng(semente)
+    pasta_bd = os.path.join(pasta, 'BD')
+    pasta_demandas = os.path.join(pasta, 'Demandas')
+    os.makedirs(pasta_bd, exist_ok=True)
+    os.makedirs(pasta_demandas, exist_ok=True)
+    for nome in os.listdir(pasta_demandas):
+        os.remove(os.path.join(pasta_demandas, nome))
+
+    pn, fornecedores = _gerar_bd(pasta_bd, rng, n_fornecedores, n_mdr, n_pn, n_rotas)
+    _gerar_demandas(pasta_demandas, rng, pn, fornecedores, n_linhas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera bases sintéticas para o benchmark do VIAJANTE.")
+    parser.add_argument('pasta', help="pasta de destino (BD/ e Demandas/ são criadas dentro dela)")
+    parser.add_argument('linhas', type=int, help="total de linhas de demanda nos arquivos TXT")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--fornecedores', type=int, default=300)
+    parser.add_argument('--mdr', type=int, default=400)
+    parser.add_argument('--pn', type=int, default=20000)
+    parser.add_argument('--rotas', type=int, default=300)
+    args = parser.parse_args(argv)
+    gerar(args.pasta, args.linhas, args.semente, args.fornecedores, args.mdr, args.pn, args.rotas)
+
+
+if __name__ == "__main__":
+    main()
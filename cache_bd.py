@@ -0,0 +1,122 @@
+import os
+import hashlib
+import pickle
+# pandas é importado dentro das funções que leem planilhas: PASTA_CACHE e
+# assinatura_arquivo são usados na abertura da janela, antes do pandas ser carregado
+
+
+# Pasta onde ficam os DataFrames já normalizados das bases BD
+PASTA_CACHE = ".cache_viajante"
+
+# Incrementar sempre que a normalização de alguma base mudar,
+# para que entradas antigas do cache sejam descartadas
+VERSAO_CACHE = 1
+
+# Contadores de acertos/erros do cache durante o processo
+estatisticas_cache = {"hits": 0, "misses": 0}
+
+
+def _normalizar_pn(df):
+    import pandas as pd
+    df = df.rename(columns={'CÓD. FORNECEDOR': 'COD FORNECEDOR'})
+    df['DESENHO ATUALIZAÇÃO'] = pd.to_datetime(df['DESENHO ATUALIZAÇÃO'], errors='coerce')
+    df['PESO (Kg) MATERIAL'] = pd.to_numeric(df['PESO (Kg) MATERIAL'], errors='coerce')
+    return df.sort_values('DESENHO ATUALIZAÇÃO', ascending=False)
+
+
+def _normalizar_mdr(df):
+    import pandas as pd
+    df = df.rename(columns={'DESCRIÇÃO2': 'DESCRIÇÃO'})
+    df['VOLUME'] = pd.to_numeric(df['VOLUME'], errors='coerce')
+    df['MDR PESO'] = pd.to_numeric(df['MDR PESO'], errors='coerce')
+    return df
+
+
+def _normalizar_empilhamento(df):
+    return df.rename(columns={'CÓD. FORNECEDOR': 'COD FORNECEDOR'})
+
+
+# Catálogo das bases BD: nome -> (arquivo, aba, opções de leitura, normalização)
+BASES_BD = {
+    'pn': ("BD_CADASTRO_PN.xlsx", 'BD',
+           {'dtype': {'CÓD. FORNECEDOR': int, 'DESENHO': str}}, _normalizar_pn),
+    'mdr': ("BD_CADASTRO_MDR.xlsx", 'BD', {}, _normalizar_mdr),
+    'veiculos': ("VEÍCULOS.xlsx", 'VEÍCULOS', {}, None),
+    'empilhamento': ("BD_EMPILHAMENTO_EMBALAGENS.xlsx", 'BD', {}, _normalizar_empilhamento),
+    'efi': ("BD_CADASTRO_MDR_PERDA_COMPRIMENTO.xlsx", 'BD', {}, None),
+    'fluxo': ("FLUXO.xlsx", 'FLUXOS', {}, None),
+}
+
+
+def assinatura_arquivo(caminho):
+    """Retorna (caminho absoluto, mtime, tamanho) usados para validar o cache."""
+    info = os.stat(caminho)
+    return (os.path.abspath(caminho), info.st_mtime_ns, info.st_size)
+
+
+def _arquivo_cache(caminho, sheet_name, pasta_cache):
+    chave = f"{os.path.abspath(caminho)}|{sheet_name}"
+    nome = hashlib.sha1(chave.encode("utf-8")).hexdigest()
+    return os.path.join(pasta_cache, f"{nome}.pkl")
+
+
+def ler_excel_cache(caminho, sheet_name=0, normalizar=None, pasta_cache=None, **kwargs_leitura):
+    """
+    Lê uma planilha Excel usando o cache em disco.
+
+    A entrada do cache é identificada pelo caminho e pela aba, e só é reaproveitada
+    se o mtime e o tamanho do arquivo forem os mesmos da leitura anterior. Caso
+    contrário a planilha é relida, normalizada e a entrada é regravada.
+    """
+    if pasta_cache is None:
+        pasta_cache = os.path.join(os.getcwd(), PASTA_CACHE)
+
+    assinatura = assinatura_arquivo(caminho)
+    # Opções de leitura e normalização também fazem parte da validade da entrada
+    detalhes = (VERSAO_CACHE, sheet_name, repr(sorted(kwargs_leitura.items(), key=str)),
+                getattr(normalizar, "__name__", None))
+    arquivo_cache = _arquivo_cache(caminho, sheet_name, pasta_cache)
+    nome_arquivo = os.path.basename(caminho)
+
+    if os.path.exists(arquivo_cache):
+        try:
+            with open(arquivo_cache, "rb") as f:
+                entrada = pickle.load(f)
+            if entrada["assinatura"] == assinatura and entrada["detalhes"] == detalhes:
+                estatisticas_cache["hits"] += 1
+                print(f"[CACHE] HIT  {nome_arquivo} ({sheet_name})")
+                return entrada["df"]
+        except Exception as e:
+            print(f"[WARN] Entrada de cache inválida para {nome_arquivo}: {e}")
+
+    estatisticas_cache["misses"] += 1
+    print(f"[CACHE] MISS {nome_arquivo} ({sheet_name})")
+
+    import pandas as pd
+    df = pd.read_excel(caminho, sheet_name=sheet_name, **kwargs_leitura)
+    if normalizar is not None:
+        df = normalizar(df)
+
+    try:
+        os.makedirs(pasta_cache, exist_ok=True)
+        temporario = f"{arquivo_cache}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            pickle.dump({"assinatura": assinatura, "detalhes": detalhes, "df": df}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, arquivo_cache)
+    except Exception as e:
+        print(f"[WARN] Não foi possível gravar o cache de {nome_arquivo}: {e}")
+
+    return df
+
+
+def carregar_base(nome, caminho_BD):
+    """Carrega uma das bases de BASES_BD (já normalizada) a partir da pasta caminho_BD."""
+    arquivo, aba, kwargs_leitura, normalizar = BASES_BD[nome]
+    return ler_excel_cache(os.path.join(caminho_BD, arquivo), sheet_name=aba,
+                           normalizar=normalizar, **kwargs_leitura)
+
+
+def resumo_cache():
+    """Texto curto com o total de acertos e erros do cache no processo atual."""
+    return f"Cache BD: {estatisticas_cache['hits']} hit(s), {estatisticas_cache['misses']} miss(es)"
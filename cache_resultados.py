@@ -0,0 +1,137 @@
+"""
+Cache em memória (LRU) dos resultados completos do pipeline durante a sessão.
+
+A chave de um resultado (chave_resultado) reúne tudo de que ele depende:
+    - assinatura da pasta de demandas (nome, tamanho e mtime de cada arquivo);
+    - códigos de destino, na ordem informada;
+    - código do veículo e modo manual;
+    - versões (mtime/tamanho) das tabelas BD do MasterData, inclusive VEÍCULOS.
+
+Qualquer arquivo alterado muda a chave, então um resultado em cache nunca é
+servido com dados desatualizados; as entradas antigas apenas saem pelo LRU.
+
+O limite é de quantidade de resultados e de memória (soma de
+DataFrame.memory_usage(deep=True)); os padrões podem ser trocados pelas
+variáveis de ambiente VIAJANTE_CACHE_RESULTADOS e VIAJANTE_CACHE_MEMORIA_MB
+(0 desliga o cache).
+
+Os resultados guardados são compartilhados com quem os recebe e devem ser
+tratados como somente leitura.
+"""
+import os
+import threading
+from collections import OrderedDict
+from cache_bd import BASES_BD
+
+
+MAX_RESULTADOS = 8
+MAX_MEMORIA_MB = 1024
+VARIAVEL_MAX_RESULTADOS = "VIAJANTE_CACHE_RESULTADOS"
+VARIAVEL_MAX_MEMORIA_MB = "VIAJANTE_CACHE_MEMORIA_MB"
+
+# Itens do resultado que pertencem a uma execução específica e não vão para o cache
+CHAVES_EXECUCAO = ('medicao',)
+
+
+def _limite_ambiente(variavel, padrao):
+    valor = os.environ.get(variavel, "").strip()
+    if not valor:
+        return padrao
+    try:
+        return max(0, int(valor))
+    except ValueError:
+        print(f"[WARN] {variavel}={valor!r} inválido, usando {padrao}")
+        return padrao
+
+
+def chave_resultado(master, pasta_demandas, cod_destinos, veiculo, usar_manual=False):
+    """Chave do cache para uma execução de executar_pipeline com esses parâmetros."""
+    from demandas import assinatura_pasta_demandas
+    return (
+        assinatura_pasta_demandas(pasta_demandas),
+        tuple(str(c).strip() for c in cod_destinos),
+        int(veiculo),
+        bool(usar_manual),
+        tuple(master.versao(nome) for nome in BASES_BD),
+    )
+
+
+def tamanho_resultado(resultado):
+    """Bytes ocupados pelos DataFrames/Series do resultado."""
+    total = 0
+    for valor in resultado.values():
+        if hasattr(valor, 'memory_usage'):
+            uso = valor.memory_usage(deep=True)
+            total += int(uso.sum() if hasattr(uso, 'sum') else uso)
+    return total
+
+
+class CacheResultados:
+    """LRU de resultados do pipeline limitado por quantidade e por memória (thread-safe)."""
+
+    def __init__(self, max_resultados=None, max_memoria_mb=None):
+        self.max_resultados = (_limite_ambiente(VARIAVEL_MAX_RESULTADOS, MAX_RESULTADOS)
+                               if max_resultados is None else max_resultados)
+        self.max_memoria_mb = (_limite_ambiente(VARIAVEL_MAX_MEMORIA_MB, MAX_MEMORIA_MB)
+                               if max_memoria_mb is None else max_memoria_mb)
+        self._entradas = OrderedDict()  # chave -> (resultado, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    @property
+    def ativo(self):
+        return self.max_resultados > 0 and self.max_memoria_mb > 0
+
+    def memoria_mb(self):
+        return self._bytes / 2 ** 20
+
+    def obter(self, chave):
+        """Resultado guardado para `chave` (que passa a ser o mais recente), ou None."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[0]
+
+    def guardar(self, chave, resultado):
+        """
+        Guarda uma cópia rasa do resultado (sem os itens da execução, como a
+        medição) e descarta os menos usados até respeitar os limites. Um
+        resultado maior que o limite de memória sozinho não é guardado.
+        Retorna True se o resultado ficou no cache.
+        """
+        if not self.ativo:
+            return False
+        resultado = {nome: valor for nome, valor in resultado.items() if nome not in CHAVES_EXECUCAO}
+        tamanho = tamanho_resultado(resultado)
+        limite = self.max_memoria_mb * 2 ** 20
+        if tamanho > limite:
+            print(f"[CACHE] Resultado de {tamanho / 2 ** 20:.0f} MB acima do limite de "
+                  f"{self.max_memoria_mb} MB, não guardado")
+            return False
+
+        with self._lock:
+            anterior = self._entradas.pop(chave, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+            self._entradas[chave] = (resultado, tamanho)
+            self._bytes += tamanho
+            while len(self._entradas) > self.max_resultados or self._bytes > limite:
+                _, (_, removido) = self._entradas.popitem(last=False)
+                self._bytes -= removido
+        return True
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def resumo(self):
+        return (f"Resultados: {len(self._entradas)} em cache ({self.memoria_mb():.0f} MB), "
+                f"{self.acertos} reaproveitado(s)")
@@ -0,0 +1,407 @@
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from cache_bd import PASTA_CACHE
+
+
+# Tamanho máximo de cada bloco lido do arquivo mapeado em memória
+TAMANHO_BLOCO = 4 * 1024 * 1024
+
+COLUNAS_TXT = ["DESENHO", "COD FORNECEDOR", "QTDE"]
+
+EXTENSOES_TXT = (".txt", ".csv")
+EXTENSOES_EXCEL = (".xls", ".xlsx")
+
+# Subpasta do cache com o manifesto e os resultados já lidos de cada arquivo de demanda
+PASTA_CACHE_DEMANDAS = "demandas"
+
+# Colunas da planilha de demanda Excel -> nomes usados no template
+COLUNAS_EXCEL = {
+    'DESENHO': 'DESENHO',
+    'COD ORIGEM': 'COD FORNECEDOR',
+    'ENTREGA SOLICITADA': 'QTDE',
+    'COD DESTINO': 'COD DESTINO'
+}
+
+# Bytes considerados espaço por str.strip() / int() (apenas ASCII; o resto vai pelo caminho lento)
+_ESPACO = np.zeros(256, dtype=bool)
+_ESPACO[list(b" \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f")] = True
+_DIGITO = np.zeros(256, dtype=bool)
+_DIGITO[list(b"0123456789")] = True
+
+
+def _blocos_de_linhas(caminho, tamanho_bloco):
+    """Percorre o arquivo mapeado em memória em blocos que terminam sempre em fim de linha."""
+    if os.path.getsize(caminho) == 0:
+        return
+
+    with open(caminho, "rb") as arquivo:
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            total = len(mapa)
+            inicio = 0
+            while inicio < total:
+                fim = min(inicio + tamanho_bloco, total)
+                if fim < total:
+                    quebra = mapa.rfind(b"\n", inicio, fim)
+                    if quebra == -1:
+                        quebra = mapa.find(b"\n", fim)
+                    fim = total if quebra == -1 else quebra + 1
+                yield mapa[inicio:fim]
+                inicio = fim
+
+
+def _linha_python(linha):
+    """Regra original, linha a linha; usada só para linhas com bytes não ASCII ou '_'."""
+    if "AUTOMATIC" in linha:
+        return "automatic"
+    linha = linha.strip()
+    if len(linha) < 20:
+        return "curtas"
+    try:
+        return (int(linha[3:14].strip()),
+                int(linha[-20:-11].strip()),
+                int(linha[-11:].replace("+", "").strip()))
+    except (ValueError, IndexError):
+        return "invalidas"
+
+
+# Estados do reconhecimento de int(campo.strip()) feito coluna a coluna
+_INICIO, _SINAL, _DIGITOS, _FIM, _INVALIDO = range(5)
+
+
+def _converter_campo(dados, posicoes, largura, mais_e_ignorado):
+    """
+    Equivalente vetorizado de int(campo.strip()) para todos os campos do bloco
+    que começam em `posicoes` e têm `largura` bytes (apenas ASCII). Com
+    `mais_e_ignorado` os '+' são descartados antes, como em .replace("+", "").
+    Retorna (valores int64, máscara de campos válidos).
+    """
+    estado = np.full(len(posicoes), _INICIO, dtype=np.int8)
+    valores = np.zeros(len(posicoes), dtype=np.int64)
+    negativo = np.zeros(len(posicoes), dtype=bool)
+
+    for k in range(largura):
+        c = dados[posicoes + k]
+        espaco = _ESPACO[c]
+        digito = _DIGITO[c]
+        mais = c == ord("+")
+        menos = c == ord("-")
+        sinal = menos if mais_e_ignorado else (menos | mais)
+        outro = ~(espaco | digito | sinal | (mais if mais_e_ignorado else False))
+
+        novo = estado.copy()
+        novo[espaco & (estado == _SINAL)] = _INVALIDO
+        novo[espaco & (estado == _DIGITOS)] = _FIM
+        novo[sinal & (estado != _INICIO)] = _INVALIDO
+        novo[sinal & (estado == _INICIO)] = _SINAL
+        novo[digito & (estado == _FIM)] = _INVALIDO
+        novo[digito & (estado < _FIM)] = _DIGITOS
+        novo[outro] = _INVALIDO
+        estado = np.where(estado == _INVALIDO, _INVALIDO, novo).astype(np.int8)
+
+        negativo |= menos
+        valores = np.where(digito, valores * 10 + (c.astype(np.int64) - ord("0")), valores)
+
+    validos = (estado == _DIGITOS) | (estado == _FIM)
+    return np.where(negativo, -valores, valores), validos
+
+
+def _processar_bloco(bloco, rejeitados):
+    dados = np.frombuffer(bloco, dtype=np.uint8)
+    n = len(dados)
+
+    # Mesmas quebras de linha do modo texto do Python: \n, \r\n e \r isolado
+    seguido_de_lf = np.zeros(n, dtype=bool)
+    seguido_de_lf[:-1] = dados[1:] == 10
+    quebras = np.flatnonzero((dados == 10) | ((dados == 13) & ~seguido_de_lf)).astype(np.int64)
+    inicios = np.concatenate(([0], quebras + 1))
+    fins = np.concatenate((quebras, [n]))
+    if inicios[-1] == n:
+        # bloco terminando em quebra de linha não gera linha vazia extra
+        inicios, fins = inicios[:-1], fins[:-1]
+    total_linhas = len(inicios)
+
+    # Linhas com bytes não ASCII (ou '_' nos números) seguem pela regra original
+    lenta = np.zeros(total_linhas, dtype=bool)
+    especiais = np.concatenate((np.flatnonzero(dados >= 128),
+                                [m.start() for m in re.finditer(b"_", bloco)])).astype(np.int64)
+    lenta[np.searchsorted(inicios, especiais, side="right") - 1] = True
+
+    automatic = np.zeros(total_linhas, dtype=bool)
+    ocorrencias = np.array([m.start() for m in re.finditer(b"AUTOMATIC", bloco)], dtype=np.int64)
+    automatic[np.searchsorted(inicios, ocorrencias, side="right") - 1] = True
+
+    # strip(): avança o início e recua o fim enquanto houver espaço, só nas linhas ainda ativas
+    ini, fim = inicios.copy(), fins.copy()
+    ativas = np.flatnonzero(ini < fim)
+    while len(ativas):
+        ativas = ativas[_ESPACO[dados[ini[ativas]]]]
+        ini[ativas] += 1
+        ativas = ativas[ini[ativas] < fim[ativas]]
+    ativas = np.flatnonzero(ini < fim)
+    while len(ativas):
+        ativas = ativas[_ESPACO[dados[fim[ativas] - 1]]]
+        fim[ativas] -= 1
+        ativas = ativas[ini[ativas] < fim[ativas]]
+    comprimento = fim - ini
+
+    rapida = ~lenta & ~automatic
+    curtas = rapida & (comprimento < 20)
+    candidatas = np.flatnonzero(rapida & ~curtas)
+
+    ini_c, fim_c = ini[candidatas], fim[candidatas]
+    desenho, ok_d = _converter_campo(dados, ini_c + 3, 11, False)
+    fornecedor, ok_f = _converter_campo(dados, fim_c - 20, 9, False)
+    quantidade, ok_q = _converter_campo(dados, fim_c - 11, 11, True)
+    validas = ok_d & ok_f & ok_q
+
+    rejeitados["automatic"] += int((automatic & ~lenta).sum())
+    rejeitados["curtas"] += int(curtas.sum())
+    rejeitados["invalidas"] += int((~validas).sum())
+
+    linhas = [candidatas[validas]]
+    colunas = [desenho[validas], fornecedor[validas], quantidade[validas]]
+
+    lentas = np.flatnonzero(lenta)
+    if len(lentas):
+        resultados = []
+        for i in lentas:
+            texto = bytes(bloco[inicios[i]:fins[i]]).decode("utf-8", errors="ignore")
+            resultado = _linha_python(texto)
+            if isinstance(resultado, str):
+                rejeitados[resultado] += 1
+            else:
+                resultados.append((i,) + resultado)
+        if resultados:
+            extra = np.array(resultados, dtype=np.int64)
+            linhas.append(extra[:, 0])
+            colunas = [np.concatenate((c, extra[:, k + 1])) for k, c in enumerate(colunas)]
+
+    ordem = np.argsort(np.concatenate(linhas), kind="stable")
+    return pd.DataFrame({nome: col[ordem] for nome, col in zip(COLUNAS_TXT, colunas)})
+
+
+def ler_demanda_txt(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê um arquivo de demanda TXT/CSV de largura fixa.
+
+    O arquivo é mapeado em memória e processado em blocos de até `tamanho_bloco`
+    bytes. Em cada bloco as quebras de linha, as linhas 'AUTOMATIC', o strip e os
+    campos DESENHO [3:14], COD FORNECEDOR [-20:-11] e QTDE [-11:] são tratados
+    com operações NumPy sobre o bloco inteiro, com o mesmo resultado da leitura
+    linha a linha com int().
+
+    Retorna (DataFrame com DESENHO, COD FORNECEDOR e QTDE, dicionário com a
+    contagem de linhas rejeitadas: 'automatic', 'curtas' e 'invalidas').
+    """
+    rejeitados = {"automatic": 0, "curtas": 0, "invalidas": 0}
+    partes = [_processar_bloco(bloco, rejeitados) for bloco in _blocos_de_linhas(caminho, tamanho_bloco)]
+    partes = [p for p in partes if not p.empty]
+
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS_TXT), rejeitados
+    return pd.concat(partes, ignore_index=True), rejeitados
+
+
+def ler_arquivo_demanda(caminho):
+    """
+    Lê um único arquivo de demanda (TXT/CSV de largura fixa ou Excel).
+
+    Retorna (DataFrame, linhas rejeitadas). Para TXT/CSV o DataFrame não tem a
+    coluna COD DESTINO, que é preenchida por quem chamou. Levanta ValueError se
+    a planilha Excel não tiver as colunas de COLUNAS_EXCEL.
+    """
+    if caminho.lower().endswith(EXTENSOES_TXT):
+        return ler_demanda_txt(caminho)
+
+    df_excel = pd.read_excel(caminho)
+    faltando = [c for c in COLUNAS_EXCEL if c not in df_excel.columns]
+    if faltando:
+        raise ValueError(f"colunas obrigatórias ausentes: {', '.join(faltando)}")
+    return df_excel[list(COLUNAS_EXCEL)].rename(columns=COLUNAS_EXCEL), {}
+
+
+def hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """SHA-1 do conteúdo do arquivo."""
+    sha = hashlib.sha1()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def assinatura_pasta_demandas(caminho_pasta):
+    """
+    (nome, tamanho, mtime) de cada arquivo de demanda da pasta, em ordem de nome.
+    Muda sempre que um arquivo é incluído, removido ou alterado.
+    """
+    if not os.path.isdir(caminho_pasta):
+        return ()
+    assinatura = []
+    for entrada in sorted(os.scandir(caminho_pasta), key=lambda e: e.name):
+        if entrada.name.lower().endswith(EXTENSOES_TXT + EXTENSOES_EXCEL):
+            info = entrada.stat()
+            assinatura.append((entrada.name, info.st_size, info.st_mtime_ns))
+    return tuple(assinatura)
+
+
+def _gravar_atomico(caminho, gravar):
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    gravar(temporario)
+    os.replace(temporario, caminho)
+
+
+class ManifestoDemandas:
+    """
+    Manifesto da pasta de demandas: para cada arquivo guarda caminho, tamanho,
+    mtime e hash do conteúdo, e o resultado já lido (DataFrame + rejeitados)
+    num pickle próprio.
+
+    Um arquivo com mesmo tamanho e mtime é reaproveitado direto; se só o mtime
+    mudou, o hash decide. Entradas de arquivos que saíram da pasta são removidas
+    em atualizar().
+    """
+
+    def __init__(self, caminho_pasta, pasta_cache=None):
+        if pasta_cache is None:
+            pasta_cache = os.path.join(os.getcwd(), PASTA_CACHE, PASTA_CACHE_DEMANDAS)
+        self.caminho_pasta = os.path.abspath(caminho_pasta)
+        self.pasta_cache = pasta_cache
+        chave = hashlib.sha1(self.caminho_pasta.encode("utf-8")).hexdigest()
+        self.caminho_manifesto = os.path.join(pasta_cache, f"manifesto_{chave}.json")
+        self.entradas = {}
+        if os.path.exists(self.caminho_manifesto):
+            try:
+                with open(self.caminho_manifesto, "r", encoding="utf-8") as f:
+                    self.entradas = json.load(f)
+            except Exception as e:
+                print(f"[WARN] Manifesto de demandas inválido, será refeito: {e}")
+
+    def _arquivo_resultado(self, nome):
+        chave = hashlib.sha1(os.path.join(self.caminho_pasta, nome).encode("utf-8")).hexdigest()
+        return os.path.join(self.pasta_cache, f"{chave}.pkl")
+
+    def obter(self, nome):
+        """Resultado em cache de `nome`, ou None se o arquivo é novo ou mudou."""
+        entrada = self.entradas.get(nome)
+        if entrada is None:
+            return None
+
+        caminho = os.path.join(self.caminho_pasta, nome)
+        info = os.stat(caminho)
+        if info.st_size != entrada["tamanho"]:
+            return None
+        if info.st_mtime_ns != entrada["mtime_ns"]:
+            if hash_arquivo(caminho) != entrada["hash"]:
+                return None
+            entrada["mtime_ns"] = info.st_mtime_ns
+
+        try:
+            with open(entrada["resultado"], "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def guardar(self, nome, resultado):
+        caminho = os.path.join(self.caminho_pasta, nome)
+        info = os.stat(caminho)
+        arquivo_resultado = self._arquivo_resultado(nome)
+        try:
+            os.makedirs(self.pasta_cache, exist_ok=True)
+
+            def gravar(temporario):
+                with open(temporario, "wb") as f:
+                    pickle.dump(resultado, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            _gravar_atomico(arquivo_resultado, gravar)
+        except Exception as e:
+            print(f"[WARN] Não foi possível gravar o cache de '{nome}': {e}")
+            return
+        self.entradas[nome] = {
+            "caminho": caminho,
+            "tamanho": info.st_size,
+            "mtime_ns": info.st_mtime_ns,
+            "hash": hash_arquivo(caminho),
+            "resultado": arquivo_resultado,
+        }
+
+    def atualizar(self, nomes_presentes):
+        """Remove as entradas de arquivos que não existem mais e grava o manifesto."""
+        for nome in set(self.entradas) - set(nomes_presentes):
+            entrada = self.entradas.pop(nome)
+            try:
+                os.remove(entrada["resultado"])
+            except OSError:
+                pass
+        try:
+            os.makedirs(self.pasta_cache, exist_ok=True)
+
+            def gravar(temporario):
+                with open(temporario, "w", encoding="utf-8") as f:
+                    json.dump(self.entradas, f, ensure_ascii=False, indent=1)
+
+            _gravar_atomico(self.caminho_manifesto, gravar)
+        except Exception as e:
+            print(f"[WARN] Não foi possível gravar o manifesto de demandas: {e}")
+
+
+def ler_pasta_demandas(caminho_pasta, workers=1, usar_cache=True, pasta_cache=None):
+    """
+    Lê todos os arquivos de demanda de uma pasta.
+
+    Com usar_cache, só os arquivos novos ou alterados desde a última leitura
+    são processados; os demais vêm do cache do ManifestoDemandas.
+
+    Com workers > 1 os arquivos são lidos em paralelo num pool de processos
+    (cada arquivo é independente). O resultado não depende da ordem de
+    conclusão: os arquivos são sempre devolvidos em ordem de nome.
+
+    Retorna (lista de (nome, DataFrame, rejeitados), dicionário nome -> erro).
+    Arquivos com erro não interrompem a leitura dos demais.
+    """
+    arquivos = sorted(nome for nome in os.listdir(caminho_pasta)
+                      if nome.lower().endswith(EXTENSOES_TXT + EXTENSOES_EXCEL))
+    lidos, erros = {}, {}
+
+    manifesto = ManifestoDemandas(caminho_pasta, pasta_cache) if usar_cache else None
+    pendentes = []
+    for nome in arquivos:
+        resultado = manifesto.obter(nome) if manifesto is not None else None
+        if resultado is None:
+            pendentes.append(nome)
+        else:
+            lidos[nome] = resultado
+
+    if workers > 1 and len(pendentes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pendentes))) as pool:
+            futuros = {pool.submit(ler_arquivo_demanda, os.path.join(caminho_pasta, nome)): nome
+                       for nome in pendentes}
+            for futuro in as_completed(futuros):
+                nome = futuros[futuro]
+                try:
+                    lidos[nome] = futuro.result()
+                except Exception as e:
+                    erros[nome] = str(e)
+    else:
+        for nome in pendentes:
+            try:
+                lidos[nome] = ler_arquivo_demanda(os.path.join(caminho_pasta, nome))
+            except Exception as e:
+                erros[nome] = str(e)
+
+    if manifesto is not None:
+        for nome in pendentes:
+            if nome in lidos:
+                manifesto.guardar(nome, lidos[nome])
+        manifesto.atualizar(arquivos)
+        if arquivos:
+            print(f"[CACHE] Demandas: {len(arquivos) - len(pendentes)} arquivo(s) do cache, "
+                  f"{len(pendentes)} lido(s)")
+
+    return [(nome,) + lidos[nome] for nome in arquivos if nome in lidos], erros
@@ -0,0 +1,94 @@
+import logging
+import queue
+import threading
+import traceback
+from collections import namedtuple
+from types import MappingProxyType
+
+
+# Resultado entregue à interface: id da execução, valor (somente leitura) e erro
+ResultadoExecucao = namedtuple("ResultadoExecucao", ["id", "valor", "erro"])
+
+
+class ExecucaoCancelada(Exception):
+    """Levantada nos pontos de verificação quando a execução foi substituída por outra."""
+
+
+def verificar_cancelamento(cancelado):
+    """Ponto de verificação: levanta ExecucaoCancelada se `cancelado()` for verdadeiro."""
+    if cancelado is not None and cancelado():
+        raise ExecucaoCancelada()
+
+
+class ExecutorSegundoPlano:
+    """
+    Roda uma tarefa por vez numa thread de trabalho e devolve o resultado por
+    uma fila, sem tocar em widgets fora da thread da interface.
+
+    iniciar() cancela a execução em andamento (a tarefa recebe `cancelado`,
+    que deve ser consultado entre as etapas) e só começa a nova depois que a
+    anterior parar, para nunca haver dois cálculos ao mesmo tempo. resultados()
+    deve ser chamado pela interface (ex.: janela.after) e só devolve o
+    resultado da execução mais recente.
+    """
+
+    def __init__(self):
+        self._resultados = queue.Queue()
+        self._lock = threading.Lock()
+        self._id = 0
+        self._cancelar = None
+        self._thread = None
+
+    def iniciar(self, tarefa, *args, **kwargs):
+        """Inicia tarefa(*args, cancelado=..., **kwargs) e retorna o id da execução."""
+        with self._lock:
+            if self._cancelar is not None:
+                self._cancelar.set()
+            self._id += 1
+            id_execucao = self._id
+            cancelar = threading.Event()
+            anterior = self._thread
+            self._cancelar = cancelar
+
+            def trabalhar():
+                if anterior is not None:
+                    anterior.join()
+                valor, erro = None, None
+                try:
+                    verificar_cancelamento(cancelar.is_set)
+                    valor = tarefa(*args, cancelado=cancelar.is_set, **kwargs)
+                    if isinstance(valor, dict):
+                        valor = MappingProxyType(valor)
+                except ExecucaoCancelada:
+                    return
+                except Exception as e:
+                    traceback.print_exc()
+                    logging.getLogger("viajante").exception("Erro na execução %d", id_execucao)
+                    erro = e
+                self._resultados.put(ResultadoExecucao(id_execucao, valor, erro))
+
+            self._thread = threading.Thread(target=trabalhar, name=f"execucao-{id_execucao}", daemon=True)
+            self._thread.start()
+            return id_execucao
+
+    def cancelar(self):
+        """Cancela a execução em andamento (o resultado dela é descartado)."""
+        with self._lock:
+            if self._cancelar is not None:
+                self._cancelar.set()
+            self._id += 1
+
+    def em_andamento(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def resultados(self):
+        """Resultados prontos da execução atual; os de execuções substituídas são descartados."""
+        prontos = []
+        while True:
+            try:
+                resultado = self._resultados.get_nowait()
+            except queue.Empty:
+                return prontos
+            if resultado.id == self._id:
+                prontos.append(resultado)
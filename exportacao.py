@@ -0,0 +1,180 @@
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+
+
+_logger = logging.getLogger("viajante")
+
+# Formato de data/hora que o pandas usa no to_excel
+FORMATO_DATA_HORA = 'YYYY-MM-DD HH:MM:SS'
+
+_BORDA_FINA = Side(style='thin')
+_BORDA_CABECALHO = Border(left=_BORDA_FINA, right=_BORDA_FINA, top=_BORDA_FINA, bottom=_BORDA_FINA)
+
+# Cabeçalho padrão do pandas (negrito, borda fina, centralizado no topo)
+ESTILO_CABECALHO_PANDAS = {
+    'font': Font(bold=True),
+    'border': _BORDA_CABECALHO,
+    'alignment': Alignment(horizontal='center', vertical='top'),
+}
+
+# Cabeçalho destacado das abas do VIAJANTE.xlsx
+ESTILO_CABECALHO_VIAJANTE = {
+    'font': Font(bold=True, color='000000'),
+    'border': _BORDA_CABECALHO,
+    'fill': PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid'),
+    'alignment': Alignment(horizontal='center', vertical='center'),
+}
+
+
+def _coluna_para_excel(serie):
+    """
+    Valores de uma coluna já no formato gravado pelo DataFrame.to_excel:
+    nulos viram '' e ±inf viram 'inf'/'-inf'. Conversão feita por coluna.
+    """
+    valores = serie.to_numpy(dtype=object)
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        valores = np.array([v.to_pydatetime() if not pd.isna(v) else '' for v in serie], dtype=object)
+        return valores
+    nulos = pd.isna(serie).to_numpy()
+    if nulos.any():
+        valores[nulos] = ''
+    if pd.api.types.is_float_dtype(serie):
+        numeros = serie.to_numpy()
+        valores[numeros == np.inf] = 'inf'
+        valores[numeros == -np.inf] = '-inf'
+    elif serie.dtype == object:
+        for i, v in enumerate(valores):
+            if isinstance(v, float) and np.isinf(v):
+                valores[i] = 'inf' if v > 0 else '-inf'
+    return valores
+
+
+def _celulas_data(ws, valores):
+    celulas = []
+    for v in valores:
+        celula = WriteOnlyCell(ws, value=v)
+        if v != '':
+            celula.number_format = FORMATO_DATA_HORA
+        celulas.append(celula)
+    return np.array(celulas, dtype=object)
+
+
+def gravar_abas(caminho, abas):
+    """
+    Grava as abas num .xlsx usando o modo write-only do openpyxl (as linhas são
+    enviadas direto para o arquivo, sem montar a planilha inteira em memória).
+
+    abas: lista de (nome da aba, DataFrame, estilo do cabeçalho, ajustar_largura).
+    Com ajustar_largura, cada coluna fica com len(cabeçalho) + 2 de largura.
+    O conteúdo das células é o mesmo do DataFrame.to_excel(index=False).
+    """
+    wb = Workbook(write_only=True)
+
+    for nome, df, estilo, ajustar_largura in abas:
+        ws = wb.create_sheet(nome)
+        cabecalho = [str(col) for col in df.columns]
+
+        # Larguras calculadas direto dos nomes das colunas, antes de gravar qualquer linha
+        if ajustar_largura:
+            for num, texto in enumerate(cabecalho, 1):
+                ws.column_dimensions[get_column_letter(num)].width = len(texto) + 2
+
+        celulas_cabecalho = []
+        for texto in cabecalho:
+            celula = WriteOnlyCell(ws, value=texto)
+            for atributo, valor in estilo.items():
+                setattr(celula, atributo, valor)
+            celulas_cabecalho.append(celula)
+        ws.append(celulas_cabecalho)
+
+        colunas = []
+        for col in df.columns:
+            valores = _coluna_para_excel(df[col])
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                valores = _celulas_data(ws, valores)
+            colunas.append(valores)
+
+        for linha in zip(*colunas):
+            ws.append(linha)
+
+    wb.save(caminho)
+
+
+def gravar_atomico(caminho, gravar):
+    """
+    Chama gravar(caminho_temporario) e, se der certo, troca o arquivo final de
+    uma vez com os.replace. Quem abrir `caminho` nunca vê um arquivo pela metade.
+    O temporário mantém a extensão (o pandas escolhe o motor por ela).
+    """
+    base, extensao = os.path.splitext(caminho)
+    temporario = f"{base}.~{os.getpid()}-{threading.get_ident()}{extensao}"
+    try:
+        gravar(temporario)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+class FilaExportacao:
+    """
+    Fila de gravações de arquivos executadas numa thread em segundo plano, uma
+    de cada vez e na ordem em que foram agendadas (cada uma via gravar_atomico).
+
+    O término de cada gravação (ou o erro) fica disponível em notificacoes(),
+    para a interface consultar periodicamente. aguardar() bloqueia até a fila
+    esvaziar, e deve ser chamado antes de uma nova execução regravar os arquivos.
+    """
+
+    def __init__(self):
+        self._fila = queue.Queue()
+        self._notificacoes = queue.Queue()
+        self._thread = threading.Thread(target=self._trabalhar, name="exportacao", daemon=True)
+        self._thread.start()
+
+    def agendar(self, caminho, gravar):
+        """Agenda gravar(caminho_temporario) para gerar `caminho`."""
+        self._fila.put((caminho, gravar))
+
+    def aguardar(self):
+        """Espera todas as gravações agendadas terminarem."""
+        self._fila.join()
+
+    def pendentes(self):
+        return self._fila.unfinished_tasks
+
+    def notificacoes(self):
+        """Lista de (caminho, erro ou None, segundos) das gravações concluídas desde a última consulta."""
+        concluidas = []
+        while True:
+            try:
+                concluidas.append(self._notificacoes.get_nowait())
+            except queue.Empty:
+                return concluidas
+
+    def _trabalhar(self):
+        while True:
+            caminho, gravar = self._fila.get()
+            inicio = time.perf_counter()
+            erro = None
+            try:
+                gravar_atomico(caminho, gravar)
+            except Exception as e:
+                erro = e
+                print(f"[ERRO] Falha ao gravar {caminho}: {e}")
+                _logger.exception("Falha ao gravar %s", caminho)
+            finally:
+                segundos = time.perf_counter() - inicio
+                if erro is None:
+                    _logger.info("exportacao %s: %.3fs", caminho, segundos)
+                self._notificacoes.put((caminho, erro, segundos))
+                self._fila.task_done()
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+
+# Espera (ms) depois da última tecla antes de aplicar os filtros
+ATRASO_FILTRO_MS = 250
+
+# Separador entre colunas no texto usado pela busca global (não casa entre colunas)
+_SEPARADOR = "\x1f"
+
+
+class MotorFiltros:
+    """
+    Índice de filtros de texto ("contém", sem diferenciar maiúsculas) sobre o
+    DataFrame de resultado.
+
+    O texto em minúsculas de cada coluna é calculado uma vez, na primeira vez
+    que a coluna é filtrada. Todos os filtros ativos viram uma única máscara
+    booleana. Quando um filtro só fica mais específico (o texto anterior está
+    contido no novo, ex. digitando mais letras), ele é avaliado apenas sobre as
+    linhas que já casavam com o texto anterior.
+    """
+
+    BUSCA_GLOBAL = "*"
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self._texto = {}       # coluna -> valores como str (ndarray object)
+        self._minusculo = {}   # coluna -> valores em minúsculas (Series)
+        self._ultimo = {}      # coluna -> (consulta, posições que casaram)
+
+    def _coluna_minuscula(self, coluna):
+        if coluna not in self._minusculo:
+            if coluna == self.BUSCA_GLOBAL:
+                partes = [self._texto_coluna(c) for c in self.df.columns]
+                linhas = [_SEPARADOR.join(v) for v in zip(*partes)] if partes else []
+                self._minusculo[coluna] = pd.Series(linhas, dtype=object).str.lower()
+            else:
+                self._minusculo[coluna] = pd.Series(self._texto_coluna(coluna), dtype=object).str.lower()
+        return self._minusculo[coluna]
+
+    def _texto_coluna(self, coluna):
+        if coluna not in self._texto:
+            self._texto[coluna] = self.df[coluna].astype(str).to_numpy(dtype=object)
+        return self._texto[coluna]
+
+    def _posicoes(self, coluna, consulta):
+        """Posições das linhas cuja coluna contém `consulta` (já em minúsculas)."""
+        valores = self._coluna_minuscula(coluna)
+        anterior = self._ultimo.get(coluna)
+
+        if anterior is not None and anterior[0] in consulta:
+            # Estreitamento: só as linhas que casavam com a consulta anterior podem casar agora
+            candidatas = anterior[1]
+            casou = valores.iloc[candidatas].str.contains(consulta, regex=False).to_numpy()
+            posicoes = candidatas[casou]
+        else:
+            posicoes = np.flatnonzero(valores.str.contains(consulta, regex=False).to_numpy())
+
+        self._ultimo[coluna] = (consulta, posicoes)
+        return posicoes
+
+    def filtrar(self, filtros, busca_global=""):
+        """
+        filtros: dicionário coluna -> texto digitado (vazios são ignorados).
+        busca_global: texto procurado em qualquer coluna.
+        Retorna as posições (iloc) que passam em todos os filtros, ou None se
+        nenhum filtro estiver ativo.
+        """
+        ativos = {col: texto.lower() for col, texto in filtros.items()
+                  if texto and col in self.df.columns}
+        if busca_global:
+            ativos[self.BUSCA_GLOBAL] = busca_global.lower()
+        if not ativos:
+            return None
+
+        mascara = np.ones(len(self.df), dtype=bool)
+        for coluna, consulta in ativos.items():
+            selecionadas = np.zeros(len(self.df), dtype=bool)
+            selecionadas[self._posicoes(coluna, consulta)] = True
+            mascara &= selecionadas
+        return np.flatnonzero(mascara)
+
+    def valores_distintos(self, coluna):
+        """Valores distintos (texto, ordenados, sem vazios) para as listas dos filtros."""
+        valores = pd.unique(self._texto_coluna(coluna))
+        return sorted(v for v in valores if v.strip())
+
+
+class Adiador:
+    """
+    Agenda `funcao` para `atraso_ms` depois da última chamada, via widget.after,
+    cancelando o agendamento anterior (debounce das teclas dos filtros).
+    """
+
+    def __init__(self, widget, funcao, atraso_ms=ATRASO_FILTRO_MS):
+        self.widget = widget
+        self.funcao = funcao
+        self.atraso_ms = atraso_ms
+        self._agendado = None
+
+    def __call__(self, event=None):
+        if self._agendado is not None:
+            self.widget.after_cancel(self._agendado)
+        self._agendado = self.widget.after(self.atraso_ms, self._executar)
+
+    def _executar(self):
+        self._agendado = None
+        self.funcao()
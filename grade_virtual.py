@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+
+# Altura de linha usada até a primeira linha ser desenhada e poder ser medida
+ALTURA_LINHA_PADRAO = 20
+
+
+def formatar_celula(valor):
+    """Texto mostrado na grade para um valor do DataFrame."""
+    return str(valor)
+
+
+class GradeVirtual:
+    """
+    Grade de resultados virtualizada sobre um ttk.Treeview.
+
+    Os dados ficam no DataFrame; o Treeview só tem as linhas que cabem na tela
+    (uma página). A barra de rolagem e a roda do mouse movem um deslocamento em
+    linhas do DataFrame e a página é redesenhada reaproveitando os mesmos itens,
+    formatando apenas as células visíveis.
+
+    `filtrar` restringe a visão a um subconjunto de linhas (posições no
+    DataFrame) sem copiar os dados.
+    """
+
+    def __init__(self, tree, scroll_y=None):
+        self.tree = tree
+        self.scroll_y = scroll_y
+        self.df = pd.DataFrame()
+        self.indices = np.arange(0)     # posições (iloc) das linhas na visão atual
+        self.inicio = 0                 # primeira linha da visão mostrada na tela
+        self.linhas_pagina = 1
+        self._itens = []                # itens do Treeview reaproveitados a cada página
+        self._altura_linha = None
+
+        if scroll_y is not None:
+            scroll_y.config(command=self._rolar)
+        self.tree.configure(yscrollcommand=lambda *args: None)
+        self.tree.bind("<Configure>", self._ao_redimensionar, add="+")
+        self.tree.bind("<MouseWheel>", self._roda_mouse)
+        self.tree.bind("<Button-4>", lambda e: self._mover(-3))
+        self.tree.bind("<Button-5>", lambda e: self._mover(3))
+        self.tree.bind("<Up>", lambda e: self._teclado(-1))
+        self.tree.bind("<Down>", lambda e: self._teclado(1))
+        self.tree.bind("<Prior>", lambda e: self._mover(-self.linhas_pagina))
+        self.tree.bind("<Next>", lambda e: self._mover(self.linhas_pagina))
+        self.tree.bind("<Home>", lambda e: self._ir_para(0))
+        self.tree.bind("<End>", lambda e: self._ir_para(self.total))
+
+    # ------------------------------------------------------------------ dados
+    def definir_dados(self, df, larguras=None, largura_padrao=150):
+        """Troca o DataFrame exibido, recria as colunas e volta ao topo."""
+        self.df = df.reset_index(drop=True)
+        self.indices = np.arange(len(self.df))
+        self.inicio = 0
+
+        # A grade pode ter sido criada com o Treeview já na tela, sem <Configure> até um
+        # redimensionamento: o tamanho da página é medido aqui antes do primeiro desenho
+        self.tree.update_idletasks()
+        self.linhas_pagina = self._linhas_visiveis()
+
+        larguras = larguras or {}
+        self.tree.delete(*self.tree.get_children())
+        self._itens = []
+        self.tree["columns"] = list(self.df.columns)
+        self.tree["show"] = "headings"
+        for col in self.df.columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=larguras.get(col, largura_padrao),
+                             anchor="center", stretch=True, minwidth=80)
+        self.atualizar()
+
+    def filtrar(self, indices=None):
+        """Mostra só as linhas de `indices` (posições no DataFrame); None mostra todas."""
+        self.indices = np.arange(len(self.df)) if indices is None else np.asarray(indices, dtype=np.int64)
+        self.inicio = 0
+        self.atualizar()
+
+    @property
+    def total(self):
+        return len(self.indices)
+
+    def dados_visao(self):
+        """DataFrame com as linhas da visão atual (filtrada)."""
+        return self.df.iloc[self.indices]
+
+    # ------------------------------------------------------------- desenho
+    def atualizar(self):
+        """Redesenha a página a partir de self.inicio."""
+        self.inicio = max(0, min(self.inicio, self.total - self.linhas_pagina))
+        posicoes = self.indices[self.inicio:self.inicio + self.linhas_pagina]
+        pagina = self.df.iloc[posicoes].to_numpy(dtype=object) if len(posicoes) else []
+
+        # Reaproveita os itens existentes; cria ou remove só a diferença
+        while len(self._itens) < len(pagina):
+            self._itens.append(self.tree.insert("", "end", values=()))
+        if len(self._itens) > len(pagina):
+            self.tree.delete(*self._itens[len(pagina):])
+            del self._itens[len(pagina):]
+
+        for item, linha in zip(self._itens, pagina):
+            self.tree.item(item, values=[formatar_celula(v) for v in linha])
+
+        self._medir_altura_linha()
+        if self.scroll_y is not None:
+            if self.total:
+                self.scroll_y.set(self.inicio / self.total,
+                                  min(1.0, (self.inicio + len(pagina)) / self.total))
+            else:
+                self.scroll_y.set(0.0, 1.0)
+
+    def _medir_altura_linha(self):
+        if self._altura_linha is None and self._itens:
+            caixa = self.tree.bbox(self._itens[0])
+            if caixa:
+                self._altura_linha = caixa[3]
+
+    def _linhas_visiveis(self):
+        """Linhas que cabem no Treeview (altura pedida enquanto ele não está na tela)."""
+        altura_linha = self._altura_linha or ALTURA_LINHA_PADRAO
+        altura = self.tree.winfo_height() if self.tree.winfo_ismapped() else self.tree.winfo_reqheight()
+        # Desconta o cabeçalho (aprox. uma linha)
+        return max(1, int(altura / altura_linha) - 1)
+
+    def _ao_redimensionar(self, event=None):
+        linhas = self._linhas_visiveis()
+        if linhas != self.linhas_pagina:
+            self.linhas_pagina = linhas
+            self.atualizar()
+
+    # ------------------------------------------------------------- rolagem
+    def _ir_para(self, inicio):
+        self.inicio = int(inicio)
+        self.atualizar()
+        return "break"
+
+    def _mover(self, linhas):
+        return self._ir_para(self.inicio + linhas)
+
+    def _rolar(self, acao, quantidade, unidade=None):
+        """Comando da barra de rolagem: ('moveto', fração) ou ('scroll', n, 'units'|'pages')."""
+        if acao == "moveto":
+            self._ir_para(float(quantidade) * self.total)
+        elif acao == "scroll":
+            passo = self.linhas_pagina if unidade == "pages" else 1
+            self._mover(int(quantidade) * passo)
+
+    def _roda_mouse(self, event):
+        return self._mover(-3 if event.delta > 0 else 3)
+
+    def _teclado(self, direcao):
+        """Setas: na borda da página, rola a grade em vez de parar no último item visível."""
+        foco = self.tree.focus()
+        if foco not in self._itens:
+            return None
+        pos = self._itens.index(foco)
+        if (direcao < 0 and pos == 0) or (direcao > 0 and pos == len(self._itens) - 1):
+            self._mover(direcao)
+            self.tree.selection_set(foco)
+            return "break"
+        return None
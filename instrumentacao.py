@@ -0,0 +1,234 @@
+"""
+Medição das etapas de uma execução (tempo e linhas), log rotativo e perfil opcional.
+
+Uso:
+    with Medicao('execucao').ativa() as medicao:     # na thread que executa o cálculo
+        ...
+        with etapa('saturacao') as registro:         # em qualquer função chamada dali
+            ...
+            registro['linhas'] = len(df)
+    medicao.finalizar()                               # grava o resumo no log
+
+Fora de uma Medicao ativa, etapa() e @medir não fazem nada além de chamar o
+código, então as funções do DB continuam utilizáveis sozinhas. Etapas dentro
+de etapas são registradas com o nome composto ('saturacao > empilhamento').
+
+O perfil (cProfile) é ligado por Medicao(perfil=True) ou pela variável de
+ambiente VIAJANTE_PERFIL=1; o .prof e um resumo em texto ficam na pasta de logs.
+"""
+import contextlib
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from execucao import ExecucaoCancelada
+
+
+PASTA_LOGS = "logs"
+ARQUIVO_LOG = "viajante.log"
+TAMANHO_MAXIMO_LOG = 1024 * 1024
+ARQUIVOS_LOG_ANTIGOS = 5
+VARIAVEL_PERFIL = "VIAJANTE_PERFIL"
+SEPARADOR_ETAPAS = " > "
+
+logger = logging.getLogger("viajante")
+# O log só vai para o arquivo rotativo: o console já recebe os prints ([INFO]/[WARN]/[ERRO]).
+# Sem isso, um processo sem configurar_log (ou um trabalhador do pool) repetiria cada
+# aviso no stderr pelo handler de último recurso do logging.
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+
+_local = threading.local()
+_lock_log = threading.Lock()
+
+
+def configurar_log(caminho_base=None):
+    """
+    Liga o log rotativo em <caminho_base>/logs/viajante.log (uma vez por
+    processo). Retorna o caminho do arquivo, ou None se não puder ser criado.
+    """
+    with _lock_log:
+        for handler in logger.handlers:
+            if isinstance(handler, RotatingFileHandler):
+                return handler.baseFilename
+
+        pasta = os.path.join(caminho_base or os.getcwd(), PASTA_LOGS)
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            handler = RotatingFileHandler(os.path.join(pasta, ARQUIVO_LOG), maxBytes=TAMANHO_MAXIMO_LOG,
+                                          backupCount=ARQUIVOS_LOG_ANTIGOS, encoding="utf-8")
+        except OSError as e:
+            print(f"[WARN] Não foi possível criar o log em {pasta}: {e}")
+            return None
+
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(threadName)s] %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        return handler.baseFilename
+
+
+def desligar_log_arquivo():
+    """Remove o log rotativo deste processo (trabalhadores de um pool: só o principal grava nele)."""
+    with _lock_log:
+        for handler in list(logger.handlers):
+            if isinstance(handler, RotatingFileHandler):
+                logger.removeHandler(handler)
+
+
+def pasta_logs():
+    """Pasta do log configurado (ou ./logs)."""
+    for handler in logger.handlers:
+        if isinstance(handler, RotatingFileHandler):
+            return os.path.dirname(handler.baseFilename)
+    return os.path.join(os.getcwd(), PASTA_LOGS)
+
+
+def perfil_solicitado():
+    return os.environ.get(VARIAVEL_PERFIL, "").strip() not in ("", "0")
+
+
+class Medicao:
+    """Tempos e linhas das etapas de uma execução, com perfil cProfile opcional."""
+
+    def __init__(self, nome, perfil=None):
+        self.nome = nome
+        self.etapas = []  # (nome composto, nível, segundos, linhas)
+        self.segundos = 0.0
+        self.erro = None
+        self.arquivo_perfil = None
+        self._pilha = []
+        self._finalizada = False
+        self._perfil = cProfile.Profile() if (perfil_solicitado() if perfil is None else perfil) else None
+
+    @contextlib.contextmanager
+    def ativa(self):
+        """
+        Torna esta medição a atual da thread. Pode ser usada mais de uma vez (ex.:
+        cálculo na thread de trabalho e preenchimento da tela na da interface).
+        """
+        anterior = getattr(_local, "medicao", None)
+        _local.medicao = self
+        perfil_ligado = False
+        if self._perfil is not None:
+            try:
+                self._perfil.enable()
+                perfil_ligado = True
+            except ValueError as e:  # outro profiler já ativo nesta thread
+                logger.warning("Perfil não iniciado: %s", e)
+        inicio = time.perf_counter()
+        try:
+            yield self
+        except Exception as e:
+            self.erro = e
+            raise
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            if perfil_ligado:
+                self._perfil.disable()
+            _local.medicao = anterior
+
+    def registrar(self, nome, segundos, linhas=None, nivel=0):
+        self.etapas.append((nome, nivel, segundos, linhas))
+
+    def resumo(self, max_etapas=6):
+        """Texto curto para a tela: total e as etapas de primeiro nível."""
+        principais = [(nome, segundos, linhas) for nome, nivel, segundos, linhas in self.etapas if nivel == 0]
+        partes = []
+        for nome, segundos, linhas in principais[:max_etapas]:
+            partes.append(f"{nome} {segundos:.2f}s" + (f" ({linhas} lin.)" if linhas is not None else ""))
+        return f"{self.segundos:.2f}s" + (": " + " · ".join(partes) if partes else "")
+
+    def finalizar(self):
+        """Grava o resumo (e o perfil, se houver) no log. Retorna o texto do resumo."""
+        if self._finalizada:
+            return self.resumo()
+        self._finalizada = True
+
+        if isinstance(self.erro, ExecucaoCancelada):
+            status = "CANCELADA"
+        else:
+            status = "ERRO" if self.erro is not None else "OK"
+        linhas_log = [f"{self.nome}: {status} em {self.segundos:.3f}s"]
+        for nome, nivel, segundos, linhas in self.etapas:
+            linhas_log.append(f"    {'  ' * nivel}{nome}: {segundos:.3f}s"
+                              + (f" ({linhas} linha(s))" if linhas is not None else ""))
+        if self.erro is not None and status == "ERRO":
+            linhas_log.append(f"    erro: {type(self.erro).__name__}: {self.erro}")
+
+        if self._perfil is not None:
+            self.arquivo_perfil = self._gravar_perfil()
+            if self.arquivo_perfil:
+                linhas_log.append(f"    perfil: {self.arquivo_perfil}")
+
+        logger.info("\n".join(linhas_log))
+        return self.resumo()
+
+    def _gravar_perfil(self):
+        base = os.path.join(pasta_logs(), f"perfil_{self.nome}_{datetime.now():%Y%m%d-%H%M%S}")
+        try:
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            self._perfil.dump_stats(base + ".prof")
+            texto = io.StringIO()
+            pstats.Stats(self._perfil, stream=texto).sort_stats("cumulative").print_stats(40)
+            with open(base + ".txt", "w", encoding="utf-8") as arquivo:
+                arquivo.write(texto.getvalue())
+        except (OSError, TypeError) as e:  # TypeError: nenhuma chamada foi registrada
+            logger.warning("Perfil não gravado: %s", e)
+            return None
+        return base + ".prof"
+
+
+def medicao_atual():
+    return getattr(_local, "medicao", None)
+
+
+@contextlib.contextmanager
+def etapa(nome):
+    """
+    Mede o bloco como uma etapa da medição ativa na thread. O dicionário
+    devolvido aceita 'linhas' (quantidade de linhas produzidas pela etapa).
+    """
+    medicao = medicao_atual()
+    registro = {}
+    if medicao is None:
+        yield registro
+        return
+
+    medicao._pilha.append(nome)
+    nome_completo = SEPARADOR_ETAPAS.join(medicao._pilha)
+    nivel = len(medicao._pilha) - 1
+    # Reserva a posição para a etapa aparecer antes das suas sub-etapas
+    posicao = len(medicao.etapas)
+    medicao.etapas.append(None)
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        medicao._pilha.pop()
+        medicao.etapas[posicao] = (nome_completo, nivel, time.perf_counter() - inicio, registro.get('linhas'))
+
+
+def medir(nome, linhas=len):
+    """
+    Decorador: mede a função como a etapa `nome`; `linhas(retorno)` dá a
+    quantidade de linhas registrada (None para não registrar).
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with etapa(nome) as registro:
+                retorno = funcao(*args, **kwargs)
+                if linhas is not None:
+                    try:
+                        registro['linhas'] = linhas(retorno)
+                    except TypeError:
+                        pass
+                return retorno
+        return medida
+    return decorador
@@ -1,12 +1,20 @@
+import time
+# Reference point for the startup timing written to the log
+inicio_processo = time.perf_counter()
+
 from tkinter import *
 from tkinter import ttk
 from tkinter import Canvas
-from PIL import Image, ImageTk
-# Assuming DB.py contains the functions as used in your original code
-from DB import completar_informacoes, consolidar_dados, Processar_Demandas
-import pandas as pd
-import re
+# Only light modules are imported before the window appears. The compute layer
+# (DB, master_data, grade_virtual, filtros: pandas/numpy), the Excel writer
+# (exportacao: openpyxl) and PIL are imported in the background right after
+# startup (preload) or on first use.
+from execucao import ExecutorSegundoPlano
+from cache_resultados import CacheResultados
+from instrumentacao import Medicao, configurar_log, logger
+from veiculos import read_cached_vehicles, refresh_vehicle_cache, vehicle_mappings
 import os
+import queue
 import sys
 import threading
 
@@ -38,193 +46,79 @@ warnings.filterwarnings(
 )
 
 caminho_base = os.getcwd()
+# Rotating log under logs/ (the packaged exe has no console, so prints are lost)
+configurar_log(caminho_base)
+# Excel outputs are written in the background, one file at a time (created on first use)
+export_queue = None
+# Runs the computation off the UI thread; results come back through poll_results
+executor = ExecutorSegundoPlano()
+current_run = None
+# Set once the window close was requested; on_close then waits for pending exports
+closing = False
+# Last result on screen; the vehicle comparison reuses its enriched template
+last_result = None
+# Full results of this session (LRU); re-selecting a computed combination redraws from here
+results_cache = CacheResultados()
 # --- START: Global variables for filtering ---
-# Stores the complete, unfiltered data from the Treeview
-original_tree_data = []
 # A dictionary to hold the filter Combobox widgets
 filter_widgets = {}
+# Lower-cased column index over the current result frame (rebuilt after each run)
+filter_engine = None
 # --- END: Global variables ---
 
 
 # ------------------- carregar veículos dinâmicos -------------------
-def load_veiculos(caminho_base):
-    """
-    Tries to load VEÍCULOS.xlsx (or VEICULOS.xlsx) from caminho_base/BD and returns a dict:
-    {descricao_stripped: codigo_int_or_str}
-    If the file or expected columns are not found, returns None.
-    Only returns the display mapping (original descriptions -> code).
-    """
-    possible_files = [
-        os.path.join(caminho_base, "BD", "VEÍCULOS.xlsx"),
-        os.path.join(caminho_base, "BD", "VEICULOS.xlsx"),
-        os.path.join(caminho_base, "BD", "Veiculos.xlsx"),
-        os.path.join(caminho_base, "BD", "VEICULOS.xls")
-    ]
-    for fpath in possible_files:
-        if os.path.exists(fpath):
-            try:
-                df_veh = pd.read_excel(fpath, sheet_name=0, dtype=str)  # read as str to be safe
-                # normalize column names (case-insensitive)
-                cols = {c.strip().upper(): c for c in df_veh.columns}
-                # find code column (prefer "COD VEICULO" or similar)
-                code_col = None
-                desc_col = None
-                for key_upper, orig in cols.items():
-                    if "COD" in key_upper and "VEIC" in key_upper:
-                        code_col = orig
-                    if "DESCR" in key_upper or "DESC" in key_upper:
-                        desc_col = orig
-                # fallback: use first column as code and second (or next) as desc
-                if code_col is None and len(df_veh.columns) >= 1:
-                    code_col = df_veh.columns[0]
-                if desc_col is None and len(df_veh.columns) >= 2:
-                    # try second column
-                    desc_col = df_veh.columns[1]
-                if code_col is None or desc_col is None:
-                    # can't map properly from this file
-                    continue
-                veic_map = {}
-                for _, r in df_veh.iterrows():
-                    desc = str(r.get(desc_col, "")).strip()
-                    code_raw = r.get(code_col, "")
-                    # try to convert code to int if possible, else keep as string
-                    try:
-                        code = int(float(str(code_raw).strip()))
-                    except Exception:
-                        code = str(code_raw).strip()
-                    if desc:
-                        # store only the original description as display key
-                        if desc not in veic_map:
-                            veic_map[desc] = code
-                if veic_map:
-                    print(f"[INFO] Loaded {len(veic_map)} vehicles from {fpath}")
-                    return veic_map
-            except Exception as e:
-                print(f"[WARN] Could not read vehicles file {fpath}: {e}")
-    # If we get here, no good file found
-    return None
-
-# Keep your original static mapping as a fallback so behavior remains unchanged if file is missing.
-_FALLBACK_VEICULOS_DISPLAY = {
-    'BIG SIDER': 6, 'BITREM': 7, 'CARRETA': 4, 'CARRETA LINE HAUL': 14,
-    'CARRETA REBAIXADA': 9, 'CTNR 20': 15, 'CTNR 40': 16, 'FIORINO': 11,
-    'RODOTREM': 8, 'TRUCK 3M': 3, 'TRUCK 3M ALONGADO': 18, 'TRUCK 3M PLUS': 13,
-    'TRUCK ALONGADO': 17, 'TRUCK VIAGEM': 2, 'TRUCK VIAGEM PLUS': 12, 'VAN': 10,
-    'VANDERLEA': 5, 'VEÍCULO 3/4': 1, 'TRUCK SIDER': 2
-}
-
-# load display dict (used for labels) and build lookup dict (case-insensitive) used for mapping
-veiculos_display = load_veiculos(caminho_base) or _FALLBACK_VEICULOS_DISPLAY
-# build lookup dict (includes uppercase keys for robustness)
-veiculos_lookup = {}
-for k, v in veiculos_display.items():
-    veiculos_lookup[k] = v
-    veiculos_lookup[k.upper()] = v
+# load display dict (used for labels), lookup dict (case-insensitive) and the name -> code function.
+# At startup this is the list cached by the previous session; preload re-reads VEÍCULOS.xlsx
+# in the background when it changed and the buttons are rebuilt.
+veiculos_display, veiculos_lookup, get_vehicle_code = vehicle_mappings(read_cached_vehicles(caminho_base))
 # ------------------------------------------------------------------
+# Messages from background threads (preload, vehicle list refresh) to the UI thread
+background_events = queue.Queue()
 
 
-def get_vehicle_code(nome_veiculo):
-    """
-    Robust lookup: try exact name, stripped, upper-case, and finally fallback to None.
-    Uses veiculos_lookup (built from the display mapping).
-    """
-    if nome_veiculo is None:
-        return None
-    s = str(nome_veiculo).strip()
-    if s in veiculos_lookup:
-        return veiculos_lookup[s]
-    su = s.upper()
-    if su in veiculos_lookup:
-        return veiculos_lookup[su]
-    return None
+def get_master_data():
+    """Session MasterData (reference tables shared by every run); imports the compute layer."""
+    from master_data import obter_master_data
+    return obter_master_data(caminho_base)
 
 
-def normalizar_codigos(campo):
-    if pd.isna(campo):
-        return []
-    return re.split(r'\s*/\s*', str(campo).strip())
+def get_export_queue():
+    """Background Excel writer, created on the first export (UI thread)."""
+    global export_queue
+    if export_queue is None:
+        from exportacao import FilaExportacao
+        export_queue = FilaExportacao()
+    return export_queue
 
 
-def input_demanda(cod_destinos):
+def input_demanda(cod_destinos, exportar=True):
     """
     cod_destinos: list of codes entered by the user, e.g. [1080, 1046]
     Returns a DataFrame with all matched rows, saving full COD DESTINO values.
+    Template.xlsx is only written when exportar=True; the pipeline itself uses the returned frame.
     """
-    fluxos = os.path.join(caminho_base, "BD", "FLUXO.xlsx")
-    db_fluxos = pd.read_excel(fluxos, sheet_name='FLUXOS')
-    
-    all_rows = []  # collect all rows here
-
-    # ensure cod_destinos is a list of strings
-    cod_destinos = [str(c).strip() for c in cod_destinos]
-
-    for cod_dest in cod_destinos:
-        df = Processar_Demandas(cod_dest)
-        
-        for _, row in df.iterrows():
-            cod_forn = str(row["COD FORNECEDOR"]).strip()
-            codigo = None
-            tipo = None
-            cod_ims = None
-            cod_dest_full = cod_dest  # default
-
-            for _, linha_fluxo in db_fluxos.iterrows():
-                cods_sap = normalizar_codigos(linha_fluxo["COD FORNECEDOR"])
-                cods_dest_raw = str(linha_fluxo["COD DESTINO"]).strip()
-                cods_dest_split = re.split(r'\s*/\s*', cods_dest_raw)
-
-                if cod_forn in cods_sap and cod_dest in cods_dest_split:
-                    nome_veiculo = linha_fluxo["VEICULO PRINCIPAL"]
-                    codigo = get_vehicle_code(nome_veiculo)
-                    tipo = linha_fluxo.get("TIPO SATURACAO", None)
-                    cod_ims = linha_fluxo.get("COD IMS", None)
-                    cod_dest_full = cods_dest_raw
-                    break
-
-            # append full row data
-            all_rows.append({
-                "COD FORNECEDOR": cod_forn,
-                "COD IMS": cod_ims,
-                "COD DESTINO": cod_dest_full,
-                "DESENHO": row["DESENHO"],
-                "QTDE": row["QTDE"],
-                "VEICULO": codigo,
-                "TIPO SATURACAO": tipo
-            })
-
-    df_final = pd.DataFrame(all_rows)
-    df_final.to_excel("Template.xlsx", index=False)
-    return df_final  # optionally return for further processing
+    from DB import montar_demanda
+    df_final = montar_demanda(cod_destinos, get_vehicle_code, get_master_data())
+    if exportar:
+        df_final.to_excel("Template.xlsx", index=False)
+    return df_final
 
 
 def apply_filters(event=None):
     """
-    Filters the Treeview using "contains" logic for typed text.
-    Also handles dropdown selections.
+    Filters the result grid using "contains" logic for typed text.
+    Also handles dropdown selections and the global search box.
+    All active filters are evaluated together by filter_engine.
     """
     if event and event.widget.get() == "-- All --":
         event.widget.set('')
 
-    tree.delete(*tree.get_children())
+    if filter_engine is None:
+        return
 
     filters = {col: widget.get() for col, widget in filter_widgets.items()}
-    
-    column_ids = tree["columns"]
-
-    for row_values in original_tree_data:
-        match = True
-        row_dict = dict(zip(column_ids, row_values))
-
-        for col_id, filter_value in filters.items():
-            if filter_value:
-                cell_value = str(row_dict.get(col_id, "")).lower()
-                text_to_find = filter_value.lower()
-                if text_to_find not in cell_value:
-                    match = False
-                    break
-        
-        if match:
-            tree.insert("", END, values=row_values)
+    grade.filtrar(filter_engine.filtrar(filters, global_search_var.get()))
 
 
 # Use veiculos_display for UI labels (no duplicate uppercase keys)
@@ -233,12 +127,8 @@ veiculos_dict = veiculos_display.copy()
 
 # --------------------- GUI (mantive seu design e cores originais) ---------------------
 janela = Tk()
-try:
-    img = Image.open(resource_path("carreta.png")).resize((140, 100))
-    caminhao_img = ImageTk.PhotoImage(img)
-except Exception as e:
-    print(f"Erro ao carregar imagem da carreta: {e}")
-    caminhao_img = None
+# Loaded by load_truck_image once the window is up
+caminhao_img = None
 janela.title("VIAJANTE => ENGENHARIA DE TRANSPORTES")
 janela.geometry("1400x700")
 janela.state('zoomed')
@@ -281,11 +171,19 @@ style.map("Vehicle.Toolbutton", background=[('active', '#FFD633'), ('selected',
           foreground=[('selected', 'white')])
 
 colunas = 3
-# build radio buttons from veiculos_dict (which is the display dict)
-for i, (nome, cod) in enumerate(sorted(veiculos_dict.items())):
-    rb = ttk.Radiobutton(frame_veiculos, text=nome, variable=veiculo_var,
-                         value=str(cod), style="Vehicle.Toolbutton")
-    rb.grid(row=i // colunas, column=i % colunas, sticky='w', padx=2, pady=2)
+
+
+def build_vehicle_buttons():
+    """(Re)builds the radio buttons from veiculos_dict (which is the display dict)."""
+    for widget in frame_veiculos.winfo_children():
+        widget.destroy()
+    for i, (nome, cod) in enumerate(sorted(veiculos_dict.items())):
+        rb = ttk.Radiobutton(frame_veiculos, text=nome, variable=veiculo_var,
+                             value=str(cod), style="Vehicle.Toolbutton")
+        rb.grid(row=i // colunas, column=i % colunas, sticky='w', padx=2, pady=2)
+
+
+build_vehicle_buttons()
 
 label_veiculo = Label(frame_selecao, text="", bg="#002855", fg="#FFCC00", font=("Arial", 9, "bold"))
 label_veiculo.grid(row=2, column=1, columnspan=3, pady=2)
@@ -308,6 +206,9 @@ vcmd = (janela.register(validate_numeric), '%P')
 entry_cod_destino = Entry(frame_selecao, textvariable=cod_destino_var, width=10, validate="key", validatecommand=vcmd)
 entry_cod_destino.grid(row=2, column=6, pady=(10, 5), sticky='w')
 btn_atualizar.grid(row=2, column=7, pady=(10, 5), padx=5, sticky="ew")
+btn_comparar = ttk.Button(frame_selecao, text="Comparar Veículos",
+                          command=lambda: show_vehicle_comparison(), style="Modern.TButton")
+btn_comparar.grid(row=2, column=8, pady=(10, 5), padx=5, sticky="ew")
 
 frame_caminhoes = Frame(frame_top, bg="#002855")
 frame_caminhoes.grid(row=0, column=0, padx=(550, 0), sticky='nw')
@@ -344,8 +245,13 @@ scroll_x.pack(side=BOTTOM, fill=X)
 tree = ttk.Treeview(tree_frame, yscrollcommand=scroll_y.set, xscrollcommand=scroll_x.set)
 tree.pack(fill=BOTH, expand=True)
 
-scroll_y.config(command=tree.yview)
 scroll_x.config(command=tree.xview)
+# Only the rows in view are materialised in the Treeview; the grid owns the vertical scrollbar.
+# Created with the first result (GradeVirtual needs pandas).
+grade = None
+# Typing only re-filters once the user pauses (debounce); created with the grid
+schedule_filters = None
+global_search_var = StringVar(value='')
 
 style.configure("Treeview.Heading", background="#002855", foreground="#FFCC00",
                 font=("Arial", 8, "bold"), relief="flat")
@@ -354,92 +260,220 @@ style.map("Treeview.Heading", background=[('active', '#004080')])
 
 
 
+def run_pipeline(cod_destinos, veiculo, usar_manual, cancelado=None):
+    """
+    Worker-thread part of a run: pure computation, no Tk calls.
+    Waits for the previous run's files before producing new ones.
+    """
+    if export_queue is not None:
+        export_queue.aguardar()
+    from DB import executar_pipeline
+    master_data = get_master_data()
+    # Picks up an edited VEÍCULOS.xlsx for this run; the buttons follow via background_events
+    novos_veiculos = refresh_vehicle_cache(caminho_base, master_data)
+    vehicle_code = get_vehicle_code
+    if novos_veiculos is not None:
+        vehicle_code = vehicle_mappings(novos_veiculos)[2]
+        background_events.put(('veiculos', novos_veiculos))
+    medicao = Medicao("execucao")
+    try:
+        with medicao.ativa():
+            resultado = executar_pipeline(cod_destinos, veiculo, vehicle_code, usar_manual,
+                                          master_data, cancelado=cancelado, cache=results_cache)
+    except Exception:
+        medicao.finalizar()
+        raise
+    # Stage timings travel with the result; show_result adds the tree fill and logs them
+    resultado['medicao'] = medicao
+    return resultado
+
+
+def cached_result(cod_destinos, veiculo, usar_manual):
+    """
+    Result of an identical earlier run of this session, or None. Only stats the
+    demand and BD files, so it is cheap enough for the UI thread.
+    """
+    if not len(results_cache):
+        return None
+    from DB import chave_pipeline
+    try:
+        resultado = results_cache.obter(chave_pipeline(cod_destinos, veiculo, usar_manual, get_master_data()))
+    except OSError:  # missing BD file: let the normal run report it
+        return None
+    if resultado is None:
+        return None
+    resultado = dict(resultado)
+    resultado['medicao'] = Medicao("execucao_cache")
+    return resultado
+
+
 def atualizar():
-    # --- Start spinner ---
+    """Reads the inputs on the UI thread and starts a run; a newer click supersedes an older run."""
+    global current_run
+    cod = veiculo_var.get()
+    label_veiculo.config(text=f"Código selecionado: {cod}")
+    if not cod:
+        return
+
+    # split input codes by comma (all codes processed together)
+    cod_destino_values = [c.strip() for c in cod_destino_var.get().split(',') if c.strip()]
+
+    resultado = cached_result(cod_destino_values, int(cod), modo_manual.get())
+    if resultado is not None:
+        # Already computed: redraw at once and drop any run still in flight
+        executor.cancelar()
+        current_run = None
+        loading_label.spinning = False
+        show_result(resultado)
+        loading_label.place(relx=0.5, rely=0.5, anchor='center')
+        finalizar_status("Concluído (resultado em cache)", "#2e8b57")
+        logger.info(results_cache.resumo())
+        return
+
+    current_run = executor.iniciar(run_pipeline, cod_destino_values, int(cod), modo_manual.get())
     start_loading()
 
-    def processar():
-        try:
-            cod_destino_str = cod_destino_var.get()
-            try:
-                cod_destino_values = [int(code.strip()) for code in cod_destino_str.split(',') if code.strip().isdigit()]
-                if not cod_destino_values:
-                    cod_destino_values = [1080]  # fallback if empty
-            except ValueError:
-                cod_destino_values = [1080]
-
-            cod = veiculo_var.get()
-            label_veiculo.config(text=f"Código selecionado: {cod}")
-
-            if cod:
-                # split input codes by comma
-                cod_destino_values = [c.strip() for c in cod_destino_var.get().split(',') if c.strip()]
-                df_final = input_demanda(cod_destino_values)  # all codes processed together
-
-                completar_informacoes(
-                    tree, int(cod), tree_resumo, canvas_caminhoes, caminhao_img, usar_manual=modo_manual.get()
-                )
-
-                global original_tree_data
-                original_tree_data = [tree.item(child)['values'] for child in tree.get_children()]
-
-                columns_to_filter = ['COD FORNECEDOR', 'FORNECEDOR', 'DESENHO', 'CAPACIDADE ÚTIL (%)']
-                all_table_columns = list(tree["columns"])
-
-                if not filter_widgets:
-                    for widget in frame_filters.winfo_children():
-                        widget.destroy()
-
-                    for col_id in columns_to_filter:
-                        if col_id in all_table_columns:
-                            col_frame = Frame(frame_filters)
-                            col_frame.pack(side=LEFT, padx=2, fill=X, expand=True)
-                            Label(col_frame, text=col_id, font=("Arial", 8)).pack(anchor='w')
-                            combo = ttk.Combobox(col_frame, font=("Arial", 9))
-                            combo.pack(fill=X)
-                            combo.bind('<KeyRelease>', apply_filters)
-                            combo.bind('<<ComboboxSelected>>', apply_filters)
-                            filter_widgets[col_id] = combo
-
-                for col_id, combo in filter_widgets.items():
-                    col_index = all_table_columns.index(col_id)
-                    unique_values = sorted(
-                        list(set(str(row[col_index]) for row in original_tree_data if str(row[col_index]).strip()))
-                    )
-                    combo['values'] = ["-- All --"] + unique_values
-                    combo.set('')
-
-                consolidar_dados()
-
-            # --- Stop spinner and show success ---
-            loading_label.spinning = False
-            janela.after(0, lambda: finalizar_status("Concluído com sucesso!", "#2e8b57"))
 
+def show_result(resultado):
+    """Applies a finished run to the widgets (UI thread only) and queues the Excel exports."""
+    global filter_engine, last_result, grade, schedule_filters
+    from DB import exportar_viajante, preencher_interface
+    from filtros import MotorFiltros, Adiador
+    if grade is None:
+        from grade_virtual import GradeVirtual
+        grade = GradeVirtual(tree, scroll_y)
+        schedule_filters = Adiador(janela, apply_filters)
+    last_result = resultado
+    medicao = resultado['medicao']
+    with medicao.ativa():
+        preencher_interface(resultado, grade, tree_resumo, canvas_caminhoes, caminhao_img)
+    timing_status.config(text=f"Última execução: {medicao.finalizar()}")
+
+    columns_to_filter = ['COD FORNECEDOR', 'FORNECEDOR', 'DESENHO', 'CAPACIDADE ÚTIL (%)']
+    all_table_columns = list(tree["columns"])
+
+    if not filter_widgets:
+        for widget in frame_filters.winfo_children():
+            widget.destroy()
+
+        search_frame = Frame(frame_filters)
+        search_frame.pack(side=LEFT, padx=2, fill=X, expand=True)
+        Label(search_frame, text="BUSCAR EM TODAS AS COLUNAS", font=("Arial", 8)).pack(anchor='w')
+        search_entry = Entry(search_frame, textvariable=global_search_var, font=("Arial", 9))
+        search_entry.pack(fill=X)
+        search_entry.bind('<KeyRelease>', schedule_filters)
+
+        for col_id in columns_to_filter:
+            if col_id in all_table_columns:
+                col_frame = Frame(frame_filters)
+                col_frame.pack(side=LEFT, padx=2, fill=X, expand=True)
+                Label(col_frame, text=col_id, font=("Arial", 8)).pack(anchor='w')
+                combo = ttk.Combobox(col_frame, font=("Arial", 9))
+                combo.pack(fill=X)
+                combo.bind('<KeyRelease>', schedule_filters)
+                combo.bind('<<ComboboxSelected>>', apply_filters)
+                filter_widgets[col_id] = combo
+
+    filter_engine = MotorFiltros(grade.df)
+    global_search_var.set('')
+
+    for col_id, combo in filter_widgets.items():
+        if col_id not in grade.df.columns:
+            continue
+        unique_values = filter_engine.valores_distintos(col_id)
+        combo['values'] = ["-- All --"] + unique_values
+        combo.set('')
+
+    exportacoes = get_export_queue()
+    exportacoes.agendar('VIAJANTE.xlsx', lambda caminho: exportar_viajante(resultado, caminho))
+    volume = resultado['volume_por_rota']
+    exportacoes.agendar('Volume_por_rota.xlsx', lambda caminho: volume.to_excel(caminho, index=False))
+
+
+def show_vehicle_comparison():
+    """
+    Ranks every vehicle over the last run's template in one vectorised pass
+    (no demand re-reading, no per-vehicle recompute) and shows it in its own window.
+    """
+    if last_result is None:
+        loading_label.place(relx=0.5, rely=0.5, anchor='center')
+        finalizar_status("Atualize os dados antes de comparar os veículos", "red")
+        return
+
+    from DB import comparar_veiculos
+    comparacao = comparar_veiculos(last_result['template'], get_master_data())
+
+    janela_comparacao = Toplevel(janela)
+    janela_comparacao.title("Comparação de Veículos")
+    colunas_comparacao = list(comparacao.columns)
+    tree_comparacao = ttk.Treeview(janela_comparacao, columns=colunas_comparacao, show="headings",
+                                   height=min(len(comparacao), 20))
+    for col in colunas_comparacao:
+        tree_comparacao.heading(col, text=col)
+        tree_comparacao.column(col, width=max(80, len(col) * 8), anchor='center')
+    for row in comparacao.itertuples(index=False):
+        tree_comparacao.insert("", END, values=row)
+    tree_comparacao.pack(fill=BOTH, expand=True, padx=10, pady=10)
+
+    get_export_queue().agendar('Comparacao_veiculos.xlsx', lambda caminho: comparacao.to_excel(caminho, index=False))
+
+
+def apply_vehicle_list(novos_veiculos):
+    """Swaps in a refreshed vehicle list and rebuilds the buttons (UI thread)."""
+    global veiculos_display, veiculos_lookup, get_vehicle_code, veiculos_dict
+    veiculos_display, veiculos_lookup, get_vehicle_code = vehicle_mappings(novos_veiculos)
+    veiculos_dict = veiculos_display.copy()
+    build_vehicle_buttons()
+    logger.info("Lista de veículos atualizada (%d veículo(s))", len(veiculos_dict))
+
+
+def poll_results():
+    """Delivers worker and preload results to the UI thread."""
+    global current_run
+    while True:
+        try:
+            evento, valor = background_events.get_nowait()
+        except queue.Empty:
+            break
+        if evento == 'veiculos':
+            apply_vehicle_list(valor)
+        elif evento == 'preload':
+            logger.info("Inicialização: módulos de cálculo e bases BD prontos em %.2fs",
+                        time.perf_counter() - inicio_processo)
+    for item in executor.resultados():
+        current_run = None
+        loading_label.spinning = False
+        if item.erro is not None:
+            print(f"Ocorreu um erro durante a atualização: {item.erro}")
+            finalizar_status(f"Erro: {item.erro}", "red")
+            continue
+        try:
+            show_result(item.valor)
+            finalizar_status(f"Concluído com sucesso! ({item.valor['medicao'].segundos:.1f}s)", "#2e8b57")
         except Exception as e:
             print(f"Ocorreu um erro durante a atualização: {e}")
-            loading_label.spinning = False
-            janela.after(0, lambda: finalizar_status(f"Erro: {e}", "red"))
-
-    threading.Thread(target=processar, daemon=True).start()
-
+            logger.exception("Erro ao mostrar o resultado")
+            finalizar_status(f"Erro: {e}", "red")
+    janela.after(100, poll_results)
 
 
 def start_loading():
+    """Shows the loading label; the spinner is advanced by janela.after (no extra thread)."""
     spinner_chars = ['|', '/', '--', '\\']
     loading_label.place(relx=0.5, rely=0.5, anchor='center')
     loading_label.lift()
-    janela.update_idletasks()
-
-    def spin():
-        i = 0
-        while getattr(loading_label, "spinning", False):
-            loading_label.config(text=f"Processando... {spinner_chars[i % len(spinner_chars)]}")
-            i += 1
-            janela.update_idletasks()
-            threading.Event().wait(0.1)  # short delay for animation
 
+    if getattr(loading_label, "spinning", False):
+        return  # spinner already running for a superseded run
     loading_label.spinning = True
-    threading.Thread(target=spin, daemon=True).start()
+
+    def spin(i=0):
+        if not getattr(loading_label, "spinning", False):
+            return
+        loading_label.config(text=f"Processando... {spinner_chars[i % len(spinner_chars)]}")
+        janela.after(100, spin, i + 1)
+
+    spin()
 
   
 def finalizar_status(msg, color):
@@ -457,10 +491,103 @@ footer_left = Label(footer_frame, text="DHL → STELLANTIS",
                     anchor="w", padx=8, pady=0)
 footer_left.pack(side=LEFT, fill=Y)
 
+export_status = Label(footer_frame, text="", font=("Arial", 7), bg="#002855", fg="#FFCC00")
+export_status.pack(side=LEFT, fill=Y, expand=True)
+
+# Per-stage timing of the last run (the full breakdown goes to logs/viajante.log)
+timing_status = Label(footer_frame, text="", font=("Arial", 7), bg="#002855", fg="white")
+timing_status.pack(side=LEFT, fill=Y, expand=True)
+
+
+def poll_exports():
+    """Shows background export progress/completion in the footer."""
+    if export_queue is None:
+        janela.after(300, poll_exports)
+        return
+    for caminho, erro, segundos in export_queue.notificacoes():
+        if erro is None:
+            export_status.config(text=f"{caminho} salvo ({segundos:.1f}s)", fg="#FFCC00")
+        else:
+            export_status.config(text=f"Erro ao salvar {caminho}: {erro}", fg="red")
+    if export_queue.pendentes() and not closing:
+        export_status.config(text=f"Salvando arquivos... ({export_queue.pendentes()} pendente(s))", fg="white")
+    janela.after(300, poll_exports)
+
+
+def on_close():
+    """
+    Closes the window only after the queued Excel writes finish: the export
+    thread is a daemon, and killing it mid-write would leave the previous run's
+    files on disk as if they were this run's.
+    """
+    global closing
+    if closing:
+        return  # already waiting for the exports
+    closing = True
+    executor.cancelar()  # a superseded run's result is discarded, so nothing new is queued
+    close_when_saved()
+
+
+def close_when_saved():
+    if export_queue is not None and export_queue.pendentes():
+        export_status.config(text=f"Salvando arquivos antes de fechar... ({export_queue.pendentes()} pendente(s))",
+                             fg="white")
+        janela.after(300, close_when_saved)
+        return
+    janela.destroy()
+
+
+def load_truck_image():
+    """Loads the truck picture (PIL) once the window is on screen."""
+    global caminhao_img
+    try:
+        from PIL import Image, ImageTk
+        img = Image.open(resource_path("carreta.png")).resize((140, 100))
+        caminhao_img = ImageTk.PhotoImage(img)
+    except Exception as e:
+        print(f"Erro ao carregar imagem da carreta: {e}")
+        caminhao_img = None
+
+
+def preload():
+    """
+    Background thread started with the window: imports the compute and export
+    layers, loads the BD tables into MasterData (pickle cache) and refreshes the
+    cached vehicle list if VEÍCULOS.xlsx changed. A run started meanwhile simply
+    waits on the same imports / table locks.
+    """
+    try:
+        import DB  # noqa: F401  (pandas, numpy, openpyxl)
+        import exportacao  # noqa: F401
+        import filtros  # noqa: F401
+        import grade_virtual  # noqa: F401
+        from cache_bd import BASES_BD
+        master_data = get_master_data()
+        for nome in BASES_BD:
+            master_data.tabela(nome)
+        novos_veiculos = refresh_vehicle_cache(caminho_base, master_data)
+        if novos_veiculos is not None:
+            background_events.put(('veiculos', novos_veiculos))
+    except Exception:
+        logger.exception("Erro ao pré-carregar os módulos e as bases")
+    background_events.put(('preload', None))
+
+
+def report_startup():
+    logger.info("Inicialização: janela pronta em %.2fs", time.perf_counter() - inicio_processo)
+
+
+poll_exports()
+poll_results()
+
 footer_right = Label(footer_frame, text="Developer: Vincent Pernarh", 
                      font=("Arial", 7), bg="#002855", fg="#FFCC00", 
                      anchor="e", padx=8, pady=0)
 footer_right.pack(side=RIGHT, fill=Y)
 
+janela.after_idle(report_startup)
+janela.after_idle(load_truck_image)
+threading.Thread(target=preload, name="preload", daemon=True).start()
+janela.protocol("WM_DELETE_WINDOW", on_close)
 janela.mainloop()
 
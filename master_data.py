@@ -0,0 +1,103 @@
+import os
+import threading
+from cache_bd import BASES_BD, assinatura_arquivo, carregar_base, ler_excel_cache
+from instrumentacao import etapa
+
+
+class MasterData:
+    """
+    Tabelas de referência (bases BD, FLUXO e veículos) mantidas em memória
+    durante todo o processo.
+
+    Cada tabela é carregada na primeira vez que é pedida e reaproveitada nas
+    execuções seguintes. A cada acesso o mtime/tamanho do arquivo de origem é
+    conferido, e só a tabela cujo arquivo mudou é recarregada.
+
+    Os DataFrames devolvidos são compartilhados: quem precisar alterá-los deve
+    trabalhar sobre uma cópia (ex.: df.assign(...)).
+    """
+
+    def __init__(self, caminho_base=None, caminho_BD='BD'):
+        self.caminho_base = caminho_base or os.getcwd()
+        self.pasta_BD = os.path.join(self.caminho_base, caminho_BD)
+        self._tabelas = {}    # chave -> (assinatura, df)
+        self._derivados = {}  # nome -> (versões das dependências, valor)
+        self._lock = threading.RLock()
+
+    def _carregar(self, chave, caminho, carregar):
+        assinatura = assinatura_arquivo(caminho)
+        with self._lock:
+            atual = self._tabelas.get(chave)
+            if atual is not None and atual[0] == assinatura:
+                return atual[1]
+            if atual is not None:
+                print(f"[INFO] {os.path.basename(caminho)} alterado, recarregando tabela.")
+            with etapa(f"carga {os.path.basename(caminho)}") as registro:
+                df = carregar()
+                registro['linhas'] = len(df)
+            self._tabelas[chave] = (assinatura, df)
+            return df
+
+    def tabela(self, nome):
+        """Retorna uma das tabelas de BASES_BD ('pn', 'mdr', 'veiculos', 'empilhamento', 'efi', 'fluxo')."""
+        arquivo = BASES_BD[nome][0]
+        caminho = os.path.join(self.pasta_BD, arquivo)
+        return self._carregar(nome, caminho, lambda: carregar_base(nome, self.pasta_BD))
+
+    def tabela_arquivo(self, caminho, sheet_name=0, **kwargs_leitura):
+        """Mesma lógica de tabela(), para planilhas fora do catálogo BASES_BD."""
+        chave = (os.path.abspath(caminho), sheet_name, repr(sorted(kwargs_leitura.items(), key=str)))
+        return self._carregar(chave, caminho,
+                              lambda: ler_excel_cache(caminho, sheet_name=sheet_name, **kwargs_leitura))
+
+    def versao(self, nome):
+        """Assinatura (caminho, mtime, tamanho) atual do arquivo da tabela."""
+        return assinatura_arquivo(os.path.join(self.pasta_BD, BASES_BD[nome][0]))
+
+    def __getstate__(self):
+        # O lock não vai para outro processo (spawn); a cópia cria o seu em __setstate__
+        estado = self.__dict__.copy()
+        del estado['_lock']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock = threading.RLock()
+
+    def para_processo_filho(self):
+        """
+        Prepara a instância herdada por um processo de trabalho (fork) ou recebida
+        por ele (spawn): as tabelas e derivados já carregados são reaproveitados,
+        e o lock é recriado, pois no fork ele pode ter sido copiado travado por
+        outra thread do processo principal.
+        """
+        self._lock = threading.RLock()
+        return self
+
+    def derivado(self, nome, dependencias, construir):
+        """
+        Estrutura calculada a partir de uma ou mais tabelas (índices, mapas, ...).
+        É reconstruída apenas quando alguma das tabelas em `dependencias` muda.
+        """
+        with self._lock:
+            tabelas = [self.tabela(dep) for dep in dependencias]
+            versoes = tuple(self._tabelas[dep][0] for dep in dependencias)
+            atual = self._derivados.get(nome)
+            if atual is not None and atual[0] == versoes:
+                return atual[1]
+            valor = construir(*tabelas)
+            self._derivados[nome] = (versoes, valor)
+            return valor
+
+
+_master_data = None
+_lock_master_data = threading.Lock()
+
+
+def obter_master_data(caminho_base=None):
+    """Instância única de MasterData do processo (criada no primeiro uso, em qualquer thread)."""
+    global _master_data
+    with _lock_master_data:
+        if _master_data is None:
+            _master_data = MasterData(caminho_base)
+        return _master_data
@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+from functools import partial
+from cache_bd import PASTA_CACHE, assinatura_arquivo
+
+
+# Candidate vehicle workbooks under caminho_base/BD, in order of preference
+ARQUIVOS_VEICULOS = ["VEÍCULOS.xlsx", "VEICULOS.xlsx", "Veiculos.xlsx", "VEICULOS.xls"]
+
+# Vehicle list saved for the next startup (read without pandas / openpyxl)
+ARQUIVO_CACHE_VEICULOS = "veiculos.json"
+_cache_lock = threading.Lock()
+
+
+def load_veiculos(caminho_base, master=None):
+    """
+    Tries to load VEÍCULOS.xlsx (or VEICULOS.xlsx) from caminho_base/BD and returns a dict:
+    {descricao_stripped: codigo_int_or_str}
+    If the file or expected columns are not found, returns None.
+    Only returns the display mapping (original descriptions -> code).
+    The sheet is read through `master` (MasterData), so it is cached like the BD tables.
+    """
+    if master is None:
+        from master_data import obter_master_data  # pulls in pandas; only needed here
+        master = obter_master_data(caminho_base)
+    for fpath in _possible_files(caminho_base):
+        if os.path.exists(fpath):
+            try:
+                df_veh = master.tabela_arquivo(fpath, sheet_name=0, dtype=str)  # read as str to be safe
+                # normalize column names (case-insensitive)
+                cols = {c.strip().upper(): c for c in df_veh.columns}
+                # find code column (prefer "COD VEICULO" or similar)
+                code_col = None
+                desc_col = None
+                for key_upper, orig in cols.items():
+                    if "COD" in key_upper and "VEIC" in key_upper:
+                        code_col = orig
+                    if "DESCR" in key_upper or "DESC" in key_upper:
+                        desc_col = orig
+                # fallback: use first column as code and second (or next) as desc
+                if code_col is None and len(df_veh.columns) >= 1:
+                    code_col = df_veh.columns[0]
+                if desc_col is None and len(df_veh.columns) >= 2:
+                    # try second column
+                    desc_col = df_veh.columns[1]
+                if code_col is None or desc_col is None:
+                    # can't map properly from this file
+                    continue
+                veic_map = {}
+                for desc_raw, code_raw in zip(df_veh[desc_col].tolist(), df_veh[code_col].tolist()):
+                    desc = str(desc_raw).strip()
+                    # try to convert code to int if possible, else keep as string
+                    try:
+                        code = int(float(str(code_raw).strip()))
+                    except Exception:
+                        code = str(code_raw).strip()
+                    if desc:
+                        # store only the original description as display key
+                        if desc not in veic_map:
+                            veic_map[desc] = code
+                if veic_map:
+                    print(f"[INFO] Loaded {len(veic_map)} vehicles from {fpath}")
+                    return veic_map
+            except Exception as e:
+                print(f"[WARN] Could not read vehicles file {fpath}: {e}")
+    # If we get here, no good file found
+    return None
+
+
+def _possible_files(caminho_base):
+    return [os.path.join(caminho_base, "BD", nome) for nome in ARQUIVOS_VEICULOS]
+
+
+def _vehicles_signature(caminho_base):
+    """(path, mtime, size) of the first existing vehicle workbook, or None."""
+    for fpath in _possible_files(caminho_base):
+        if os.path.exists(fpath):
+            return list(assinatura_arquivo(fpath))
+    return None
+
+
+def _cache_path(caminho_base):
+    return os.path.join(caminho_base, PASTA_CACHE, ARQUIVO_CACHE_VEICULOS)
+
+
+def _read_cache(caminho_base):
+    try:
+        with open(_cache_path(caminho_base), encoding="utf-8") as f:
+            entry = json.load(f)
+        return entry["assinatura"], entry["veiculos"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+
+def _write_cache(caminho_base, signature, veiculos_display):
+    path = _cache_path(caminho_base)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"assinatura": signature, "veiculos": veiculos_display}, f, ensure_ascii=False)
+        os.replace(temp, path)
+    except OSError as e:
+        print(f"[WARN] Could not save the vehicle list cache: {e}")
+
+
+# Keep your original static mapping as a fallback so behavior remains unchanged if file is missing.
+_FALLBACK_VEICULOS_DISPLAY = {
+    'BIG SIDER': 6, 'BITREM': 7, 'CARRETA': 4, 'CARRETA LINE HAUL': 14,
+    'CARRETA REBAIXADA': 9, 'CTNR 20': 15, 'CTNR 40': 16, 'FIORINO': 11,
+    'RODOTREM': 8, 'TRUCK 3M': 3, 'TRUCK 3M ALONGADO': 18, 'TRUCK 3M PLUS': 13,
+    'TRUCK ALONGADO': 17, 'TRUCK VIAGEM': 2, 'TRUCK VIAGEM PLUS': 12, 'VAN': 10,
+    'VANDERLEA': 5, 'VEÍCULO 3/4': 1, 'TRUCK SIDER': 2
+}
+
+
+def build_vehicle_lookup(veiculos_display):
+    """Lookup dict used for mapping (includes uppercase keys for robustness)."""
+    veiculos_lookup = {}
+    for k, v in veiculos_display.items():
+        veiculos_lookup[k] = v
+        veiculos_lookup[k.upper()] = v
+    return veiculos_lookup
+
+
+def lookup_vehicle_code(veiculos_lookup, nome_veiculo):
+    """
+    Robust lookup: try exact name, stripped, upper-case, and finally fallback to None.
+    veiculos_lookup is the dict built by build_vehicle_lookup.
+    """
+    if nome_veiculo is None:
+        return None
+    s = str(nome_veiculo).strip()
+    if s in veiculos_lookup:
+        return veiculos_lookup[s]
+    su = s.upper()
+    if su in veiculos_lookup:
+        return veiculos_lookup[su]
+    return None
+
+
+def vehicle_mappings(veiculos_display):
+    """(display dict, lookup dict, picklable name -> code function) for a display dict."""
+    veiculos_lookup = build_vehicle_lookup(veiculos_display)
+    return veiculos_display, veiculos_lookup, partial(lookup_vehicle_code, veiculos_lookup)
+
+
+def carregar_veiculos(caminho_base, master=None):
+    """
+    Vehicle display mapping (file or fallback), its lookup dict and a picklable
+    name -> code function to hand to montar_demanda / executar_pipeline.
+    Works without Tk, so the GUI and the batch CLI share it.
+    """
+    return vehicle_mappings(load_veiculos(caminho_base, master) or _FALLBACK_VEICULOS_DISPLAY)
+
+
+def read_cached_vehicles(caminho_base):
+    """
+    Vehicle list for the startup screen, without pandas or the workbook: the
+    list saved by the last refresh_vehicle_cache (possibly stale), else the fallback.
+    """
+    _, veiculos_display = _read_cache(caminho_base)
+    return veiculos_display or dict(_FALLBACK_VEICULOS_DISPLAY)
+
+
+def refresh_vehicle_cache(caminho_base, master=None):
+    """
+    Re-reads the vehicle workbook if it changed since the cached list was saved.
+    Returns the new display dict, or None when the cached list is still current.
+    Meant to run off the UI thread (it may load pandas and parse the workbook).
+    """
+    with _cache_lock:
+        signature = _vehicles_signature(caminho_base)
+        cached_signature, cached = _read_cache(caminho_base)
+        if cached is not None and cached_signature == signature:
+            return None
+        veiculos_display = (load_veiculos(caminho_base, master) if signature is not None else None) \
+            or dict(_FALLBACK_VEICULOS_DISPLAY)
+        _write_cache(caminho_base, signature, veiculos_display)
+        return None if veiculos_display == cached else veiculos_display
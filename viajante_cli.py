@@ -0,0 +1,226 @@
+"""
+Execução do VIAJANTE em lote, sem interface gráfica (ex.: agendada num servidor).
+
+Cada combinação destino(s) x veículo roda o pipeline completo (demandas, template,
+saturação e volume por rota) e grava Template.xlsx, VIAJANTE.xlsx e
+Volume_por_rota.xlsx numa subpasta própria de --saida. No final é gravado
+resumo_execucoes.csv com o status e os tempos de cada execução.
+
+Com --comparar, cada grupo de destinos é calculado uma vez só e todos os
+veículos (ou os de --veiculos) são comparados de uma vez (DB.comparar_veiculos);
+o ranking é gravado em <destinos>_comparacao/Comparacao_veiculos.xlsx.
+
+--workers distribui as combinações entre processos; --processos divide o
+cálculo de uma combinação grande por fornecedor (DB.calcular_saturacao_paralela).
+Por padrão, uma combinação sozinha (ex.: todas as plantas num grupo) usa todas
+as CPUs, e combinações já distribuídas por --workers são calculadas em série.
+
+Exemplo:
+    python viajante_cli.py --destinos 1080 1046,1055 --veiculos 4 6 --workers 4 --saida lote
+    python viajante_cli.py --destinos 1080,1046,1055,108 --veiculos 4 --processos 8
+    python viajante_cli.py --destinos 1080 --comparar
+    (--destinos 1046,1055 é um único grupo de destinos processados juntos, como no campo da tela)
+"""
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+import DB
+from master_data import obter_master_data
+from veiculos import carregar_veiculos
+from instrumentacao import Medicao, configurar_log, desligar_log_arquivo, logger
+
+
+NOME_RESUMO = "resumo_execucoes.csv"
+NOME_COMPARACAO = "Comparacao_veiculos.xlsx"
+
+# Estado de cada processo de trabalho (preenchido por _inicializar_processo)
+_master = None
+_codigo_veiculo = None
+
+
+def _inicializar_processo(caminho_base, trabalhador=False):
+    """
+    Prepara o processo: pasta base, tabelas BD em memória e mapa de veículos.
+    Processos do pool não escrevem no log rotativo (só o principal grava nele).
+    """
+    global _master, _codigo_veiculo
+    if trabalhador:
+        desligar_log_arquivo()
+    os.chdir(caminho_base)
+    DB.caminho_base = caminho_base
+    _master = obter_master_data(caminho_base)
+    _, _, _codigo_veiculo = carregar_veiculos(caminho_base, _master)
+
+
+def nome_combinacao(destinos, veiculo):
+    return f"{'-'.join(destinos)}_veic{veiculo}"
+
+
+def executar_combinacao(destinos, veiculo, pasta_saida, usar_manual=False, perfil=False, processos=1):
+    """
+    Roda e exporta uma combinação; retorna a linha do resumo (nunca levanta exceção).
+    Com perfil=True grava o cProfile da execução na pasta logs/ da base.
+    processos > 1 divide a saturação por fornecedor (ver DB.calcular_viajante).
+    """
+    linha = {
+        'DESTINOS': ','.join(destinos),
+        'VEICULO': veiculo,
+        'PASTA': os.path.join(pasta_saida, nome_combinacao(destinos, veiculo)),
+        'STATUS': 'OK',
+        'ERRO': '',
+        'LINHAS TEMPLATE': 0,
+        'OCUPACAO (%)': None,
+    }
+    tempos = {}
+    medicao = Medicao(nome_combinacao(destinos, veiculo), perfil=perfil)
+    inicio = time.perf_counter()
+    try:
+        with medicao.ativa():
+            t = time.perf_counter()
+            demanda = DB.montar_demanda(destinos, _codigo_veiculo, _master)
+            tempos['TEMPO DEMANDA (s)'] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            resultado = DB.calcular_viajante(DB.preparar_template(demanda), veiculo, usar_manual, _master,
+                                             processos)
+            tempos['TEMPO SATURACAO (s)'] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            resultado['demanda'] = demanda
+            resultado['volume_por_rota'] = DB.calcular_volume_por_rota(resultado['template'], _master)
+            tempos['TEMPO VOLUME ROTA (s)'] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            os.makedirs(linha['PASTA'], exist_ok=True)
+            DB.exportar_resultado(resultado, linha['PASTA'])
+            tempos['TEMPO EXPORTACAO (s)'] = time.perf_counter() - t
+
+            linha['LINHAS TEMPLATE'] = len(resultado['template'])
+            linha['OCUPACAO (%)'] = round(float(resultado['ocupacao']), 2)
+    except Exception as e:
+        linha['STATUS'] = 'ERRO'
+        linha['ERRO'] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+
+    tempos['TEMPO TOTAL (s)'] = time.perf_counter() - inicio
+    linha.update({k: round(v, 3) for k, v in tempos.items()})
+    # Detalhe por etapa (leitura, mapas, capacidade, empilhamento...), registrado no log pelo processo principal
+    linha['ETAPAS'] = medicao.resumo(max_etapas=len(medicao.etapas))
+    medicao.finalizar()
+    print(f"[INFO] {nome_combinacao(destinos, veiculo)}: {linha['STATUS']} "
+          f"em {tempos['TEMPO TOTAL (s)']:.2f}s")
+    return linha
+
+
+def comparar_grupo(destinos, pasta_saida, veiculos=None):
+    """Ranking de todos os veículos para um grupo de destinos; retorna o caminho gravado."""
+    inicio = time.perf_counter()
+    demanda = DB.montar_demanda(destinos, _codigo_veiculo, _master)
+    template = DB.enriquecer_template(DB.preparar_template(demanda), _master)
+    comparacao = DB.comparar_veiculos(template, _master, veiculos)
+
+    pasta = os.path.join(pasta_saida, f"{'-'.join(destinos)}_comparacao")
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, NOME_COMPARACAO)
+    comparacao.to_excel(caminho, index=False)
+    melhor = comparacao.iloc[0] if not comparacao.empty else None
+    print(f"[INFO] {'-'.join(destinos)}: {len(comparacao)} veículo(s) comparado(s) em "
+          f"{time.perf_counter() - inicio:.2f}s"
+          + (f"; melhor: {melhor['VEÍCULO']} ({melhor['QTD VEÍCULOS']} veículo(s))" if melhor is not None else ""))
+    return caminho
+
+
+def executar_lote(grupos_destinos, veiculos, pasta_saida, workers=1, usar_manual=False, caminho_base=None,
+                  perfil=False, processos=None):
+    """
+    Roda todas as combinações grupo de destinos x veículo. Com workers > 1 as
+    combinações são distribuídas num pool de processos; cada processo carrega
+    as tabelas BD uma vez (cache em disco) e as reaproveita entre combinações.
+    processos: processos por combinação (None = todas as CPUs quando as
+    combinações rodam em série, 1 quando já estão distribuídas por workers).
+    Retorna o DataFrame do resumo, na ordem das combinações.
+    """
+    caminho_base = os.path.abspath(caminho_base or os.getcwd())
+    pasta_saida = os.path.abspath(pasta_saida)
+    os.makedirs(pasta_saida, exist_ok=True)
+    combinacoes = [(destinos, veiculo) for destinos in grupos_destinos for veiculo in veiculos]
+    em_paralelo = workers > 1 and len(combinacoes) > 1
+    if processos is None:
+        processos = 1 if em_paralelo else (os.cpu_count() or 1)
+
+    if em_paralelo:
+        with ProcessPoolExecutor(max_workers=min(workers, len(combinacoes)),
+                                 initializer=_inicializar_processo, initargs=(caminho_base, True)) as pool:
+            futuros = [pool.submit(executar_combinacao, destinos, veiculo, pasta_saida, usar_manual, perfil,
+                                   processos)
+                       for destinos, veiculo in combinacoes]
+            linhas = [futuro.result() for futuro in futuros]
+    else:
+        _inicializar_processo(caminho_base)
+        linhas = [executar_combinacao(destinos, veiculo, pasta_saida, usar_manual, perfil, processos)
+                  for destinos, veiculo in combinacoes]
+
+    for linha in linhas:
+        logger.info("lote %s veic %s: %s em %.3fs - %s", linha['DESTINOS'], linha['VEICULO'], linha['STATUS'],
+                    linha['TEMPO TOTAL (s)'], linha['ERRO'] or linha['ETAPAS'])
+
+    resumo = pd.DataFrame(linhas)
+    resumo.to_csv(os.path.join(pasta_saida, NOME_RESUMO), sep=';', index=False)
+    return resumo
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="VIAJANTE em lote (sem interface gráfica).")
+    parser.add_argument('--destinos', nargs='+', required=True,
+                        help="códigos de destino; '1046,1055' forma um grupo processado junto")
+    parser.add_argument('--veiculos', nargs='+', type=int,
+                        help="códigos de veículo (COD VEICULO); com --comparar, padrão: todos")
+    parser.add_argument('--saida', default='saida_lote', help="pasta de saída (padrão: saida_lote)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="processos de trabalho (padrão: número de CPUs)")
+    parser.add_argument('--processos', type=int,
+                        help="processos por combinação, dividindo o cálculo por fornecedor "
+                             "(padrão: todas as CPUs se houver uma combinação por vez, senão 1)")
+    parser.add_argument('--base', default=os.getcwd(),
+                        help="pasta com BD/ e Demandas/ (padrão: pasta atual)")
+    parser.add_argument('--manual', action='store_true',
+                        help="usar o veículo escolhido para todos (mesmo que a opção da tela)")
+    parser.add_argument('--perfil', action='store_true',
+                        help="grava um perfil cProfile de cada execução em <base>/logs")
+    parser.add_argument('--comparar', action='store_true',
+                        help="comparar todos os veículos numa única passada por grupo de destinos")
+    args = parser.parse_args(argv)
+    if not args.comparar and not args.veiculos:
+        parser.error("--veiculos é obrigatório (exceto com --comparar)")
+    return args
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    configurar_log(os.path.abspath(args.base))
+    grupos = [[c.strip() for c in grupo.split(',') if c.strip()] for grupo in args.destinos]
+    grupos = [g for g in grupos if g]
+
+    if args.comparar:
+        _inicializar_processo(os.path.abspath(args.base))
+        pasta_saida = os.path.abspath(args.saida)
+        for grupo in grupos:
+            comparar_grupo(grupo, pasta_saida, args.veiculos)
+        return 0
+
+    inicio = time.perf_counter()
+    resumo = executar_lote(grupos, args.veiculos, args.saida, args.workers, args.manual, args.base, args.perfil,
+                           args.processos)
+    erros = int((resumo['STATUS'] != 'OK').sum())
+    print(f"[INFO] {len(resumo)} execução(ões), {erros} com erro, em {time.perf_counter() - inicio:.1f}s. "
+          f"Resumo: {os.path.join(os.path.abspath(args.saida), NOME_RESUMO)}")
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())